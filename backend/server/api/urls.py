@@ -8,6 +8,7 @@ from orders.views import HoaDonNhapViewSet, ChiTietHDNViewSet, HoaDonXuatViewSet
 from orders.views_commerce import CartViewSet, CartItemViewSet, OrderViewSet, checkout
 from orders.api_views import (
     check_schedule_conflict_api,
+    check_schedule_conflict_batch_api,
     calculate_price_api,
     validate_coupon_api,
     geocode_address_api,
@@ -48,6 +49,9 @@ urlpatterns = [
     path("facebook-login/", facebook_login, name="facebook_login"),
     path("refresh/", TokenRefreshView.as_view(), name="token_refresh"),
     path("checkout/", checkout, name="checkout"),
+    path("check-schedule-conflict/", check_schedule_conflict_api, name="check_schedule_conflict"),
+    path("check-schedule-conflict/batch/", check_schedule_conflict_batch_api, name="check_schedule_conflict_batch"),
+    path("calculate-price/", calculate_price_api, name="calculate_price"),
     path("payment/callback/<int:order_id>/", payment_callback, name="payment_callback"),
     path("me/", user_role),  # Giữ lại để backward compatibility
     path("users/me/", get_me, name="get_me"),  # API mới trả về đầy đủ thông tin + avatar
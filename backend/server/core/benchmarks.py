@@ -0,0 +1,195 @@
+"""
+Helpers dùng chung cho các management command benchmark (benchmark_*)
+
+Benchmark seed dữ liệu lớn trong 1 transaction và rollback khi xong,
+nên có thể chạy trên database dev mà không để lại rác.
+"""
+import random
+import statistics
+import time
+from contextlib import contextmanager
+
+from django.db import connection, transaction
+
+
+class _Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rollback_after():
+    """Chạy khối lệnh trong transaction và rollback toàn bộ khi kết thúc"""
+    try:
+        with transaction.atomic():
+            yield
+            raise _Rollback()
+    except _Rollback:
+        pass
+
+
+def measure(fn, repeat=20, warmup=2):
+    """Đo thời gian chạy fn (ms), trả về dict p50/p95/mean/min/max"""
+    for _ in range(warmup):
+        fn()
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    samples.sort()
+    return {
+        "p50": statistics.median(samples),
+        "p95": samples[max(0, int(round(len(samples) * 0.95)) - 1)],
+        "mean": statistics.fmean(samples),
+        "min": samples[0],
+        "max": samples[-1],
+    }
+
+
+def format_timing(label, stats):
+    return (
+        f"{label:<48} p50={stats['p50']:8.2f}ms  p95={stats['p95']:8.2f}ms  "
+        f"mean={stats['mean']:8.2f}ms"
+    )
+
+
+def explain(queryset):
+    """EXPLAIN (ANALYZE trên PostgreSQL) của queryset, dạng text"""
+    if connection.vendor == "postgresql":
+        return queryset.explain(analyze=True)
+    return queryset.explain()
+
+
+def analyze(*models):
+    """Cập nhật thống kê planner sau khi seed (PostgreSQL cho phép ANALYZE trong transaction)"""
+    if connection.vendor != "postgresql":
+        return
+    with connection.cursor() as cursor:
+        for model in models:
+            cursor.execute(f"ANALYZE {model._meta.db_table}")
+
+
+SEED_BRANDS = ["Toyota", "Honda", "Yamaha", "VinFast", "Hyundai", "Kia", "Mazda", "Ford", "Suzuki", "Piaggio"]
+SEED_MODELS = ["Vios", "Vision", "Grande", "Lux A", "Accent", "Morning", "CX-5", "Ranger", "Raider", "Liberty"]
+SEED_COLORS = ["Đỏ", "Trắng", "Đen", "Xanh", "Bạc", "Vàng", "Xám"]
+SEED_CATEGORIES = [
+    ("BLX01", "Xe tay ga"),
+    ("BLX02", "Xe số"),
+    ("BLX03", "Xe côn tay"),
+    ("BLX04", "Sedan"),
+    ("BLX05", "SUV"),
+    ("BLX06", "Bán tải"),
+]
+SEED_DESCRIPTIONS = [
+    "Xe đời mới, tiết kiệm nhiên liệu, phù hợp đi phố.",
+    "Động cơ mạnh mẽ, cốp rộng, thích hợp đi đường dài.",
+    "Thiết kế thể thao, phanh ABS, bảo dưỡng định kỳ.",
+    "Nội thất rộng rãi, điều hòa mát, màn hình giải trí.",
+]
+
+
+def seed_cars(count, prefix="B", batch_size=5000, seed=42):
+    """
+    Tạo nhanh ``count`` xe (bulk_create) với dữ liệu tiếng Việt ngẫu nhiên
+
+    Returns:
+        list LoaiXe đã dùng để seed
+    """
+    from products.models import LoaiXe, Xe
+    from products.search import build_search_document, refresh_search_vector
+
+    rng = random.Random(seed)
+    categories = [
+        LoaiXe.objects.get_or_create(ma_loai=ma, defaults={"ten_loai": ten})[0]
+        for ma, ten in SEED_CATEGORIES
+    ]
+
+    batch = []
+    for index in range(count):
+        brand = rng.choice(SEED_BRANDS)
+        model = rng.choice(SEED_MODELS)
+        color = rng.choice(SEED_COLORS)
+        loai = rng.choice(categories)
+        ma_xe = f"{prefix}{index:09d}"
+        gia_thue = rng.randrange(100_000, 3_000_000, 50_000)
+        xe = Xe(
+            ma_xe=ma_xe,
+            ten_xe=f"{brand} {model} {index}",
+            slug=f"bench-{ma_xe.lower()}",
+            gia=gia_thue * 300,
+            gia_thue=gia_thue,
+            so_luong=rng.randint(0, 5),
+            mau_sac=color,
+            loai_xe=loai,
+            mo_ta_ngan=rng.choice(SEED_DESCRIPTIONS),
+            mo_ta=" ".join(rng.sample(SEED_DESCRIPTIONS, 3)),
+            trang_thai=rng.choice(["in_stock", "in_stock", "in_stock", "out_of_stock"]),
+            hop_so=rng.choice(["manual", "automatic"]),
+            so_cho=rng.choice([2, 4, 5, 7, 16]),
+            loai_nhien_lieu=rng.choice(["gasoline", "electric", "hybrid"]),
+            seo_keywords=f"{brand}, {color}, {loai.ten_loai}",
+        )
+        xe.search_document = build_search_document(xe)
+        batch.append(xe)
+        if len(batch) >= batch_size:
+            Xe.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Xe.objects.bulk_create(batch)
+
+    refresh_search_vector(Xe.objects.filter(ma_xe__startswith=prefix))
+    analyze(Xe)
+    return categories
+
+
+# (trạng thái, trọng số): phần lớn là đơn đã xong, đơn giữ chỗ chỉ chiếm ít
+SEED_ORDER_STATUSES = [
+    ("completed", 60), ("paid", 15), ("cancelled", 10), ("expired", 8),
+    ("pending", 5), ("processing", 1), ("reserved", 1),
+]
+
+
+def seed_orders(count, cars, users, batch_size=5000, seed=42, days=730):
+    """
+    Tạo nhanh ``count`` đơn thuê (mỗi đơn 1 OrderItem) bắt đầu trong ``days`` ngày
+    trước đến 30 ngày sau hôm nay (như dữ liệu thật: chủ yếu là lịch sử), trên các
+    xe ``cars`` (list ma_xe) và user ``users``
+
+    Returns:
+        số đơn đã tạo
+    """
+    from datetime import timedelta
+
+    from django.utils import timezone
+    from orders.models import Order, OrderItem
+
+    rng = random.Random(seed)
+    statuses, weights = zip(*SEED_ORDER_STATUSES)
+    today = timezone.localdate()
+    now = timezone.now()
+    created = 0
+    while created < count:
+        size = min(batch_size, count - created)
+        orders = []
+        for _ in range(size):
+            start = today + timedelta(days=rng.randint(-days, 30))
+            status = rng.choices(statuses, weights)[0]
+            orders.append(Order(
+                user=rng.choice(users),
+                status=status,
+                total_price=rng.randrange(100_000, 3_000_000, 50_000),
+                start_date=start,
+                end_date=start + timedelta(days=rng.randint(0, 7)),
+                payment_status="paid" if status in ("paid", "completed") else "unpaid",
+                reserved_until=(
+                    now + timedelta(minutes=rng.randint(-600, 30)) if status == "reserved" else None
+                ),
+            ))
+        Order.objects.bulk_create(orders)
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, xe_id=rng.choice(cars), quantity=1, price_at_purchase=order.total_price)
+            for order in orders
+        ])
+        created += size
+    analyze(Order, OrderItem)
+    return created
@@ -0,0 +1,263 @@
+"""
+Cache response cho các endpoint public đọc nhiều (catalog)
+
+- Version theo model: mỗi model có 1 counter trong cache, tăng khi post_save/post_delete
+  (xem ``track_model_versions``). Entry lưu kèm version của các model nó phụ thuộc,
+  version lệch = entry đã cũ.
+- Stale-while-revalidate: entry hết hạn/cũ vẫn được giữ thêm STALE_TIMEOUT giây.
+  Chỉ 1 request giữ lock được tính lại, các request khác trả bản cũ ngay.
+- Request coalescing: khi chưa có entry nào, request không giữ lock sẽ đợi
+  request đang tính xong thay vì cùng query database.
+
+Chỉ cache GET của user chưa đăng nhập, và không cache khi đang trong transaction
+(dữ liệu có thể bị rollback, vd. trong test).
+
+Ngoài ra ``ConditionalGetMixin`` gắn ETag/Last-Modified (tính từ updated_at trong DB)
+và trả 304 cho If-None-Match/If-Modified-Since mà không cần chạy serializer.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.db.models.signals import post_delete, post_save
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework.response import Response
+
+VERSION_KEY = "cache-version:{}"
+LOCK_TIMEOUT = 10
+COALESCE_WAIT = 2.0
+COALESCE_POLL = 0.05
+
+
+# ==================== Version theo model ====================
+
+def _version_key(model):
+    return VERSION_KEY.format(model._meta.label_lower)
+
+
+def _initial_version():
+    # Counter bị evict sẽ khởi tạo lại bằng giá trị khác hẳn, không trùng version cũ
+    return int(time.time() * 1000)
+
+
+def get_versions(models):
+    """Tuple version hiện tại của các model (1 lần get_many)"""
+    keys = [_version_key(model) for model in models]
+    found = cache.get_many(keys)
+    versions = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_version(), timeout=None)
+            found[key] = cache.get(key)
+        versions.append(found[key])
+    return tuple(versions)
+
+
+def bump_version(model):
+    key = _version_key(model)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, _initial_version(), timeout=None)
+
+
+def track_model_versions(*models):
+    """
+    Đăng ký signal tăng version khi model thay đổi: tăng ngay (các process khác
+    bỏ entry cũ) và tăng lại sau commit (entry lỡ tính từ dữ liệu chưa commit)
+    """
+    def changed(sender, **kwargs):
+        bump_version(sender)
+        transaction.on_commit(lambda: bump_version(sender))
+
+    for model in models:
+        post_save.connect(changed, sender=model, weak=False, dispatch_uid=f"cache-version-save-{model._meta.label_lower}")
+        post_delete.connect(changed, sender=model, weak=False, dispatch_uid=f"cache-version-delete-{model._meta.label_lower}")
+
+
+# ==================== Response cache ====================
+
+def _params_key(request):
+    """Query params chuẩn hóa: sort theo key/giá trị, bỏ giá trị rỗng"""
+    items = sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value != ""
+    )
+    return "&".join(f"{key}={value}" for key, value in items)
+
+
+def response_cache_key(request):
+    raw = f"{request.get_host()}|{request.path}|{_params_key(request)}"
+    return "resp:" + hashlib.md5(raw.encode()).hexdigest()
+
+
+class CachedResponseMixin:
+    """
+    Cache response của các action đọc trong ViewSet
+
+    ViewSet khai báo ``cache_models``: các model mà response phụ thuộc.
+    """
+    cache_models = ()
+    cache_actions = ("list", "retrieve")
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+    def is_cacheable(self, request):
+        return (
+            request.method == "GET"
+            and self.action in self.cache_actions
+            and not request.user.is_authenticated
+            and not connection.in_atomic_block
+        )
+
+    def cached_response(self, request, compute):
+        if not self.cache_models or not self.is_cacheable(request):
+            return compute()
+
+        key = response_cache_key(request)
+        versions = get_versions(self.cache_models)
+        entry = cache.get(key)
+        if entry is not None and entry["versions"] == versions and entry["fresh_until"] > time.time():
+            return self._from_entry(entry, "HIT")
+
+        lock_key = f"{key}:lock"
+        if not cache.add(lock_key, 1, timeout=LOCK_TIMEOUT):
+            # Đã có request khác đang tính lại
+            if entry is not None:
+                return self._from_entry(entry, "STALE")
+            waited = 0.0
+            while waited < COALESCE_WAIT:
+                time.sleep(COALESCE_POLL)
+                waited += COALESCE_POLL
+                entry = cache.get(key)
+                if entry is not None and entry["versions"] == versions:
+                    return self._from_entry(entry, "HIT")
+            return compute()
+
+        try:
+            response = compute()
+            if response.status_code == 200:
+                validators = None
+                if response.has_header("ETag"):
+                    last_modified = response.get("Last-Modified")
+                    validators = (
+                        response["ETag"],
+                        parse_http_date_safe(last_modified) if last_modified else None,
+                    )
+                fresh = getattr(settings, "RESPONSE_CACHE_TIMEOUT", 60)
+                stale = getattr(settings, "RESPONSE_CACHE_STALE_TIMEOUT", 300)
+                cache.set(key, {
+                    "data": response.data,
+                    "status": response.status_code,
+                    "versions": versions,
+                    "validators": validators,
+                    "fresh_until": time.time() + fresh,
+                }, timeout=fresh + stale)
+            response["X-Cache"] = "MISS"
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    def _from_entry(self, entry, state):
+        validators = entry.get("validators")
+        if validators:
+            not_modified = not_modified_response(self.request, *validators)
+            if not_modified is not None:
+                not_modified["X-Cache"] = state
+                return not_modified
+        response = Response(entry["data"], status=entry["status"])
+        if validators:
+            set_validators(response, *validators)
+        response["X-Cache"] = state
+        return response
+
+
+# ==================== Conditional GET (ETag / Last-Modified) ====================
+
+def set_validators(response, etag, last_modified):
+    response["ETag"] = etag
+    if last_modified is not None:
+        response["Last-Modified"] = http_date(last_modified)
+
+
+def not_modified_response(request, etag, last_modified):
+    """Response 304 (kèm validators) nếu client đã có bản mới nhất, ngược lại None"""
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is not None:
+        set_validators(response, etag, last_modified)
+    return response
+
+
+class ConditionalGetMixin:
+    """
+    ETag mạnh + Last-Modified cho list/retrieve, tính bằng 1 query aggregate
+    (COUNT + MAX các field ``last_modified_fields``) trên queryset đã filter.
+
+    Với list, COUNT này được dùng lại làm tổng số cho pagination (``known_count``)
+    nên không tốn thêm query so với trước. Trang keyset (?cursor=) không có
+    validators vì không được đếm trên toàn bộ danh sách.
+    """
+    last_modified_fields = ("updated_at",)
+
+    def list(self, request, *args, **kwargs):
+        uses_cursor = getattr(self.paginator, "uses_cursor", None)
+        if uses_cursor is not None and uses_cursor(request, self):
+            return super().list(request, *args, **kwargs)
+        queryset = self.filter_queryset(self.get_queryset())
+        return self.conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs), is_list=True
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        queryset = self.filter_queryset(self.get_queryset()).filter(
+            **{self.lookup_field: kwargs[lookup_url_kwarg]}
+        )
+        return self.conditional_response(
+            request, queryset, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
+
+    def get_validators(self, request, queryset):
+        """
+        Returns:
+            (validators, count): validators là (etag, last_modified timestamp),
+            None nếu queryset rỗng
+        """
+        aggregates = {f"last_{index}": Max(field) for index, field in enumerate(self.last_modified_fields)}
+        stats = queryset.order_by().aggregate(count=Count("pk"), **aggregates)
+        stamps = [stats[key] for key in aggregates if stats[key] is not None]
+        if not stats["count"] or not stamps:
+            return None, stats["count"]
+        last_modified = max(stamps)
+        # Representation khác nhau theo host (URL tuyệt đối), format và quyền (admin nhận bản đầy đủ)
+        variant = "staff" if request.user.is_staff else "public"
+        raw = "|".join([
+            request.get_host(), request.path, _params_key(request), variant,
+            getattr(request.accepted_renderer, "format", ""), str(stats["count"]),
+        ] + [stamp.isoformat() for stamp in stamps])
+        etag = '"' + hashlib.md5(raw.encode()).hexdigest() + '"'
+        return (etag, int(last_modified.timestamp())), stats["count"]
+
+    def conditional_response(self, request, queryset, compute, is_list=False):
+        validators, count = self.get_validators(request, queryset)
+        # Pagination dùng lại COUNT này thay vì đếm lại
+        self.known_count = count if is_list else None
+        if validators is None:
+            return compute()
+        not_modified = not_modified_response(request, *validators)
+        if not_modified is not None:
+            return not_modified
+        response = compute()
+        if response.status_code == 200:
+            set_validators(response, *validators)
+        return response
@@ -0,0 +1,252 @@
+"""
+Sparse fieldsets cho API đọc: ?fields= / ?omit= / ?expand=
+
+- ``?fields=id,status,items.quantity``: chỉ trả các field này (dấu chấm cho field lồng nhau)
+- ``?omit=items.xe,note``: bỏ các field này
+- ``?expand=items.xe``: thêm quan hệ lồng nhau vào danh sách ?fields= (vd. ?fields= cố định
+  của frontend + quan hệ cần mở thêm)
+
+Không truyền gì thì response giữ nguyên như cũ. Chỉ áp dụng cho GET/HEAD,
+request ghi vẫn validate đủ field.
+
+Serializer (``SparseFieldsetsMixin``) bỏ field trước khi serialize; ViewSet
+(``SparseQuerysetMixin``) cắt queryset theo các field còn lại: bỏ
+select_related/prefetch_related của quan hệ không dùng và defer() cột không dùng.
+Field tính toán (SerializerMethodField...) khai báo cột nó đọc trong
+``Meta.sparse_sources``; field không rõ nguồn thì queryset được giữ nguyên.
+"""
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+
+SAFE_METHODS = ("GET", "HEAD")
+
+
+def parse_field_tree(value):
+    """'a,b.c,b.d' -> {"a": {}, "b": {"c": {}, "d": {}}} ({} = lấy cả field)"""
+    tree = {}
+    for path in (value or "").split(","):
+        parts = [part.strip() for part in path.split(".") if part.strip()]
+        node = tree
+        for part in parts:
+            node = node.setdefault(part, {})
+    return tree
+
+
+class SparseFieldsetsMixin:
+    """Mixin cho ModelSerializer: bỏ field theo ?fields=/?omit=/?expand="""
+
+    def _sparse_spec(self):
+        spec = getattr(self, "_sparse", None)
+        if spec is not None:
+            return spec
+        parent = self.parent
+        is_root = parent is None or (isinstance(parent, serializers.ListSerializer) and parent.parent is None)
+        request = self.context.get("request")
+        if not is_root or request is None or request.method not in SAFE_METHODS:
+            return None, {}
+        params = getattr(request, "query_params", request.GET)
+        include = None
+        if params.get("fields"):
+            # ?expand= = thêm đường dẫn vào ?fields=
+            include = parse_field_tree(f'{params.get("fields")},{params.get("expand", "")}')
+        return include, parse_field_tree(params.get("omit"))
+
+    def get_fields(self):
+        fields = super().get_fields()
+        include, omit = self._sparse_spec()
+        if include is None and not omit:
+            return fields
+
+        aliases = getattr(getattr(self, "Meta", None), "sparse_aliases", {})
+
+        def with_aliases(names):
+            names = set(names)
+            for name in list(names):
+                names.update(aliases.get(name, ()))
+            return names
+
+        if include is not None:
+            wanted = with_aliases(include)
+            for name in list(fields):
+                if name not in wanted:
+                    del fields[name]
+        dropped = with_aliases(name for name, subtree in omit.items() if not subtree)
+        for name in dropped:
+            fields.pop(name, None)
+
+        # Truyền phần spec con xuống serializer lồng nhau
+        for name, field in fields.items():
+            nested = field.child if isinstance(field, serializers.ListSerializer) else field
+            if not isinstance(nested, SparseFieldsetsMixin):
+                continue
+            sub_include = (include or {}).get(name) or None
+            nested._sparse = (sub_include, omit.get(name, {}))
+        return fields
+
+
+# ==================== Cắt queryset ====================
+
+class _Unknown(Exception):
+    """Không xác định được field serializer đọc từ đâu -> không cắt queryset"""
+
+
+def _relation_or_field(model, name):
+    try:
+        return model._meta.get_field(name)
+    except FieldDoesNotExist:
+        for field in model._meta.concrete_fields:
+            if field.attname == name:
+                return field
+        raise _Unknown(name)
+
+
+def required_sources(serializer, model):
+    """
+    Các cột và quan hệ serializer (đã bỏ field) cần đọc trên ``model``
+
+    Returns:
+        (columns, relations): set tên field cần giữ, và cây quan hệ cần load
+        object {"items": {"xe": {}}}; nhánh None = serializer lồng nhau không rõ
+        nguồn, giữ mọi thứ bên dưới
+    """
+    if isinstance(serializer, serializers.ListSerializer):
+        serializer = serializer.child
+    declared = getattr(getattr(serializer, "Meta", None), "sparse_sources", {})
+    columns, relations = set(), {}
+
+    def add_path(path, deep, nested=None):
+        parts = path.replace(".", "__").split("__")
+        field = _relation_or_field(model, parts[0])
+        columns.add(field.name)
+        if not field.is_relation or not (deep or not field.concrete):
+            return
+        node = relations.setdefault(field.name, {})
+        if nested is not None:
+            try:
+                _, subtree = required_sources(nested, field.related_model)
+            except _Unknown:
+                subtree = None
+            if subtree is None or node is None:
+                relations[field.name] = None
+            else:
+                node.update(subtree)
+        elif len(parts) > 1 and node is not None:
+            for part in parts[1:]:
+                node = node.setdefault(part, {})
+
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if name in declared:
+            for path in declared[name]:
+                add_path(path, deep=True)
+        elif field.source == "*" or isinstance(field, serializers.SerializerMethodField):
+            raise _Unknown(name)
+        elif isinstance(field, serializers.BaseSerializer):
+            add_path(field.source, deep=True, nested=field)
+        else:
+            # PrimaryKeyRelatedField chỉ cần cột khóa ngoại
+            pk_only = isinstance(field, serializers.PrimaryKeyRelatedField) or (
+                isinstance(field, serializers.ManyRelatedField)
+                and isinstance(field.child_relation, serializers.PrimaryKeyRelatedField)
+            )
+            add_path(field.source, deep=len(field.source_attrs) > 1 or not pk_only)
+    return columns, relations
+
+
+def _path_needed(relations, path):
+    """Lookup 'items__xe' còn cần không (theo cây quan hệ)"""
+    node = relations
+    for part in path.split("__"):
+        if node is None:
+            return True
+        if part not in node:
+            return False
+        node = node[part]
+    return True
+
+
+def _lookup_path(lookup):
+    return lookup.prefetch_through if isinstance(lookup, Prefetch) else lookup
+
+
+def _flatten_select_related(tree, prefix=""):
+    paths = []
+    for name, subtree in tree.items():
+        path = f"{prefix}{name}"
+        paths.append(path)
+        paths.extend(_flatten_select_related(subtree, f"{path}__"))
+    return paths
+
+
+def trim_queryset(queryset, serializer, keep=()):
+    """
+    Bỏ select_related/prefetch_related không cần và defer cột không dùng.
+    ``keep``: cột luôn giữ (vd. field sắp xếp, keyset cursor)
+    """
+    model = queryset.model
+    try:
+        columns, relations = required_sources(serializer, model)
+    except _Unknown:
+        return queryset
+
+    select_related = queryset.query.select_related
+    if isinstance(select_related, dict):
+        paths = _flatten_select_related(select_related)
+        kept = [path for path in paths if _path_needed(relations, path)]
+        if len(kept) != len(paths):
+            queryset = queryset.select_related(None)
+            if kept:
+                queryset = queryset.select_related(*kept)
+            select_related = queryset.query.select_related
+
+    lookups = queryset._prefetch_related_lookups
+    kept_lookups = []
+    for lookup in lookups:
+        path = _lookup_path(lookup)
+        parts = path.split("__")
+        if _path_needed(relations, path) or (isinstance(lookup, Prefetch) and _path_needed(relations, parts[0])):
+            kept_lookups.append(lookup)
+        elif not isinstance(lookup, Prefetch):
+            # 'items__xe' không cần xe nhưng vẫn cần items: giữ phần đầu còn dùng
+            while parts and not _path_needed(relations, "__".join(parts)):
+                parts.pop()
+            if parts:
+                kept_lookups.append("__".join(parts))
+    if kept_lookups != list(lookups):
+        queryset = queryset.prefetch_related(None).prefetch_related(*kept_lookups)
+
+    keep_columns = columns | {model._meta.pk.name}
+    keep_columns.update(name.lstrip("-").split("__")[0] for name in keep)
+    if isinstance(select_related, dict):
+        keep_columns.update(select_related)
+    deferred = [
+        field.name for field in model._meta.concrete_fields
+        if field.name not in keep_columns
+    ]
+    return queryset.defer(*deferred) if deferred else queryset
+
+
+class SparseQuerysetMixin:
+    """Mixin cho ViewSet: cắt queryset của list/retrieve theo ?fields=/?omit="""
+    sparse_actions = ("list", "retrieve")
+
+    def sparse_keep_fields(self):
+        """Cột luôn giữ dù serializer không dùng: field ordering/cursor/ETag"""
+        keep = list(getattr(self, "ordering_fields", None) or [])
+        for fields in (getattr(self, "cursor_orderings", None) or {}).values():
+            keep.extend(fields)
+        keep.extend(getattr(self, "last_modified_fields", ()))
+        return keep
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        params = self.request.query_params
+        if (
+            self.request.method in SAFE_METHODS
+            and self.action in self.sparse_actions
+            and (params.get("fields") or params.get("omit"))
+        ):
+            queryset = trim_queryset(queryset, self.get_serializer(), keep=self.sparse_keep_fields())
+        return queryset
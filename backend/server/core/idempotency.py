@@ -0,0 +1,158 @@
+"""
+Header Idempotency-Key cho các endpoint tạo đơn/thanh toán
+
+Client gửi lại request (mạng chập chờn, app tự retry) với cùng Idempotency-Key
+thì nhận lại đúng response lần đầu, không tạo thêm đơn/thanh toán.
+
+- Request đầu tiên INSERT 1 dòng IdempotencyKey (unique theo hash của endpoint +
+  người gọi + key) trong cùng transaction với view và chỉ commit cùng response.
+- Request trùng đến khi request đầu còn chạy bị chặn ở INSERT bởi unique index
+  (PostgreSQL/MySQL đợi transaction đang giữ key): đợi request đầu xong rồi trả
+  response đã lưu, không chạy lại view.
+- Response 5xx/exception không được lưu (rollback cùng view) để client thử lại.
+- Cùng key nhưng body khác trả 422.
+- Khách (chưa đăng nhập) phải gửi kèm session key: key của khách được tách theo
+  session, không có session thì không phân biệt được người gửi nên trả 400.
+"""
+import functools
+import hashlib
+import json
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+
+from core.models import IdempotencyKey
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+REPLAYED_HEADER = "Idempotent-Replayed"
+MAX_KEY_LENGTH = 255
+# Header do renderer/middleware tự đặt lại khi trả response, không lưu
+SKIPPED_HEADERS = {"content-type", "content-length", "vary", "allow"}
+
+
+def _sha256(value):
+    return hashlib.sha256(value.encode("utf-8")).hexdigest()
+
+
+def _owner(request):
+    """Key chỉ có hiệu lực với người gọi: user, hoặc session của khách (None nếu khách không có session)"""
+    if request.user.is_authenticated:
+        return f"user:{request.user.pk}"
+    session_key = request.headers.get("X-Session-Key") or request.query_params.get("session_key")
+    return f"session:{session_key}" if session_key else None
+
+
+def _request_hash(request):
+    return _sha256(json.dumps(request.data, sort_keys=True, default=str))
+
+
+def _replay(record, request_hash, scope):
+    logger.info(f"{scope}: trả lại response đã lưu cho {HEADER} trùng")
+    if record.request_hash != request_hash:
+        return Response(
+            {"detail": f"{HEADER} đã được dùng cho request có nội dung khác."},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+        )
+    response = Response(record.response, status=record.status_code, headers=record.response_headers or None)
+    response[REPLAYED_HEADER] = "true"
+    return response
+
+
+def _claim(key_hash, request_hash):
+    """
+    INSERT dòng giữ key (savepoint)
+
+    Returns:
+        (IdempotencyKey mới, None) hoặc (None, dòng đã có của request trước)
+    """
+    now = timezone.now()
+    ttl = timedelta(seconds=getattr(settings, "IDEMPOTENCY_KEY_TTL", 24 * 3600))
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                # status_code tạm, được ghi đè cùng response trước khi commit
+                return IdempotencyKey.objects.create(
+                    key_hash=key_hash, request_hash=request_hash, status_code=0, expires_at=now + ttl,
+                ), None
+        except IntegrityError:
+            existing = IdempotencyKey.objects.filter(key_hash=key_hash).first()
+            if existing is None:
+                continue
+            if existing.expires_at > now:
+                return None, existing
+            # Key đã hết hạn nhưng chưa bị purge: coi như chưa dùng
+            existing.delete()
+    raise IntegrityError(f"Không giữ được {HEADER}")
+
+
+def idempotent(scope):
+    """
+    Decorator cho view tạo dữ liệu (hàm @api_view hoặc method của ViewSet)
+
+    Args:
+        scope: tên endpoint, key giống nhau ở 2 endpoint khác nhau không đụng nhau
+    """
+    def decorator(view):
+        @functools.wraps(view)
+        def wrapper(*args, **kwargs):
+            request = next(arg for arg in args if isinstance(arg, Request))
+            key = request.headers.get(HEADER)
+            if not key:
+                return view(*args, **kwargs)
+            if len(key) > MAX_KEY_LENGTH:
+                return Response(
+                    {"detail": f"{HEADER} tối đa {MAX_KEY_LENGTH} ký tự."}, status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            owner = _owner(request)
+            if owner is None:
+                return Response(
+                    {"detail": f"Khách cần gửi X-Session-Key khi dùng {HEADER}."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+            key_hash = _sha256(f"{scope}:{owner}:{key}")
+            request_hash = _request_hash(request)
+            # Retry sau khi request đầu đã xong (trường hợp phổ biến): 1 SELECT, không mở transaction
+            existing = IdempotencyKey.objects.filter(key_hash=key_hash, expires_at__gt=timezone.now()).first()
+            if existing is not None:
+                return _replay(existing, request_hash, scope)
+            with transaction.atomic():
+                record, existing = _claim(key_hash, request_hash)
+                if existing is not None:
+                    return _replay(existing, request_hash, scope)
+
+                response = view(*args, **kwargs)
+                if response.status_code >= 500:
+                    # Không lưu lỗi server: bỏ luôn dòng giữ key để client thử lại
+                    transaction.set_rollback(True)
+                    return response
+                record.status_code = response.status_code
+                record.response = getattr(response, "data", None)
+                # vd. Location của 201: lần gửi lại nhận đúng header như lần đầu
+                record.response_headers = {
+                    name: value for name, value in response.items() if name.lower() not in SKIPPED_HEADERS
+                }
+                record.save(update_fields=["status_code", "response", "response_headers"])
+            return response
+        return wrapper
+    return decorator
+
+
+def purge_expired(batch_size=5000):
+    """Xóa các key đã hết hạn theo lô (không khóa cả bảng lâu), trả về số dòng đã xóa"""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(IdempotencyKey.objects.filter(expires_at__lte=now).values_list("pk", flat=True)[:batch_size])
+        if not ids:
+            return deleted
+        deleted += IdempotencyKey.objects.filter(pk__in=ids).delete()[0]
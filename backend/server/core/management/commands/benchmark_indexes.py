@@ -0,0 +1,121 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+
+from core.benchmarks import explain, format_timing, measure, rollback_after, seed_cars, seed_orders
+from orders.models import Order
+from products.models import Xe
+
+# Index thêm cho các filter nóng (products 0011, orders 0004)
+HOT_INDEXES = {
+    Xe: ["xe_loai_gia_thue_idx", "xe_gia_thue_idx", "xe_gia_idx", "xe_in_stock_gia_thue_idx", "xe_specs_idx"],
+    Order: ["order_user_created_idx", "order_period_idx", "order_reserved_until_idx"],
+}
+
+
+def hot_indexes():
+    for model, names in HOT_INDEXES.items():
+        for index in model._meta.indexes:
+            if index.name in names:
+                yield model, index
+
+
+def toggle_indexes(create):
+    """DROP/CREATE các index trong HOT_INDEXES (chạy trong transaction của benchmark nên được rollback)"""
+    # Không vào context của schema editor: SQLite không cho dùng trong atomic block,
+    # ở đây chỉ cần sinh câu lệnh SQL
+    editor = connection.schema_editor()
+    with connection.cursor() as cursor:
+        for model, index in hot_indexes():
+            if create:
+                statement = str(index.create_sql(model, editor))
+            else:
+                statement = editor.sql_delete_index % {
+                    "table": editor.quote_name(model._meta.db_table),
+                    "name": editor.quote_name(index.name),
+                }
+            cursor.execute(statement)
+    if connection.vendor == "postgresql":
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+
+class Command(BaseCommand):
+    help = "Benchmark các filter nóng của catalog/đơn hàng trước và sau khi có index (seed dữ liệu rồi rollback)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cars", type=int, default=200_000)
+        parser.add_argument("--orders", type=int, default=500_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--no-plans", action="store_true", help="Chỉ in thời gian, không in query plan")
+
+    def scenarios(self, category, user, xe_id):
+        today = timezone.localdate()
+        now = timezone.now()
+        active = Order.objects.exclude(status__in=["cancelled", "expired"])
+        return [
+            ("/xe/?loai=&gia_thue_min=&gia_thue_max=&ordering=gia_thue", lambda: Xe.objects.filter(
+                loai_xe=category, gia_thue__gte=500_000, gia_thue__lte=800_000,
+            ).order_by("gia_thue", "ma_xe")[:10]),
+            ("/xe/?ordering=-gia", lambda: Xe.objects.order_by("-gia", "-ma_xe")[:10]),
+            ("/xe/?gia_thue_min=&ordering=gia_thue", lambda: Xe.objects.filter(
+                gia_thue__gte=2_000_000,
+            ).order_by("gia_thue", "ma_xe")[:10]),
+            ("/xe/?in_stock=true&ordering=gia_thue", lambda: Xe.objects.filter(
+                so_luong__gt=0, trang_thai="in_stock",
+            ).order_by("gia_thue", "ma_xe")[:10]),
+            ("/xe/?fuel_type=&transmission=&min_seats=", lambda: Xe.objects.filter(
+                loai_nhien_lieu="electric", hop_so="automatic", so_cho__gte=7,
+            ).order_by().values_list("ma_xe", flat=True)),
+            ("check_schedule_conflict (1 xe, 7 ngày)", lambda: Order.objects.filter(items__xe_id=xe_id).exclude(
+                status__in=["cancelled", "expired"],
+            ).exclude(payment_status="failed").filter(
+                start_date__lte=today + timedelta(days=7), end_date__gte=today,
+            )),
+            ("đơn còn hiệu lực giao khoảng 3 ngày", lambda: active.filter(
+                start_date__lte=today + timedelta(days=3), end_date__gte=today,
+            ).values_list("id", flat=True)),
+            ("release_expired_reservations", lambda: Order.objects.filter(
+                status="reserved", reserved_until__lt=now,
+            ).values_list("id", flat=True)),
+            ("/order/ của 1 user", lambda: Order.objects.filter(user=user).order_by("-created_at")[:10]),
+        ]
+
+    def run(self, label, scenarios):
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n===== {label} ====="))
+        for name, build in scenarios:
+            stats = measure(lambda: list(build()), repeat=self.repeat)
+            self.stdout.write(format_timing(name, stats))
+            if self.plans:
+                for line in explain(build()).splitlines():
+                    self.stdout.write(f"    {line}")
+            self.results.setdefault(name, []).append(stats)
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        self.plans = not options["no_plans"]
+        self.results = {}
+        with rollback_after():
+            self.stdout.write(f"Seeding {options['cars']} xe, {options['orders']} đơn...")
+            categories = seed_cars(options["cars"])
+            cars = list(Xe.objects.filter(ma_xe__startswith="B").values_list("ma_xe", flat=True))
+            users = [
+                User.objects.create_user(username=f"bench_index_{index}", password="bench-pass")
+                for index in range(50)
+            ]
+            seed_orders(options["orders"], cars, users)
+            scenarios = self.scenarios(categories[0], users[0], cars[len(cars) // 2])
+
+            toggle_indexes(create=False)
+            self.run("Trước: không có index", scenarios)
+            toggle_indexes(create=True)
+            self.run("Sau: có index", scenarios)
+
+        self.stdout.write(self.style.MIGRATE_HEADING("\n===== Tóm tắt (p50) ====="))
+        for name, (before, after) in self.results.items():
+            speedup = before["p50"] / after["p50"] if after["p50"] else float("inf")
+            self.stdout.write(f"{name:<56} {before['p50']:9.2f}ms -> {after['p50']:9.2f}ms  (x{speedup:.1f})")
+        self.stdout.write(self.style.SUCCESS("\nBenchmark xong, dữ liệu seed và thay đổi index đã được rollback."))
@@ -0,0 +1,98 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from core.benchmarks import analyze, format_timing, measure, rollback_after, seed_cars
+from core.models import Notification
+from core.pagination import encode_cursor
+from core.views import NotificationViewSet
+from products.models import Xe
+from products.views import XeViewSet
+
+PAGE_SIZE = 10
+
+
+def seed_notifications(user, count, batch_size=10000):
+    """Tạo ``count`` notification cho 1 user, created_at giảm dần theo giây"""
+    now = timezone.now()
+    batch = []
+    for index in range(count):
+        batch.append(Notification(user=user, type="system", title=f"Bench {index}", message="Benchmark"))
+        if len(batch) >= batch_size:
+            Notification.objects.bulk_create(batch)
+            batch = []
+    if batch:
+        Notification.objects.bulk_create(batch)
+    # auto_now_add không cho set created_at khi bulk_create: dàn đều bằng 1 UPDATE theo id
+    Notification.objects.filter(user=user).update(created_at=now)
+    first_id = Notification.objects.filter(user=user).order_by("id").values_list("id", flat=True).first()
+    for notification_id in range(first_id, first_id + count, batch_size):
+        Notification.objects.filter(user=user, id__gte=notification_id, id__lt=notification_id + batch_size).update(
+            created_at=now - timedelta(seconds=notification_id - first_id)
+        )
+    analyze(Notification)
+
+
+class Command(BaseCommand):
+    help = "Benchmark page-number vs cursor pagination ở các độ sâu trang (seed dữ liệu rồi rollback)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=1_000_000)
+        parser.add_argument("--repeat", type=int, default=10)
+        parser.add_argument(
+            "--skip-notifications", action="store_true", help="Chỉ benchmark /xe/"
+        )
+
+    def compare(self, label, view, path, queryset, fields, params, user=None):
+        """So sánh ?page=N với ?cursor= trỏ tới cùng vị trí ở đầu, giữa và cuối danh sách"""
+        factory = APIRequestFactory()
+        total = queryset.count()
+        last_page = max(1, (total + PAGE_SIZE - 1) // PAGE_SIZE)
+        self.stdout.write(self.style.MIGRATE_HEADING(f"\n{label} ({total} rows)"))
+
+        for page in sorted({1, last_page // 2, last_page}):
+            cursor = ""
+            if page > 1:
+                names = [field.lstrip("-") for field in fields]
+                values = queryset.order_by(*fields).values_list(*names)[(page - 1) * PAGE_SIZE - 1]
+                cursor = encode_cursor(values)
+
+            def run(query):
+                request = factory.get(path, {**params, **query}, HTTP_HOST="localhost")
+                if user is not None:
+                    force_authenticate(request, user=user)
+                response = view(request)
+                assert response.status_code == 200, response.data
+
+            page_number = measure(lambda: run({"page": page}), repeat=self.repeat, warmup=1)
+            keyset = measure(lambda: run({"cursor": cursor}), repeat=self.repeat, warmup=1)
+            self.stdout.write(format_timing(f"  page={page} (COUNT + OFFSET)", page_number))
+            self.stdout.write(format_timing(f"  cursor tại trang {page} (keyset)", keyset))
+
+    def handle(self, *args, **options):
+        self.repeat = options["repeat"]
+        rows = options["rows"]
+        with rollback_after():
+            self.stdout.write(f"Seeding {rows} xe...")
+            seed_cars(rows)
+            xe_list = XeViewSet.as_view({"get": "list"})
+            for ordering in ("ma_xe", "gia_thue"):
+                self.compare(
+                    f"/api/xe/?ordering={ordering}", xe_list, "/api/xe/",
+                    Xe.objects.all(), XeViewSet.cursor_orderings[ordering], {"ordering": ordering},
+                )
+
+            if not options["skip_notifications"]:
+                self.stdout.write(f"\nSeeding {rows} notifications...")
+                user = User.objects.create_user(username="bench_pagination", password="bench-pass")
+                seed_notifications(user, rows)
+                self.compare(
+                    "/api/notifications/", NotificationViewSet.as_view({"get": "list"}),
+                    "/api/notifications/", Notification.objects.filter(user=user),
+                    NotificationViewSet.cursor_orderings["-created_at"], {}, user=user,
+                )
+
+        self.stdout.write(self.style.SUCCESS("\nBenchmark xong, dữ liệu seed đã được rollback."))
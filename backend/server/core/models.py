@@ -1,5 +1,6 @@
 from django.db import models
 from django.contrib.auth.models import User
+from django.core.serializers.json import DjangoJSONEncoder
 
 
 class Notification(models.Model):
@@ -36,3 +37,23 @@ class Notification(models.Model):
 
     def __str__(self):
         return f"{self.title} - {self.user.username}"
+
+
+class IdempotencyKey(models.Model):
+    """
+    Response đã lưu của request có header Idempotency-Key (core.idempotency)
+
+    Chỉ lưu hash của key (gồm endpoint + người gọi) và của body để bảng gọn;
+    dòng quá expires_at được command purge_idempotency_keys xóa.
+    """
+
+    key_hash = models.CharField(max_length=64, unique=True)
+    request_hash = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField()
+    response = models.JSONField(encoder=DjangoJSONEncoder, null=True)
+    response_headers = models.JSONField(default=dict, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    def __str__(self):
+        return f"{self.key_hash[:12]} ({self.status_code})"
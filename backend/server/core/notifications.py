@@ -17,22 +17,29 @@ def create_notification(user, type, title, message, order=None):
     )
 
 
+ORDER_STATUS_LABELS = {
+    "pending": "Chờ xử lý",
+    "reserved": "Đã giữ chỗ",
+    "processing": "Đang xử lý",
+    "paid": "Đã thanh toán",
+    "shipped": "Đang giao",
+    "completed": "Hoàn thành",
+    "cancelled": "Đã hủy",
+    "expired": "Hết hạn giữ chỗ",
+}
+ORDER_STATUS_TITLE = "Cập nhật trạng thái đơn hàng"
+
+
+def _order_status_message(order_id, old_status, new_status):
+    old_status_text = ORDER_STATUS_LABELS.get(old_status, old_status)
+    new_status_text = ORDER_STATUS_LABELS.get(new_status, new_status)
+    return f"Đơn hàng #{order_id} đã chuyển từ '{old_status_text}' sang '{new_status_text}'"
+
+
 def create_order_status_notification(order, old_status, new_status):
     """Tạo notification khi order status thay đổi"""
-    status_messages = {
-        "pending": "Chờ xử lý",
-        "processing": "Đang xử lý",
-        "paid": "Đã thanh toán",
-        "shipped": "Đang giao",
-        "completed": "Hoàn thành",
-        "cancelled": "Đã hủy",
-    }
-    
-    old_status_text = status_messages.get(old_status, old_status)
-    new_status_text = status_messages.get(new_status, new_status)
-    
-    title = "Cập nhật trạng thái đơn hàng"
-    message = f"Đơn hàng #{order.id} đã chuyển từ '{old_status_text}' sang '{new_status_text}'"
+    title = ORDER_STATUS_TITLE
+    message = _order_status_message(order.id, old_status, new_status)
     
     notification = create_notification(
         user=order.user,
@@ -74,6 +81,54 @@ def create_order_status_notification(order, old_status, new_status):
     return notification
 
 
+def create_order_status_notifications(orders, old_status, new_status):
+    """
+    Như create_order_status_notification cho nhiều đơn cùng đổi trạng thái
+    (1 bulk INSERT; real-time được gửi sau khi transaction commit)
+
+    Args:
+        orders: list (order_id, user_id)
+    """
+    from django.db import transaction
+
+    notifications = Notification.objects.bulk_create([
+        Notification(
+            user_id=user_id,
+            type="order_status",
+            title=ORDER_STATUS_TITLE,
+            message=_order_status_message(order_id, old_status, new_status),
+            order_id=order_id,
+        )
+        for order_id, user_id in orders
+    ])
+
+    def send():
+        try:
+            from core.consumers import send_notification, send_order_update
+            for notification in notifications:
+                send_notification(notification.user_id, {
+                    "id": notification.id,
+                    "type": "order_status",
+                    "title": notification.title,
+                    "message": notification.message,
+                    "order_id": notification.order_id,
+                    "created_at": notification.created_at.isoformat(),
+                })
+                send_order_update(notification.order_id, {
+                    "order_id": notification.order_id,
+                    "status": new_status,
+                    "old_status": old_status,
+                    "message": notification.message,
+                })
+        except Exception as e:
+            import logging
+            logger = logging.getLogger(__name__)
+            logger.warning(f"Không thể gửi real-time notification: {str(e)}")
+
+    transaction.on_commit(send)
+    return notifications
+
+
 def create_payment_success_notification(order, payment):
     """Tạo notification khi thanh toán thành công"""
     title = "Thanh toán thành công"
@@ -0,0 +1,203 @@
+"""
+Pagination dùng chung: page-number (mặc định) + keyset/cursor (opt-in)
+
+Page-number chạy COUNT(*) + OFFSET nên trang càng sâu càng chậm. Client truyền
+``?cursor=`` (rỗng cho trang đầu) để chuyển sang keyset: điều kiện
+``(gia, ma_xe) > (v1, v2)`` dùng được index, chi phí mỗi trang không đổi theo độ sâu
+và không cần đếm tổng. Cursor là chuỗi base64 opaque, client chỉ dùng lại
+link ``next``/``previous`` trong response.
+
+ViewSet bật cursor bằng ``cursor_orderings``: map giá trị ``?ordering=`` -> tuple
+field sắp xếp (field cuối phải unique để thứ tự ổn định), vd::
+
+    cursor_orderings = {
+        "ma_xe": ("ma_xe",),
+        "gia": ("gia", "ma_xe"),
+    }
+
+Ordering được chọn theo ``?ordering=``, nếu không có thì theo ``view.ordering``,
+nếu view không có ordering thì lấy entry đầu tiên.
+
+Action nằm trong ``view.cursor_only_actions`` luôn dùng keyset (không có page-number).
+"""
+import base64
+import binascii
+import json
+from collections import OrderedDict
+from functools import partial
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.paginator import Paginator as DjangoPaginator
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+def _json_default(value):
+    # Giữ đủ microsecond (DjangoJSONEncoder cắt còn millisecond, làm lệch keyset)
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_cursor(values, reverse=False):
+    """Mã hóa giá trị các field sắp xếp của 1 dòng thành cursor opaque"""
+    payload = {"v": list(values)}
+    if reverse:
+        payload["r"] = 1
+    raw = json.dumps(payload, default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token):
+    """Giải mã cursor, trả về (values, reverse); raise ValueError nếu cursor hỏng"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        payload = json.loads(raw)
+        values = payload["v"]
+    except (binascii.Error, UnicodeDecodeError, ValueError, TypeError, KeyError):
+        raise ValueError("invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("invalid cursor")
+    return values, bool(payload.get("r"))
+
+
+def keyset_filter(fields, values, reverse=False):
+    """
+    Điều kiện "đứng sau dòng có giá trị ``values``" theo thứ tự ``fields``
+    (đảo chiều khi reverse), dạng mở rộng của so sánh tuple:
+    f1 >= v1 AND (f1 > v1 OR (f1 = v1 AND f2 > v2) OR ...)
+
+    Điều kiện thừa ``f1 >= v1`` giúp planner range-scan index của field đầu
+    thay vì phải tách nhánh OR.
+    """
+    condition = Q()
+    equal = Q()
+    for field, value in zip(fields, values):
+        descending = field.startswith("-")
+        name = field.lstrip("-")
+        lookup = "lt" if descending != reverse else "gt"
+        condition |= equal & Q(**{f"{name}__{lookup}": value})
+        equal &= Q(**{name: value})
+    first = fields[0]
+    bound = "lte" if first.startswith("-") != reverse else "gte"
+    return Q(**{f"{first.lstrip('-')}__{bound}": values[0]}) & condition
+
+
+class KnownCountPaginator(DjangoPaginator):
+    """Paginator nhận sẵn tổng số (đã đếm ở nơi khác), bỏ qua query COUNT"""
+
+    def __init__(self, *args, count=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if count is not None:
+            self.count = count
+
+
+class HybridPagination(PageNumberPagination):
+    """PageNumberPagination, chuyển sang keyset khi có ?cursor= và view hỗ trợ"""
+    cursor_query_param = "cursor"
+
+    def uses_cursor(self, request, view):
+        if not getattr(view, "cursor_orderings", None):
+            return False
+        # Action chỉ hỗ trợ keyset (vd. danh sách admin lớn): không cần ?cursor= ở trang đầu
+        if getattr(view, "action", None) in getattr(view, "cursor_only_actions", ()):
+            return True
+        return self.cursor_query_param in request.query_params
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.uses_cursor(request, view)
+        if not self.cursor_mode:
+            # View đã đếm sẵn (vd. ConditionalGetMixin) thì không COUNT lại
+            known_count = getattr(view, "known_count", None)
+            if known_count is not None:
+                self.django_paginator_class = partial(KnownCountPaginator, count=known_count)
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_keyset(queryset, request, view)
+
+    def get_cursor_fields(self, request, view):
+        requested = request.query_params.get("ordering", "").strip()
+        orderings = view.cursor_orderings
+        if not requested:
+            # Default ordering của view không hỗ trợ keyset (vd. theo độ liên quan khi search)
+            # thì dùng ordering keyset đầu tiên
+            default = ",".join(getattr(view, "ordering", None) or [])
+            return orderings.get(default, next(iter(orderings.values())))
+        if requested not in orderings:
+            raise ValidationError({
+                "ordering": f"Cursor pagination chỉ hỗ trợ ordering: {', '.join(orderings)}."
+            })
+        return orderings[requested]
+
+    def paginate_keyset(self, queryset, request, view):
+        self.request = request
+        self.fields = self.get_cursor_fields(request, view)
+        page_size = self.get_page_size(request)
+        model = queryset.model
+
+        token = request.query_params.get(self.cursor_query_param, "").strip()
+        reverse = False
+        if token:
+            try:
+                values, reverse = decode_cursor(token)
+                if len(values) != len(self.fields):
+                    raise ValueError("invalid cursor")
+                values = [
+                    model._meta.get_field(field.lstrip("-")).to_python(value)
+                    for field, value in zip(self.fields, values)
+                ]
+            except (ValueError, DjangoValidationError):
+                raise NotFound("Cursor không hợp lệ.")
+            queryset = queryset.filter(keyset_filter(self.fields, values, reverse))
+
+        if reverse:
+            order = [field[1:] if field.startswith("-") else f"-{field}" for field in self.fields]
+        else:
+            order = list(self.fields)
+        rows = list(queryset.order_by(*order)[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, bool(token)
+
+        self.first_row = rows[0] if rows else None
+        self.last_row = rows[-1] if rows else None
+        return rows
+
+    def _row_values(self, row):
+        # Hỗ trợ cả queryset values() (dict)
+        if isinstance(row, dict):
+            return [row[field.lstrip("-")] for field in self.fields]
+        return [getattr(row, field.lstrip("-")) for field in self.fields]
+
+    def _cursor_link(self, token):
+        url = remove_query_param(self.request.build_absolute_uri(), self.page_query_param)
+        return replace_query_param(url, self.cursor_query_param, token)
+
+    def get_next_link(self):
+        if not getattr(self, "cursor_mode", False):
+            return super().get_next_link()
+        if not self.has_next or self.last_row is None:
+            return None
+        return self._cursor_link(encode_cursor(self._row_values(self.last_row)))
+
+    def get_previous_link(self):
+        if not getattr(self, "cursor_mode", False):
+            return super().get_previous_link()
+        if not self.has_previous or self.first_row is None:
+            return None
+        return self._cursor_link(encode_cursor(self._row_values(self.first_row), reverse=True))
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ("next", self.get_next_link()),
+            ("previous", self.get_previous_link()),
+            ("results", data),
+        ]))
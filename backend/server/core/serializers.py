@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetsMixin
 from .models import Notification
 
 
-class NotificationSerializer(serializers.ModelSerializer):
+class NotificationSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer cho Notification"""
     order_id = serializers.IntegerField(source="order.id", read_only=True, allow_null=True)
 
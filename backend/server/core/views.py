@@ -2,14 +2,16 @@
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from core.fieldsets import SparseQuerysetMixin
 from .models import Notification
 from .serializers import NotificationSerializer
 
 
-class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
+class NotificationViewSet(SparseQuerysetMixin, viewsets.ReadOnlyModelViewSet):
     """ViewSet cho Notification - chỉ đọc"""
     serializer_class = NotificationSerializer
     permission_classes = [IsAuthenticated]
+    cursor_orderings = {"-created_at": ("-created_at", "-id")}
 
     def get_queryset(self):
         """Chỉ trả về notifications của user hiện tại"""
@@ -5,44 +5,47 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework import status
-from datetime import datetime
-from orders.utils import check_schedule_conflict, calculate_rental_price, release_expired_reservations
-from orders.models import Coupon
+from datetime import datetime, time
+from orders.availability import check_capacity, check_capacity_batch
+from orders import providers
+from orders.geo import estimate_route
+from orders.geocoding import GeocodingError, geocode, geocode_many
+from orders.quotes import sign_quote
+from orders.utils import calculate_rental_price, release_expired_reservations
+from orders.models import Coupon, Order
+from orders.routing import MAX_ZOOM, get_route, parse_geometry_options, route_geometry
 from products.models import Xe
 import requests
 import logging
 
 logger = logging.getLogger(__name__)
 
+# Số phần tử tối đa của /check-schedule-conflict/batch/
+MAX_BATCH_CHECKS = 200
 
-@api_view(["POST"])
-@permission_classes([AllowAny])
-def check_schedule_conflict_api(request):
+
+def _parse_schedule(data):
     """
-    API kiểm tra xung đột lịch đặt
-    
-    Body:
-    {
-        "xe_id": "X001",
-        "start_date": "2025-01-01",
-        "end_date": "2025-01-05",
-        "start_time": "08:00:00",  # optional
-        "end_time": "18:00:00",    # optional
-        "exclude_order_id": 123    # optional, khi update order
-    }
+    Parse xe_id, ngày/giờ và quantity của 1 yêu cầu kiểm tra lịch
+
+    Returns:
+        ((xe_id, start_datetime, end_datetime, quantity), None) hoặc (None, thông báo lỗi)
     """
-    xe_id = request.data.get("xe_id")
-    start_date = request.data.get("start_date")
-    end_date = request.data.get("end_date")
-    start_time = request.data.get("start_time")
-    end_time = request.data.get("end_time")
-    exclude_order_id = request.data.get("exclude_order_id")
+    xe_id = data.get("xe_id")
+    start_date = data.get("start_date")
+    end_date = data.get("end_date")
+    start_time = data.get("start_time")
+    end_time = data.get("end_time")
+    try:
+        quantity = int(data.get("quantity") or 1)
+    except (TypeError, ValueError):
+        quantity = 0
+    if quantity <= 0:
+        return None, "quantity không hợp lệ."
     
     if not xe_id or not start_date or not end_date:
-        return Response(
-            {"detail": "Thiếu xe_id, start_date hoặc end_date."},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        return None, "Thiếu xe_id, start_date hoặc end_date."
+    xe_id = str(xe_id)
     
     # Parse dates
     try:
@@ -55,10 +58,38 @@ def check_schedule_conflict_api(request):
         if end_time and isinstance(end_time, str):
             end_time = datetime.strptime(end_time, "%H:%M:%S").time()
     except ValueError as e:
-        return Response(
-            {"detail": f"Định dạng ngày/giờ không hợp lệ: {str(e)}"},
-            status=status.HTTP_400_BAD_REQUEST
-        )
+        return None, f"Định dạng ngày/giờ không hợp lệ: {str(e)}"
+    
+    start_datetime = datetime.combine(start_date, start_time or time.min)
+    end_datetime = datetime.combine(end_date, end_time or time.max)
+    return (xe_id, start_datetime, end_datetime, quantity), None
+
+
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def check_schedule_conflict_api(request):
+    """
+    API kiểm tra xung đột lịch đặt
+    
+    Body:
+    {
+        "xe_id": "X001",
+        "start_date": "2025-01-01",
+        "end_date": "2025-01-05",
+        "start_time": "08:00:00",  # optional
+        "end_time": "18:00:00",    # optional
+        "exclude_order_id": 123,   # optional, khi update order
+        "quantity": 1              # optional, số chiếc cần đặt
+    }
+
+    Xe nhiều chiếc (so_chiec) chỉ xung đột khi không còn đủ chiếc trống
+    ở thời điểm đông nhất trong khoảng thời gian.
+    """
+    schedule, error = _parse_schedule(request.data)
+    if error:
+        return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+    xe_id, start_datetime, end_datetime, quantity = schedule
+    exclude_order_id = request.data.get("exclude_order_id")
     
     # Kiểm tra xe tồn tại
     try:
@@ -69,13 +100,20 @@ def check_schedule_conflict_api(request):
             status=status.HTTP_404_NOT_FOUND
         )
     
-    # Kiểm tra xung đột
-    has_conflict, conflicting_orders = check_schedule_conflict(
-        xe_id, start_date, end_date, start_time, end_time, exclude_order_id
+    # Kiểm tra xung đột theo số chiếc còn trống
+    capacity = check_capacity(
+        xe.pk, start_datetime, end_datetime, quantity, capacity=xe.unit_capacity, exclude_order_id=exclude_order_id
+    )
+    has_conflict = capacity.available < quantity
+    conflicting_orders = (
+        Order.objects.filter(id__in=capacity.order_ids).order_by("start_date", "id") if has_conflict else []
     )
     
     return Response({
         "has_conflict": has_conflict,
+        "capacity": capacity.capacity,
+        "peak_booked": capacity.peak_booked,
+        "available_units": capacity.available,
         "conflicting_orders": [
             {
                 "id": o.id,
@@ -88,12 +126,67 @@ def check_schedule_conflict_api(request):
         "message": "Có xung đột lịch đặt" if has_conflict else "Không có xung đột"
     })
 
+@api_view(["POST"])
+@permission_classes([AllowAny])
+def check_schedule_conflict_batch_api(request):
+    """
+    API kiểm tra xung đột lịch cho nhiều xe/khoảng thời gian trong 1 request
+    (lịch admin, trang so sánh xe)
+    
+    Body:
+    {
+        "checks": [
+            {"xe_id": "X001", "start_date": "2025-01-01", "end_date": "2025-01-05", "quantity": 1},
+            {"xe_id": "X002", "start_date": "2025-01-03", "end_date": "2025-01-03",
+             "start_time": "08:00:00", "end_time": "12:00:00"}
+        ]
+    }
+    
+    Mỗi phần tử có cùng field với /check-schedule-conflict/ (trừ exclude_order_id).
+    Toàn bộ được tính từ 1 query đơn đặt nên thời gian gần như không tăng theo số phần tử.
+    """
+    checks = request.data.get("checks")
+    if not isinstance(checks, list) or not checks:
+        return Response({"detail": "checks phải là danh sách không rỗng."}, status=status.HTTP_400_BAD_REQUEST)
+    if len(checks) > MAX_BATCH_CHECKS:
+        return Response(
+            {"detail": f"Tối đa {MAX_BATCH_CHECKS} phần tử mỗi request."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+    
+    schedules = []
+    for index, check in enumerate(checks):
+        schedule, error = _parse_schedule(check) if isinstance(check, dict) else (None, "Phần tử không hợp lệ.")
+        if error:
+            return Response({"detail": f"checks[{index}]: {error}"}, status=status.HTTP_400_BAD_REQUEST)
+        schedules.append(schedule)
+    
+    results = []
+    windows = [(xe_id, start_datetime, end_datetime) for xe_id, start_datetime, end_datetime, _ in schedules]
+    for (xe_id, start_datetime, end_datetime, quantity), capacity in zip(schedules, check_capacity_batch(windows)):
+        result = {"xe_id": xe_id, "start": start_datetime.isoformat(), "end": end_datetime.isoformat()}
+        if capacity is None:
+            result["detail"] = f"Xe {xe_id} không tồn tại."
+        else:
+            has_conflict = capacity.available < quantity
+            result.update({
+                "has_conflict": has_conflict,
+                "capacity": capacity.capacity,
+                "peak_booked": capacity.peak_booked,
+                "available_units": capacity.available,
+                "conflicting_order_ids": capacity.order_ids if has_conflict else [],
+            })
+        results.append(result)
+    
+    return Response({"results": results})
+
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
 def calculate_price_api(request):
     """
-    API tính giá thuê xe chi tiết
+    API tính giá thuê xe chi tiết, kèm quote_token (ký, hết hạn sau PRICE_QUOTE_TTL giây)
+    để tạo đơn theo đúng bảng giá này
     
     Body:
     {
@@ -183,7 +276,12 @@ def calculate_price_api(request):
         "discount_amount": float(price_info['discount_amount']),
         "subtotal": float(price_info['base_price'] + price_info['delivery_fee'] + price_info['pickup_fee'] + price_info['additional_fee']),
         "total_price": float(price_info['total_price']),
-        "coupon_applied": coupon_code.upper() if coupon_code else None
+        "coupon_applied": coupon_code.upper() if coupon_code else None,
+        # Gửi lại khi tạo đơn: dùng bảng giá này, không tính lại (orders.quotes)
+        "quote_token": sign_quote(
+            xe, start_date, end_date, start_time, end_time,
+            pickup_location, return_location, coupon, price_info
+        ),
     })
 
 
@@ -294,74 +392,26 @@ def geocode_address_api(request):
         )
     
     try:
-        # Thử OpenRouteService trước (nếu có API key)
-        ors_api_key = ""  # Có thể lấy từ settings nếu có
-        if ors_api_key:
-            url = "https://api.openrouteservice.org/v2/geocoding/search"
-            params = {
-                "api_key": ors_api_key,
-                "text": address,
-                "boundary.country": "VN"
-            }
-            
-            try:
-                response = requests.get(url, params=params, timeout=10)
-                response.raise_for_status()
-                data = response.json()
-                
-                if data.get("features") and len(data["features"]) > 0:
-                    feature = data["features"][0]
-                    coords = feature["geometry"]["coordinates"]  # [lng, lat]
-                    
-                    return Response({
-                        "lat": coords[1],
-                        "lng": coords[0],
-                        "formatted": feature["properties"].get("label", address),
-                    })
-            except requests.exceptions.RequestException:
-                # Fallback to Nominatim nếu OpenRouteService fail
-                pass
-        
-        # Fallback: Sử dụng Nominatim (OpenStreetMap) - miễn phí, không cần API key
-        # Giới hạn tìm kiếm trong khu vực Việt Nam bằng bbox
-        # Bbox Việt Nam: [102.144, 8.559, 109.465, 23.393] (min_lng, min_lat, max_lng, max_lat)
-        url = "https://nominatim.openstreetmap.org/search"
-        params = {
-            "q": address + ", Vietnam",
-            "format": "json",
-            "limit": 1,
-            "addressdetails": 1,
-            "countrycodes": "vn",  # Chỉ tìm trong Việt Nam
-            "bounded": "1",  # Chỉ tìm trong bbox
-            "viewbox": "102.144,23.393,109.465,8.559",  # viewbox format: left,top,right,bottom
-        }
-        headers = {
-            "User-Agent": "MORENT-CarRental/1.0"  # Nominatim yêu cầu User-Agent
-        }
-        
-        response = requests.get(url, params=params, headers=headers, timeout=10)
-        response.raise_for_status()
-        data = response.json()
-        
-        if data and len(data) > 0:
-            result = data[0]
-            return Response({
-                "lat": float(result["lat"]),
-                "lng": float(result["lon"]),
-                "formatted": result.get("display_name", address),
-            })
-        
-        return Response(
-            {"detail": "Không tìm thấy địa chỉ."},
-            status=status.HTTP_404_NOT_FOUND
-        )
-    except requests.exceptions.RequestException as e:
+        # Qua cache dùng chung (LRU + bảng GeocodedAddress), chỉ gọi Nominatim khi chưa có
+        result = geocode(address, deadline=providers.Deadline())
+    except GeocodingError as e:
         logger.error(f"Geocoding API error: {str(e)}")
         return Response(
             {"detail": f"Lỗi khi geocode địa chỉ: {str(e)}"},
             status=status.HTTP_500_INTERNAL_SERVER_ERROR
         )
 
+    if result is None:
+        return Response(
+            {"detail": "Không tìm thấy địa chỉ."},
+            status=status.HTTP_404_NOT_FOUND
+        )
+    return Response({
+        "lat": result.lat,
+        "lng": result.lng,
+        "formatted": result.formatted,
+    })
+
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
@@ -374,7 +424,9 @@ def calculate_distance_api(request):
         "lat1": 21.0285,
         "lng1": 105.8542,
         "lat2": 10.8231,
-        "lng2": 106.6297
+        "lng2": 106.6297,
+        "zoom": 12,                   // optional, mức zoom bản đồ để rút gọn geometry
+        "geometry_format": "polyline" // optional, "geojson" (mặc định) hoặc "polyline"
     }
     """
     try:
@@ -387,58 +439,31 @@ def calculate_distance_api(request):
             {"detail": "Tọa độ không hợp lệ."},
             status=status.HTTP_400_BAD_REQUEST
         )
+    try:
+        zoom, geometry_format = parse_geometry_options(request.data)
+    except (ValueError, TypeError):
+        return Response(
+            {"detail": f"zoom phải từ 0 đến {MAX_ZOOM}, geometry_format là geojson hoặc polyline."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     try:
         # Sử dụng OSRM (Open Source Routing Machine) - miễn phí, không cần API key
-        # Public instance: http://router.project-osrm.org
-        url = "http://router.project-osrm.org/route/v1/driving/{lng1},{lat1};{lng2},{lat2}"
-        url = url.format(lng1=lng1, lat1=lat1, lng2=lng2, lat2=lat2)
-        params = {
-            "overview": "full",  # Lấy full geometry để vẽ route
-            "geometries": "geojson",  # Format GeoJSON
-            "steps": "false"  # Không cần chi tiết từng bước
-        }
-        
+        # Route được cache theo cặp điểm làm tròn, geometry rút gọn theo zoom (orders.routing)
         try:
-            response = requests.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") == "Ok" and data.get("routes") and len(data["routes"]) > 0:
-                route = data["routes"][0]
-                distance_m = route["distance"]  # OSRM trả về mét
-                distance_km = round(distance_m / 1000, 2)
-                duration_seconds = round(route["duration"])  # OSRM trả về giây
-                
-                # Lấy geometry từ OSRM
-                geometry = route.get("geometry")
-                
+            route = get_route(lat1, lng1, lat2, lng2, deadline=providers.Deadline())
+            if route is not None:
                 return Response({
-                    "distance": distance_km,
-                    "duration": duration_seconds,
-                    "geometry": geometry,  # GeoJSON format từ OSRM
+                    "distance": route["distance"],
+                    "duration": route["duration"],
+                    **route_geometry(route["coordinates"], zoom, geometry_format),
                 })
         except requests.exceptions.RequestException as e:
+            # Fallback to Haversine nếu OSRM fail hoặc đang bị ngắt mạch (không chờ timeout)
             logger.warning(f"OSRM API error: {str(e)}, falling back to Haversine")
-            # Fallback to Haversine nếu OSRM fail
-            pass
-        
-        # Fallback: Tính khoảng cách bằng Haversine (đường chim bay)
-        from math import radians, cos, sin, asin, sqrt
         
-        def haversine_distance(lat1, lon1, lat2, lon2):
-            """Tính khoảng cách giữa 2 điểm bằng Haversine formula (km)"""
-            R = 6371  # Bán kính Trái Đất (km)
-            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * asin(sqrt(a))
-            return R * c
-        
-        distance_km = round(haversine_distance(lat1, lng1, lat2, lng2), 2)
-        # Ước tính thời gian: giả sử tốc độ trung bình 60 km/h
-        duration_seconds = int((distance_km / 60) * 3600)
+        # Fallback: Tính khoảng cách bằng Haversine (đường chim bay), tốc độ trung bình 60 km/h
+        distance_km, duration_seconds = estimate_route(lat1, lng1, lat2, lng2)
         
         return Response({
             "distance": distance_km,
@@ -462,7 +487,9 @@ def calculate_distance_from_addresses_api(request):
     Body:
     {
         "address1": "Hà Nội, Việt Nam",
-        "address2": "Hồ Chí Minh, Việt Nam"
+        "address2": "Hồ Chí Minh, Việt Nam",
+        "zoom": 12,                   // optional, như calculate_distance_api
+        "geometry_format": "polyline" // optional
     }
     """
     address1 = request.data.get("address1", "").strip()
@@ -473,64 +500,29 @@ def calculate_distance_from_addresses_api(request):
             {"detail": "Thiếu địa chỉ."},
             status=status.HTTP_400_BAD_REQUEST
         )
+    try:
+        zoom, geometry_format = parse_geometry_options(request.data)
+    except (ValueError, TypeError):
+        return Response(
+            {"detail": f"zoom phải từ 0 đến {MAX_ZOOM}, geometry_format là geojson hoặc polyline."},
+            status=status.HTTP_400_BAD_REQUEST
+        )
     
     try:
-        # Geocode cả 2 địa chỉ song song
-        geocode_url = "https://nominatim.openstreetmap.org/search"
-        headers = {
-            "User-Agent": "MORENT-CarRental/1.0"
-        }
-        
-        # Geocode địa chỉ 1 - Giới hạn trong Việt Nam
-        params1 = {
-            "q": address1 + ", Vietnam",
-            "format": "json",
-            "limit": 1,
-            "countrycodes": "vn",  # Chỉ tìm trong Việt Nam
-            "bounded": "1",
-            "viewbox": "102.144,23.393,109.465,8.559",  # Bbox Việt Nam
-        }
-        response1 = requests.get(geocode_url, params=params1, headers=headers, timeout=10)
-        response1.raise_for_status()
-        data1 = response1.json()
-        
-        if not data1 or len(data1) == 0:
-            return Response(
-                {"detail": f"Không tìm thấy địa chỉ: {address1}"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        coords1 = {
-            "lat": float(data1[0]["lat"]),
-            "lng": float(data1[0]["lon"])
-        }
-        address1_formatted = data1[0].get("display_name", address1)
-        
-        # Geocode địa chỉ 2 - Giới hạn trong Việt Nam
-        params2 = {
-            "q": address2 + ", Vietnam",
-            "format": "json",
-            "limit": 1,
-            "countrycodes": "vn",  # Chỉ tìm trong Việt Nam
-            "bounded": "1",
-            "viewbox": "102.144,23.393,109.465,8.559",  # Bbox Việt Nam
-        }
-        response2 = requests.get(geocode_url, params=params2, headers=headers, timeout=10)
-        response2.raise_for_status()
-        data2 = response2.json()
-        
-        if not data2 or len(data2) == 0:
-            return Response(
-                {"detail": f"Không tìm thấy địa chỉ: {address2}"},
-                status=status.HTTP_404_NOT_FOUND
-            )
-        
-        coords2 = {
-            "lat": float(data2[0]["lat"]),
-            "lng": float(data2[0]["lon"])
-        }
-        address2_formatted = data2[0].get("display_name", address2)
-        
+        # Geocode qua cache dùng chung: địa chỉ đã gặp không gọi Nominatim, địa chỉ chưa có
+        # được hỏi song song. Geocode + route chung 1 deadline, route quá hạn thì dùng Haversine
+        deadline = providers.Deadline()
+        found = []
+        for address, result in zip((address1, address2), geocode_many([address1, address2], deadline=deadline)):
+            if result is None:
+                return Response(
+                    {"detail": f"Không tìm thấy địa chỉ: {address}"},
+                    status=status.HTTP_404_NOT_FOUND
+                )
+            found.append(result)
+        coords1, coords2 = ({"lat": result.lat, "lng": result.lng} for result in found)
+        address1_formatted, address2_formatted = (result.formatted for result in found)
+
         # Kiểm tra tọa độ có trong khu vực Việt Nam không
         # Bbox Việt Nam: [102.144, 8.559, 109.465, 23.393]
         if not (102.144 <= coords1["lng"] <= 109.465 and 8.559 <= coords1["lat"] <= 23.393) or \
@@ -540,66 +532,25 @@ def calculate_distance_from_addresses_api(request):
                 status=status.HTTP_400_BAD_REQUEST
             )
         
-        # Tính khoảng cách đường đi thực tế bằng OSRM
-        url = "http://router.project-osrm.org/route/v1/driving/{lng1},{lat1};{lng2},{lat2}"
-        url = url.format(
-            lng1=coords1["lng"], 
-            lat1=coords1["lat"],
-            lng2=coords2["lng"], 
-            lat2=coords2["lat"]
-        )
-        params = {
-            "overview": "full",  # Lấy full geometry để vẽ route
-            "geometries": "geojson",  # Format GeoJSON
-            "steps": "false"  # Không cần chi tiết từng bước
-        }
-        
+        # Tính khoảng cách đường đi thực tế bằng OSRM (cache + geometry rút gọn như calculate_distance_api)
         try:
-            response = requests.get(url, params=params, timeout=15)
-            response.raise_for_status()
-            data = response.json()
-            
-            if data.get("code") == "Ok" and data.get("routes") and len(data["routes"]) > 0:
-                route = data["routes"][0]
-                distance_m = route["distance"]  # OSRM trả về mét
-                distance_km = round(distance_m / 1000, 2)
-                duration_seconds = round(route["duration"])  # OSRM trả về giây
-                geometry = route.get("geometry")
-                
+            route = get_route(coords1["lat"], coords1["lng"], coords2["lat"], coords2["lng"], deadline=deadline)
+            if route is not None:
                 return Response({
-                    "distance": distance_km,
-                    "duration": duration_seconds,
-                    "geometry": geometry,  # GeoJSON format từ OSRM
+                    "distance": route["distance"],
+                    "duration": route["duration"],
+                    **route_geometry(route["coordinates"], zoom, geometry_format),
                     "coords1": coords1,
                     "coords2": coords2,
                     "address1": address1_formatted,
                     "address2": address2_formatted,
                 })
         except requests.exceptions.RequestException as e:
+            # Fallback to Haversine nếu OSRM fail hoặc đang bị ngắt mạch (không chờ timeout)
             logger.warning(f"OSRM API error: {str(e)}, falling back to Haversine")
-            # Fallback to Haversine nếu OSRM fail
-            pass
-        
-        # Fallback: Tính khoảng cách bằng Haversine (đường chim bay)
-        from math import radians, cos, sin, asin, sqrt
-        
-        def haversine_distance(lat1, lon1, lat2, lon2):
-            """Tính khoảng cách giữa 2 điểm bằng Haversine formula (km)"""
-            R = 6371  # Bán kính Trái Đất (km)
-            lat1, lon1, lat2, lon2 = map(radians, [lat1, lon1, lat2, lon2])
-            dlat = lat2 - lat1
-            dlon = lon2 - lon1
-            a = sin(dlat/2)**2 + cos(lat1) * cos(lat2) * sin(dlon/2)**2
-            c = 2 * asin(sqrt(a))
-            return R * c
-        
-        distance_km = round(haversine_distance(
-            coords1["lat"], coords1["lng"],
-            coords2["lat"], coords2["lng"]
-        ), 2)
         
-        # Ước tính thời gian: giả sử tốc độ trung bình 60 km/h
-        duration_seconds = int((distance_km / 60) * 3600)
+        # Fallback: Tính khoảng cách bằng Haversine (đường chim bay), tốc độ trung bình 60 km/h
+        distance_km, duration_seconds = estimate_route(coords1["lat"], coords1["lng"], coords2["lat"], coords2["lng"])
         
         return Response({
             "distance": distance_km,
@@ -610,7 +561,7 @@ def calculate_distance_from_addresses_api(request):
             "address1": address1_formatted,
             "address2": address2_formatted,
         })
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, GeocodingError) as e:
         logger.error(f"Distance from addresses API error: {str(e)}")
         return Response(
             {"detail": f"Lỗi khi tính khoảng cách: {str(e)}"},
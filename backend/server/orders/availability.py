@@ -0,0 +1,301 @@
+"""
+Tìm xe trống theo khoảng thời gian cho toàn bộ đội xe
+
+Cùng quy tắc với ``check_schedule_conflict``: đơn bị hủy/hết hạn giữ chỗ hoặc
+thanh toán thất bại không chiếm lịch; đơn không có giờ được tính từ đầu ngày
+bắt đầu tới cuối ngày kết thúc. Điều kiện giao nhau được viết hoàn toàn bằng SQL.
+
+Xe có nhiều chiếc (``Xe.so_chiec``) thì 1 đơn trùng lịch chưa chắc là hết xe:
+``check_capacity`` lấy các đơn giao khoảng thời gian (1 query) rồi quét sweep-line
+qua các mốc bắt đầu/kết thúc để tìm số chiếc bị đặt đồng thời nhiều nhất,
+O(n log n) theo số đơn trùng lịch. Sức chứa là ``so_chiec`` chứ không phải
+``so_luong``: tồn kho bị trừ khi tạo đơn, so với nó thì mỗi đơn bị tính 2 lần.
+"""
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import datetime, time
+
+from django.db.models import F, IntegerField, OuterRef, Q, Subquery, Sum, TimeField, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from orders.models import Order, OrderItem
+from products.models import Xe
+
+# Đơn ở các trạng thái này không chiếm lịch xe
+INACTIVE_STATUSES = ("cancelled", "expired")
+FAILED_PAYMENT = "failed"
+# Query params của filter xe trống (/api/xe/, /api/xe/facets/)
+WINDOW_PARAMS = ("available_from", "available_to")
+
+
+def parse_window(start, end):
+    """
+    Parse khoảng thời gian từ query params ("2025-01-01" hoặc "2025-01-01T08:00:00")
+
+    Thiếu 1 đầu thì dùng đầu còn lại; ngày không có giờ được tính cả ngày.
+
+    Returns:
+        (start_datetime, end_datetime) hoặc None nếu không hợp lệ
+    """
+    start_dt = _parse_point(start or end, time.min)
+    end_dt = _parse_point(end or start, time.max)
+    if start_dt is None or end_dt is None or end_dt <= start_dt:
+        return None
+    return start_dt, end_dt
+
+
+def _parse_point(value, default_time):
+    value = (value or "").strip()
+    if not value:
+        return None
+    try:
+        # Thử ngày trước: parse_datetime cũng nhận "2025-01-01" (thành 00:00)
+        parsed = parse_date(value)
+        if parsed is not None:
+            return datetime.combine(parsed, default_time)
+        parsed = parse_datetime(value)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_aware(parsed):
+        # Ngày/giờ của đơn lưu theo giờ địa phương
+        parsed = timezone.make_naive(parsed)
+    return parsed
+
+
+def active_orders():
+    """Các đơn đang chiếm lịch xe"""
+    return Order.objects.exclude(status__in=INACTIVE_STATUSES).exclude(payment_status=FAILED_PAYMENT)
+
+
+def overlap_q(start_dt, end_dt, prefix=""):
+    """
+    Q cho đơn giao với [start_dt, end_dt) (prefix vd. "order__" khi lọc từ OrderItem)
+
+    Cần alias ``{prefix}start_t``/``{prefix}end_t`` từ ``with_time_bounds``. Điều kiện
+    ngày đứng trước để dùng index (end_date, start_date).
+    """
+    start_date, end_date = f"{prefix}start_date", f"{prefix}end_date"
+    start_t, end_t = f"{_alias_prefix(prefix)}start_t", f"{_alias_prefix(prefix)}end_t"
+    # Đơn bắt đầu trước khi khoảng cần xem kết thúc
+    starts_before_end = Q(**{f"{start_date}__lt": end_dt.date()}) | Q(
+        **{start_date: end_dt.date(), f"{start_t}__lt": end_dt.time()}
+    )
+    # Đơn kết thúc sau khi khoảng cần xem bắt đầu
+    ends_after_start = Q(**{f"{end_date}__gt": start_dt.date()}) | Q(
+        **{end_date: start_dt.date(), f"{end_t}__gt": start_dt.time()}
+    )
+    return (
+        Q(**{f"{end_date}__gte": start_dt.date(), f"{start_date}__lte": end_dt.date()})
+        & starts_before_end
+        & ends_after_start
+    )
+
+
+def _alias_prefix(prefix):
+    return prefix.replace("__", "_")
+
+
+def with_time_bounds(queryset, prefix=""):
+    """Alias giờ bắt đầu/kết thúc của đơn (không có giờ = đầu/cuối ngày)"""
+    alias = _alias_prefix(prefix)
+    return queryset.alias(**{
+        f"{alias}start_t": Coalesce(f"{prefix}start_time", Value(time.min, output_field=TimeField())),
+        f"{alias}end_t": Coalesce(f"{prefix}end_time", Value(time.max, output_field=TimeField())),
+    })
+
+
+def overlapping_orders(start_dt, end_dt, xe_id=None, exclude_order_id=None):
+    """Các đơn còn hiệu lực giao với [start_dt, end_dt), lọc theo xe nếu có"""
+    orders = with_time_bounds(active_orders()).filter(overlap_q(start_dt, end_dt))
+    if xe_id is not None:
+        orders = orders.filter(items__xe_id=xe_id).distinct()
+    if exclude_order_id:
+        orders = orders.exclude(id=exclude_order_id)
+    return orders
+
+
+def active_items():
+    """OrderItem của các đơn còn hiệu lực (kèm alias giờ bắt đầu/kết thúc của đơn)"""
+    items = OrderItem.objects.exclude(order__status__in=INACTIVE_STATUSES).exclude(
+        order__payment_status=FAILED_PAYMENT
+    )
+    return with_time_bounds(items, prefix="order__")
+
+
+def booked_items(start_dt, end_dt):
+    """OrderItem của các đơn còn hiệu lực giao với [start_dt, end_dt)"""
+    return active_items().filter(overlap_q(start_dt, end_dt, prefix="order__"))
+
+
+def unit_capacity(prefix=""):
+    """Biểu thức SQL số chiếc cho thuê theo lịch của xe (như Xe.unit_capacity)"""
+    return Coalesce(f"{prefix}so_chiec", Greatest(f"{prefix}so_luong", Value(0)))
+
+
+def booked_quantity(start_dt, end_dt):
+    """
+    Subquery tổng số chiếc của các đơn giao [start_dt, end_dt) cho từng xe (OuterRef "pk")
+
+    Là cận trên của số chiếc bị đặt đồng thời: tổng nhỏ hơn sức chứa thì xe chắc chắn còn trống.
+    """
+    total = (
+        booked_items(start_dt, end_dt).filter(xe_id=OuterRef("pk")).order_by()
+        .values("xe_id").annotate(total=Sum("quantity")).values("total")
+    )
+    return Coalesce(Subquery(total, output_field=IntegerField()), Value(0))
+
+
+def fully_booked_cars(start_dt, end_dt, cars=None):
+    """
+    ma_xe của các xe (trong queryset ``cars`` nếu có) không còn chiếc trống ở thời điểm
+    đông nhất trong [start_dt, end_dt)
+
+    Dùng cho filter xe trống của /api/xe/. Xe có tổng số chiếc đặt nhỏ hơn sức chứa bị loại
+    ngay trong SQL (``booked_quantity``); chỉ đơn của các xe còn lại được lấy về (1 query)
+    để sweep-line, nên xe nhiều chiếc có các đơn không chồng nhau vẫn hiện.
+    """
+    cars = Xe.objects.all() if cars is None else cars
+    candidates = cars.order_by().alias(
+        booked_total=booked_quantity(start_dt, end_dt), capacity=unit_capacity(),
+    ).filter(booked_total__gte=F("capacity")).values("pk")
+    by_car, capacities = {}, {}
+    rows = _interval_rows(
+        booked_items(start_dt, end_dt).filter(xe_id__in=candidates), unit_capacity("xe__")
+    )
+    for xe_id, _, begin, finish, quantity, capacity in rows:
+        by_car.setdefault(xe_id, []).append((begin, finish, quantity))
+        capacities[xe_id] = capacity
+    return [
+        xe_id for xe_id, intervals in by_car.items()
+        if peak_booked(intervals, start_dt, end_dt) >= capacities[xe_id]
+    ]
+
+
+CapacityCheck = namedtuple("CapacityCheck", "capacity peak_booked available order_ids")
+
+
+def booked_intervals(xe_id, start_dt, end_dt, exclude_order_id=None):
+    """
+    Các khoảng đã đặt của xe giao với [start_dt, end_dt)
+
+    Returns:
+        list (order_id, start_datetime, end_datetime, quantity)
+    """
+    items = booked_items(start_dt, end_dt).filter(xe_id=xe_id)
+    if exclude_order_id:
+        items = items.exclude(order_id=exclude_order_id)
+    return [row[1:] for row in _interval_rows(items)]
+
+
+def _interval_rows(items, *extra):
+    """(xe_id, order_id, start_datetime, end_datetime, quantity, *extra) của các OrderItem"""
+    rows = items.values_list(
+        "xe_id", "order_id", "order__start_date", "order__start_time", "order__end_date", "order__end_time",
+        "quantity", *extra,
+    )
+    return [
+        (
+            xe_id,
+            order_id,
+            datetime.combine(start_date, start_time or time.min),
+            datetime.combine(end_date, end_time or time.max),
+            quantity,
+            *rest,
+        )
+        for xe_id, order_id, start_date, start_time, end_date, end_time, quantity, *rest in rows
+    ]
+
+
+def peak_booked(intervals, start_dt, end_dt):
+    """
+    Số chiếc bị đặt đồng thời nhiều nhất trong [start_dt, end_dt) (sweep-line)
+
+    Args:
+        intervals: iterable (start_datetime, end_datetime, quantity), khoảng nửa mở
+    """
+    events = []
+    for begin, finish, quantity in intervals:
+        begin, finish = max(begin, start_dt), min(finish, end_dt)
+        if begin < finish:
+            events.append((begin, quantity))
+            events.append((finish, -quantity))
+    # Cùng thời điểm thì trả xe (delta âm) trước khi nhận xe: đơn nối tiếp không chồng nhau
+    events.sort()
+    peak = current = 0
+    for _, delta in events:
+        current += delta
+        peak = max(peak, current)
+    return peak
+
+
+def check_capacity(xe_id, start_dt, end_dt, quantity=1, capacity=None, exclude_order_id=None):
+    """
+    Kiểm tra xe còn đủ ``quantity`` chiếc trong suốt [start_dt, end_dt)
+
+    Args:
+        capacity: số chiếc của xe (mặc định Xe.unit_capacity)
+
+    Returns:
+        CapacityCheck; ``available`` là số chiếc còn trống ở thời điểm đông nhất,
+        ``order_ids`` là các đơn trùng lịch
+    """
+    if capacity is None:
+        capacity = Xe.objects.filter(pk=xe_id).values_list(unit_capacity(), flat=True).first() or 0
+    intervals = booked_intervals(xe_id, start_dt, end_dt, exclude_order_id=exclude_order_id)
+    peak = peak_booked(
+        ((begin, finish, booked) for _, begin, finish, booked in intervals), start_dt, end_dt
+    )
+    order_ids = sorted({order_id for order_id, *_ in intervals})
+    return CapacityCheck(capacity, peak, max(capacity - peak, 0), order_ids)
+
+
+def check_capacity_batch(checks):
+    """
+    ``check_capacity`` cho nhiều (xe_id, start_dt, end_dt) cùng lúc
+
+    1 query Xe (sức chứa so_chiec) + 1 query OrderItem cho mọi xe (mỗi xe lọc theo khoảng
+    bao các cửa sổ của xe đó), sau đó mỗi cửa sổ chỉ quét các đơn của xe có giờ bắt
+    đầu trước khi cửa sổ kết thúc (bisect trên danh sách đã sort).
+
+    Returns:
+        list CapacityCheck theo thứ tự ``checks`` (None nếu xe không tồn tại)
+    """
+    envelopes = {}
+    for xe_id, start_dt, end_dt in checks:
+        low, high = envelopes.get(xe_id, (start_dt, end_dt))
+        envelopes[xe_id] = (min(low, start_dt), max(high, end_dt))
+    if not envelopes:
+        return []
+
+    capacities = dict(Xe.objects.filter(pk__in=list(envelopes)).values_list("pk", unit_capacity()))
+    condition = Q()
+    for xe_id, (low, high) in envelopes.items():
+        if xe_id in capacities:
+            condition |= Q(xe_id=xe_id) & overlap_q(low, high, prefix="order__")
+
+    by_car = {}
+    if condition:
+        for xe_id, *interval in _interval_rows(active_items().filter(condition)):
+            by_car.setdefault(xe_id, []).append(interval)
+    starts = {}
+    for xe_id, intervals in by_car.items():
+        intervals.sort(key=lambda interval: interval[1])
+        starts[xe_id] = [interval[1] for interval in intervals]
+
+    results = []
+    for xe_id, start_dt, end_dt in checks:
+        if xe_id not in capacities:
+            results.append(None)
+            continue
+        intervals = by_car.get(xe_id, [])
+        candidates = [
+            interval for interval in intervals[:bisect_left(starts.get(xe_id, []), end_dt)]
+            if interval[2] > start_dt
+        ]
+        peak = peak_booked(((begin, finish, booked) for _, begin, finish, booked in candidates), start_dt, end_dt)
+        capacity = capacities[xe_id]
+        order_ids = sorted({order_id for order_id, *_ in candidates})
+        results.append(CapacityCheck(capacity, peak, max(capacity - peak, 0), order_ids))
+    return results
@@ -0,0 +1,96 @@
+"""
+Giữ từng chiếc xe cho đơn thuê (UnitBooking)
+
+``check_capacity`` chỉ là kiểm tra trước khi ghi: 2 request đồng thời vẫn có thể
+cùng thấy còn xe. Ở đây mỗi chiếc được ghi thành 1 dòng UnitBooking; trên
+PostgreSQL exclusion constraint ``unit_booking_no_overlap`` chặn 2 dòng cùng chiếc
+chồng lịch, request thua cuộc đua nhận IntegrityError, thử chiếc khác rồi mới báo
+hết xe (view trả 409).
+"""
+import logging
+from datetime import datetime, time
+
+from django.db import IntegrityError, connection, transaction
+from django.db.models import BooleanField
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+
+from orders.availability import FAILED_PAYMENT, INACTIVE_STATUSES
+from orders.models import UnitBooking
+
+logger = logging.getLogger(__name__)
+
+EXCLUSION_CONSTRAINT = "unit_booking_no_overlap"
+# Số lần chọn lại chiếc khi thua cuộc đua với request khác
+MAX_ATTEMPTS = 3
+
+
+class UnitsUnavailable(Exception):
+    """Không còn đủ chiếc trống trong khoảng thời gian"""
+
+    def __init__(self, xe, available):
+        self.xe = xe
+        self.available = available
+        super().__init__(f"Xe '{xe.ten_xe}' chỉ còn {available} chiếc trống trong thời gian thuê.")
+
+
+def order_period(order):
+    """[starts_at, ends_at) có timezone của đơn, None nếu đơn không có lịch"""
+    if not order.start_date or not order.end_date:
+        return None
+    starts_at = timezone.make_aware(datetime.combine(order.start_date, order.start_time or time.min))
+    ends_at = timezone.make_aware(datetime.combine(order.end_date, order.end_time or time.max))
+    return (starts_at, ends_at) if ends_at > starts_at else None
+
+
+def overlapping_bookings(xe_id, starts_at, ends_at):
+    """UnitBooking của xe giao với [starts_at, ends_at)"""
+    bookings = UnitBooking.objects.filter(xe_id=xe_id)
+    if connection.vendor == "postgresql":
+        # Dùng cột period để tra bằng GiST index của exclusion constraint
+        return bookings.filter(RawSQL(
+            "period && tstzrange(%s, %s, '[)')", (starts_at, ends_at), output_field=BooleanField(),
+        ))
+    return bookings.filter(starts_at__lt=ends_at, ends_at__gt=starts_at)
+
+
+def free_units(xe, starts_at, ends_at):
+    """Các chiếc (1..Xe.unit_capacity, không đổi khi tồn kho bị trừ) chưa bị giữ trong khoảng thời gian"""
+    busy = set(overlapping_bookings(xe.pk, starts_at, ends_at).values_list("unit", flat=True))
+    return [unit for unit in range(1, xe.unit_capacity + 1) if unit not in busy]
+
+
+def book_units(order, xe, quantity, starts_at, ends_at):
+    """
+    Giữ ``quantity`` chiếc của xe cho đơn
+
+    Raises:
+        UnitsUnavailable: không còn đủ chiếc trống (kể cả khi thua cuộc đua)
+    """
+    for attempt in range(MAX_ATTEMPTS):
+        units = free_units(xe, starts_at, ends_at)
+        if len(units) < quantity:
+            raise UnitsUnavailable(xe, len(units))
+        try:
+            # Savepoint: lỗi constraint không làm hỏng transaction của cả đơn
+            with transaction.atomic():
+                UnitBooking.objects.bulk_create([
+                    UnitBooking(order=order, xe=xe, unit=unit, starts_at=starts_at, ends_at=ends_at)
+                    for unit in units[:quantity]
+                ])
+            return
+        except IntegrityError as e:
+            if EXCLUSION_CONSTRAINT not in str(e):
+                raise
+            logger.info(f"Xe {xe.pk}: chiếc đã bị đơn khác giữ, chọn lại (lần {attempt + 1})")
+    raise UnitsUnavailable(xe, 0)
+
+
+def release_units(order):
+    """Trả các chiếc đã giữ của đơn (đơn bị hủy/hết hạn/thanh toán thất bại)"""
+    return UnitBooking.objects.filter(order=order).delete()[0]
+
+
+def holds_units(order):
+    """Đơn ở trạng thái này còn giữ chiếc xe không"""
+    return order.status not in INACTIVE_STATUSES and order.payment_status != FAILED_PAYMENT
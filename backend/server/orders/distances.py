@@ -0,0 +1,195 @@
+"""
+Ma trận khoảng cách đường đi giữa các Location đang hoạt động (phí nhận/trả xe)
+
+Mỗi Location có 1 LocationDistanceRow = 1 hàng của ma trận ({id đích: km}).
+``update_distance_matrix`` (lệnh update_distance_matrix) chỉ tính lại hàng và cột
+của các Location mới hoặc đã đổi địa chỉ, bằng tối đa 2 request OSRM table
+(sources = các Location đó, rồi destinations = các Location đó).
+
+Khi tính giá, ``location_distances`` giữ ma trận NumPy float32 [nguồn x đích]
+trong bộ nhớ mỗi process, tra bằng tên hoặc địa chỉ đã chuẩn hóa: O(1), không
+query. Ma trận được nạp lại (1 query) khi version cache (core.cache) của Location
+hoặc LocationDistanceRow đổi.
+"""
+import threading
+
+import numpy as np
+import requests
+from django.db import transaction
+from django.utils import timezone
+
+from core.cache import bump_version, get_versions
+from orders import providers
+from orders.geocoding import geocode, normalize_address
+from orders.models import LocationDistanceRow
+from products.models import Location
+
+
+def location_address(location):
+    """Địa chỉ dùng để geocode Location (địa chỉ chi tiết, không có thì dùng tên)"""
+    return location.dia_chi_chi_tiet.strip() or location.ten_dia_diem
+
+
+def osrm_table(points, sources=None, destinations=None):
+    """
+    Khoảng cách đường đi (km) giữa các điểm bằng OSRM table service
+
+    Args:
+        points: [(lat, lng)]
+        sources, destinations: chỉ số trong points (None = tất cả)
+
+    Returns:
+        np.ndarray float32 [len(sources) x len(destinations)], NaN = không có đường
+    """
+    coordinates = ";".join(f"{lng},{lat}" for lat, lng in points)
+    params = {"annotations": "distance"}
+    if sources is not None:
+        params["sources"] = ";".join(str(index) for index in sources)
+    if destinations is not None:
+        params["destinations"] = ";".join(str(index) for index in destinations)
+    response = providers.get("osrm", providers.osrm_url("table", coordinates), params=params, timeout=30)
+    response.raise_for_status()
+    data = response.json()
+    if data.get("code") != "Ok":
+        raise requests.exceptions.RequestException(f"OSRM table: {data.get('code')}")
+    meters = [[np.nan if value is None else value for value in row] for row in data["distances"]]
+    return (np.array(meters, dtype=np.float64) / 1000).astype(np.float32)
+
+
+def _km(value):
+    return None if np.isnan(value) else round(float(value), 2)
+
+
+def update_distance_matrix(full=False, fetch=None):
+    """
+    Tính lại hàng và cột của các Location đang hoạt động chưa có hàng hoặc đã đổi địa chỉ
+
+    Args:
+        full: tính lại toàn bộ ma trận
+        fetch: hàm thay cho osrm_table (test/benchmark)
+
+    Returns:
+        (id các Location đã tính lại, id các Location không geocode được)
+    """
+    fetch = fetch or osrm_table
+    rows = {row.location_id: row for row in LocationDistanceRow.objects.all()}
+    locations, points, addresses, missing = [], [], [], []
+    for location in Location.objects.filter(trang_thai=True).order_by("pk"):
+        address = location_address(location)
+        result = geocode(address)
+        if result is None:
+            missing.append(location.pk)
+            continue
+        locations.append(location)
+        points.append((result.lat, result.lng))
+        addresses.append(normalize_address(address))
+
+    ids = [location.pk for location in locations]
+    stale = {
+        index for index, location_id in enumerate(ids)
+        if full or location_id not in rows or rows[location_id].address != addresses[index]
+    }
+    for index, location_id in enumerate(ids):
+        if index in stale:
+            continue
+        # Location bật lại sau khi có Location mới: 2 hàng thiếu nhau, tính lại hàng cũ hơn
+        row = rows[location_id]
+        for other, other_id in enumerate(ids):
+            if other not in stale and other_id != location_id and str(other_id) not in row.distances:
+                stale.add(index if row.updated_at <= rows[other_id].updated_at else other)
+    stale = sorted(stale)
+    if not stale:
+        return [], missing
+
+    if len(stale) == len(locations):
+        matrix = fetch(points)
+        stale_rows, stale_columns = matrix, matrix
+    else:
+        stale_rows = fetch(points, sources=stale)
+        stale_columns = fetch(points, destinations=stale)
+
+    now = timezone.now()
+    updated, created = [], []
+    stale_ids = set()
+    for position, index in enumerate(stale):
+        location_id = ids[index]
+        stale_ids.add(location_id)
+        row = rows.get(location_id) or LocationDistanceRow(location_id=location_id)
+        row.address = addresses[index]
+        row.lat, row.lng = points[index]
+        row.updated_at = now
+        row.distances = {
+            str(destination): _km(value)
+            for destination, value in zip(ids, stale_rows[position]) if destination != location_id
+        }
+        (updated if row.pk else created).append(row)
+    for index, location_id in enumerate(ids):
+        if location_id in stale_ids:
+            continue
+        row = rows[location_id]
+        row.updated_at = now
+        for position, destination in enumerate(stale):
+            row.distances[str(ids[destination])] = _km(stale_columns[index, position])
+        updated.append(row)
+
+    with transaction.atomic():
+        LocationDistanceRow.objects.bulk_create(created)
+        LocationDistanceRow.objects.bulk_update(updated, ["address", "lat", "lng", "distances", "updated_at"])
+        # bulk_* không gửi signal: tự tăng version để các process nạp lại ma trận
+        bump_version(LocationDistanceRow)
+        transaction.on_commit(lambda: bump_version(LocationDistanceRow))
+    return sorted(stale_ids), missing
+
+
+class LocationDistances:
+    """Ma trận khoảng cách trong bộ nhớ, đánh chỉ số theo tên/địa chỉ Location"""
+
+    MODELS = (Location, LocationDistanceRow)
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.clear()
+
+    def clear(self):
+        with self._lock:
+            self.version = None
+            self.index = {}
+            self.matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def load(self, version=None):
+        """Nạp ma trận từ các LocationDistanceRow của Location đang hoạt động (1 query)"""
+        rows = list(
+            LocationDistanceRow.objects.filter(location__trang_thai=True).order_by("location_id").values_list(
+                "location_id", "location__ten_dia_diem", "location__dia_chi_chi_tiet", "distances",
+            )
+        )
+        positions = {location_id: position for position, (location_id, *_) in enumerate(rows)}
+        matrix = np.full((len(rows), len(rows)), np.nan, dtype=np.float32)
+        np.fill_diagonal(matrix, 0)
+        index = {}
+        for source, (location_id, name, address, distances) in enumerate(rows):
+            for key in (normalize_address(name), normalize_address(address)):
+                if key:
+                    index.setdefault(key, source)
+            for destination, km in distances.items():
+                position = positions.get(int(destination))
+                if position is not None and km is not None:
+                    matrix[source, position] = km
+        with self._lock:
+            self.index, self.matrix, self.version = index, matrix, version
+
+    def distance(self, origin, destination):
+        """Khoảng cách (km) giữa 2 Location theo tên/địa chỉ, None nếu không có trong ma trận"""
+        version = get_versions(self.MODELS)
+        if version != self.version:
+            self.load(version)
+        with self._lock:
+            source = self.index.get(normalize_address(origin))
+            target = self.index.get(normalize_address(destination))
+            if source is None or target is None:
+                return None
+            km = self.matrix[source, target]
+        return None if np.isnan(km) else float(km)
+
+
+location_distances = LocationDistances()
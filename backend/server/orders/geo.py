@@ -0,0 +1,87 @@
+"""
+Tính toán hình học cho API bản đồ, không gọi provider
+
+- Ước tính khoảng cách offline (đường chim bay), dùng khi provider bản đồ lỗi hoặc
+  đang bị ngắt mạch (orders.providers). Các hàm nhận số hoặc mảng NumPy
+  (broadcast), vd. khoảng cách từ 1 điểm tới nhiều điểm trong 1 lần gọi.
+- Rút gọn (Douglas–Peucker) và mã hóa (encoded polyline) geometry đường đi
+"""
+import numpy as np
+
+EARTH_RADIUS_KM = 6371
+# Tốc độ trung bình giả định để ước tính thời gian di chuyển
+AVERAGE_SPEED_KMH = 60
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Khoảng cách (km) theo công thức Haversine: float nếu đầu vào là số, ngược lại ndarray"""
+    lat1, lng1, lat2, lng2 = (np.radians(np.asarray(value, dtype=np.float64)) for value in (lat1, lng1, lat2, lng2))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    distance = 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+    return float(distance) if distance.ndim == 0 else distance
+
+
+def estimate_duration_seconds(distance_km):
+    """Thời gian di chuyển ước tính (giây) với AVERAGE_SPEED_KMH"""
+    return int(distance_km / AVERAGE_SPEED_KMH * 3600)
+
+
+def estimate_route(lat1, lng1, lat2, lng2):
+    """(khoảng cách km làm tròn 2 chữ số, thời gian giây) khi không có đường đi thực tế"""
+    distance_km = round(haversine_km(lat1, lng1, lat2, lng2), 2)
+    return distance_km, estimate_duration_seconds(distance_km)
+
+
+def zoom_tolerance(zoom):
+    """Sai số rút gọn (độ) ~1 pixel ở mức zoom của bản đồ tile 256px"""
+    return 360 / (256 * 2 ** zoom)
+
+
+def simplify(coordinates, tolerance):
+    """
+    Rút gọn đường [[lng, lat], ...] bằng Douglas–Peucker: bỏ các điểm lệch khỏi
+    đoạn nối 2 điểm giữ lại không quá tolerance (độ, kinh độ nhân cos vĩ độ)
+
+    Returns:
+        ndarray [[lng, lat], ...] gồm các điểm giữ lại, luôn có điểm đầu và cuối
+    """
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(points) <= 2 or tolerance <= 0:
+        return points
+    scaled = points.copy()
+    scaled[:, 0] *= np.cos(np.radians(points[:, 1].mean()))
+    keep = np.zeros(len(points), dtype=bool)
+    keep[[0, -1]] = True
+    stack = [(0, len(points) - 1)]
+    while stack:
+        start, end = stack.pop()
+        if end - start < 2:
+            continue
+        origin, direction = scaled[start], scaled[end] - scaled[start]
+        offsets = scaled[start + 1:end] - origin
+        length = np.hypot(*direction)
+        if length == 0:
+            distances = np.hypot(offsets[:, 0], offsets[:, 1])
+        else:
+            distances = np.abs(direction[0] * offsets[:, 1] - direction[1] * offsets[:, 0]) / length
+        farthest = int(distances.argmax())
+        if distances[farthest] > tolerance:
+            middle = start + 1 + farthest
+            keep[middle] = True
+            stack.extend(((start, middle), (middle, end)))
+    return points[keep]
+
+
+def encode_polyline(coordinates, precision=5):
+    """Mã hóa [[lng, lat], ...] thành encoded polyline (thứ tự lat,lng như Google/Leaflet)"""
+    points = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)[:, ::-1]
+    values = np.round(points * 10 ** precision).astype(np.int64)
+    deltas = np.diff(values, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    chunks = []
+    for value in deltas.tolist():
+        value = ~(value << 1) if value < 0 else value << 1
+        while value >= 0x20:
+            chunks.append(chr((0x20 | (value & 0x1f)) + 63))
+            value >>= 5
+        chunks.append(chr(value + 63))
+    return "".join(chunks)
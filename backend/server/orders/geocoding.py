@@ -0,0 +1,217 @@
+"""
+Geocode địa chỉ có cache, dùng chung cho tính giá (orders.utils) và các API bản đồ
+
+Địa chỉ được chuẩn hóa (chữ thường, gộp khoảng trắng, bỏ dấu câu thừa) rồi tra
+lần lượt:
+
+1. LRU trong bộ nhớ của process (tối đa GEOCODE_CACHE_SIZE địa chỉ)
+2. Bảng GeocodedAddress (dùng chung giữa các process, hết hạn sau GEOCODE_CACHE_TTL)
+3. Nominatim (OpenStreetMap), kết quả được ghi lại vào 2 tầng trên
+
+Địa chỉ không tìm thấy cũng được cache (GEOCODE_NEGATIVE_TTL, ngắn hơn) để không
+hỏi lại provider liên tục; lỗi mạng thì không cache. Nhiều địa chỉ (``geocode_many``)
+được tra database bằng 1 query và hỏi provider song song (orders.providers).
+"""
+import hashlib
+import logging
+import re
+import threading
+import unicodedata
+from collections import OrderedDict, namedtuple
+from datetime import timedelta
+from functools import partial
+
+import requests
+from django.conf import settings
+from django.utils import timezone
+
+from orders import providers
+from orders.models import GeocodedAddress
+
+logger = logging.getLogger(__name__)
+
+NOMINATIM_URL = "https://nominatim.openstreetmap.org/search"
+# Bbox Việt Nam: viewbox format left,top,right,bottom
+VIETNAM_VIEWBOX = "102.144,23.393,109.465,8.559"
+
+GeocodeResult = namedtuple("GeocodeResult", ["lat", "lng", "formatted"])
+
+
+class GeocodingError(Exception):
+    """Provider lỗi (mạng, HTTP status): khác với không tìm thấy địa chỉ"""
+
+
+def normalize_address(address):
+    """Khóa cache của địa chỉ: NFC, chữ thường, gộp khoảng trắng, bỏ dấu câu ở 2 đầu"""
+    address = unicodedata.normalize("NFC", address or "").lower()
+    address = re.sub(r"\s*,\s*", ", ", address)
+    address = re.sub(r"\s+", " ", address)
+    return address.strip(" ,.;")
+
+
+def _address_hash(key):
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+def _ttl(result):
+    if result is None:
+        return timedelta(seconds=getattr(settings, "GEOCODE_NEGATIVE_TTL", 3600))
+    return timedelta(seconds=getattr(settings, "GEOCODE_CACHE_TTL", 30 * 24 * 3600))
+
+
+def lookup_nominatim(address, deadline=None):
+    """
+    Gọi Nominatim (giới hạn trong Việt Nam)
+
+    Returns:
+        GeocodeResult hoặc None nếu không tìm thấy
+
+    Raises:
+        GeocodingError: lỗi mạng/HTTP hoặc hết deadline
+    """
+    params = {
+        "q": address + ", Vietnam",
+        "format": "json",
+        "limit": 1,
+        "countrycodes": "vn",  # Chỉ tìm trong Việt Nam
+        "bounded": "1",  # Chỉ tìm trong bbox
+        "viewbox": VIETNAM_VIEWBOX,
+    }
+    try:
+        response = providers.get(
+            "nominatim", getattr(settings, "NOMINATIM_URL", NOMINATIM_URL), params=params,
+            timeout=getattr(settings, "GEOCODE_TIMEOUT", 5), deadline=deadline,
+        )
+        response.raise_for_status()
+        data = response.json()
+    except (requests.exceptions.RequestException, ValueError) as e:
+        raise GeocodingError(str(e)) from e
+    if not data:
+        return None
+    return GeocodeResult(float(data[0]["lat"]), float(data[0]["lon"]), data[0].get("display_name", address))
+
+
+class GeocodeCache:
+    """LRU (address_hash -> (GeocodeResult | None, expires_at)) trước bảng GeocodedAddress"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.entries = OrderedDict()
+
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+
+    def get(self, address_hash):
+        """(True, kết quả) nếu còn hạn trong bộ nhớ, ngược lại (False, None)"""
+        with self._lock:
+            entry = self.entries.get(address_hash)
+            if entry is None:
+                return False, None
+            if entry[1] <= timezone.now():
+                del self.entries[address_hash]
+                return False, None
+            self.entries.move_to_end(address_hash)
+            return True, entry[0]
+
+    def put(self, address_hash, result, expires_at):
+        with self._lock:
+            self.entries[address_hash] = (result, expires_at)
+            self.entries.move_to_end(address_hash)
+            while len(self.entries) > getattr(settings, "GEOCODE_CACHE_SIZE", 4096):
+                self.entries.popitem(last=False)
+
+    def lookup(self, address, fetch=None, deadline=None):
+        """
+        Tọa độ của địa chỉ (LRU -> database -> provider)
+
+        Returns:
+            GeocodeResult hoặc None nếu không tìm thấy
+
+        Raises:
+            GeocodingError: provider lỗi và chưa có cache
+        """
+        return self.lookup_many([address], fetch=fetch, deadline=deadline)[0]
+
+    def lookup_many(self, addresses, fetch=None, deadline=None):
+        """
+        Như lookup cho nhiều địa chỉ: 1 query database cho các địa chỉ chưa có trong
+        LRU, các địa chỉ còn thiếu hỏi provider song song (chờ tối đa tới deadline)
+
+        Returns:
+            [GeocodeResult | None] theo thứ tự addresses
+        """
+        fetch = fetch or lookup_nominatim
+        keys = [normalize_address(address) for address in addresses]
+        hashes = [_address_hash(key) if key else None for key in keys]
+        results, misses = {}, {}
+        for address, key, address_hash in zip(addresses, keys, hashes):
+            if address_hash is None or address_hash in results or address_hash in misses:
+                continue
+            found, result = self.get(address_hash)
+            if found:
+                results[address_hash] = result
+            else:
+                misses[address_hash] = (address.strip(), key)
+
+        if misses:
+            rows = GeocodedAddress.objects.filter(address_hash__in=list(misses), expires_at__gt=timezone.now())
+            for row in rows:
+                result = GeocodeResult(row.lat, row.lng, row.formatted) if row.lat is not None else None
+                self.put(row.address_hash, result, row.expires_at)
+                results[row.address_hash] = result
+                del misses[row.address_hash]
+
+        if misses:
+            def call(address):
+                # Trả lỗi như giá trị: địa chỉ khác đã geocode được vẫn được cache
+                try:
+                    return fetch(address, deadline=deadline)
+                except GeocodingError as e:
+                    return e
+
+            try:
+                fetched = providers.run_parallel(
+                    [partial(call, address) for address, _ in misses.values()], deadline,
+                )
+            except providers.DeadlineExceeded as e:
+                raise GeocodingError(str(e)) from e
+            errors = []
+            for (address_hash, (address, key)), result in zip(misses.items(), fetched):
+                if isinstance(result, GeocodingError):
+                    errors.append(result)
+                    continue
+                self.store(address_hash, key, result)
+                results[address_hash] = result
+            if errors:
+                raise errors[0]
+
+        return [results.get(address_hash) for address_hash in hashes]
+
+    def store(self, address_hash, key, result):
+        """Ghi kết quả từ provider vào database và LRU"""
+        expires_at = timezone.now() + _ttl(result)
+        GeocodedAddress.objects.update_or_create(
+            address_hash=address_hash,
+            defaults={
+                "address": key[:500],
+                "lat": result.lat if result else None,
+                "lng": result.lng if result else None,
+                "formatted": (result.formatted if result else "")[:500],
+                "expires_at": expires_at,
+            },
+        )
+        self.put(address_hash, result, expires_at)
+
+
+geocode_cache = GeocodeCache()
+
+
+def geocode(address, deadline=None):
+    """Tọa độ của địa chỉ qua cache dùng chung (xem GeocodeCache.lookup)"""
+    return geocode_cache.lookup(address, deadline=deadline)
+
+
+def geocode_many(addresses, deadline=None):
+    """Tọa độ của nhiều địa chỉ, provider được gọi song song (xem GeocodeCache.lookup_many)"""
+    return geocode_cache.lookup_many(addresses, deadline=deadline)
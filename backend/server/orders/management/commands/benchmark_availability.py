@@ -0,0 +1,68 @@
+from datetime import datetime, time, timedelta
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from core.benchmarks import format_timing, measure, rollback_after, seed_cars, seed_orders
+from orders.availability import booked_intervals, check_capacity, peak_booked
+from products.models import Xe
+
+
+def naive_peak(intervals, start_dt, end_dt):
+    """Cách cũ để so sánh: đếm số đơn phủ từng mốc bắt đầu, O(n^2)"""
+    points = [start_dt] + [begin for begin, _, _ in intervals if start_dt < begin < end_dt]
+    return max(
+        (sum(quantity for begin, finish, quantity in intervals if begin <= point < finish) for point in points),
+        default=0,
+    )
+
+
+class Command(BaseCommand):
+    help = "Benchmark kiểm tra số chiếc còn trống (sweep-line) cho 1 xe có hàng nghìn đơn (seed rồi rollback)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--bookings", type=int, default=5000)
+        parser.add_argument("--capacity", type=int, default=50, help="Số chiếc của xe (so_chiec)")
+        parser.add_argument("--days", type=int, default=365, help="Đơn trải trong bao nhiêu ngày gần đây")
+        parser.add_argument("--repeat", type=int, default=10)
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        with rollback_after():
+            self.stdout.write(f"Seeding 1 xe ({options['capacity']} chiếc), {options['bookings']} đơn...")
+            seed_cars(1, prefix="A")
+            xe = Xe.objects.get(ma_xe="A000000000")
+            Xe.objects.filter(pk=xe.pk).update(so_chiec=options["capacity"])
+            user = User.objects.create_user(username="bench_availability", password="bench-pass")
+            seed_orders(options["bookings"], [xe.pk], [user], days=options["days"])
+
+            today = timezone.localdate()
+            windows = [
+                ("1 ngày", 1),
+                ("30 ngày", 30),
+                (f"{options['days']} ngày", options["days"]),
+            ]
+            for label, length in windows:
+                start_dt = datetime.combine(today - timedelta(days=length - 1), time.min)
+                end_dt = datetime.combine(today, time.max)
+                rows = booked_intervals(xe.pk, start_dt, end_dt)
+                intervals = [(begin, finish, quantity) for _, begin, finish, quantity in rows]
+                peak = peak_booked(intervals, start_dt, end_dt)
+                if peak != naive_peak(intervals, start_dt, end_dt):
+                    self.stderr.write(self.style.ERROR(f"Sai lệch kết quả ở khoảng {label}"))
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"\n===== Khoảng {label}: {len(intervals)} đơn trùng lịch, đông nhất {peak} chiếc ====="
+                ))
+                self.stdout.write(format_timing(
+                    "sweep-line (Python)", measure(lambda: peak_booked(intervals, start_dt, end_dt), repeat=repeat)
+                ))
+                self.stdout.write(format_timing(
+                    "đếm theo từng mốc O(n^2)", measure(lambda: naive_peak(intervals, start_dt, end_dt), repeat=repeat)
+                ))
+                self.stdout.write(format_timing(
+                    "check_capacity (query + sweep)",
+                    measure(lambda: check_capacity(xe.pk, start_dt, end_dt, capacity=options["capacity"]), repeat=repeat),
+                ))
+
+        self.stdout.write(self.style.SUCCESS("\nBenchmark xong, dữ liệu seed đã được rollback."))
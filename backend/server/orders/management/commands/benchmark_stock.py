@@ -0,0 +1,71 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+from core.benchmarks import format_timing, measure, rollback_after, seed_cars
+from orders.models import Order, OrderItem
+from orders.stock import decrement_stock, lock_cars
+from products.models import Xe
+
+
+def price_of(xe):
+    return xe.gia_thue if xe.gia_thue else (xe.gia_khuyen_mai if xe.gia_khuyen_mai else xe.gia)
+
+
+def per_item_order(user, items):
+    """Cách cũ để so sánh: get + OrderItem.create + xe.save() cho từng dòng"""
+    cars = [(Xe.objects.select_for_update().get(pk=xe_id), quantity) for xe_id, quantity in items]
+    order = Order.objects.create(user=user, total_price=sum(price_of(xe) * quantity for xe, quantity in cars))
+    for xe, quantity in cars:
+        OrderItem.objects.create(order=order, xe=xe, quantity=quantity, price_at_purchase=price_of(xe))
+        xe.so_luong -= quantity
+        xe.save()
+    return order
+
+
+def bulk_order(user, items):
+    """Cách mới: 1 SELECT ... FOR UPDATE, 1 bulk INSERT, 1 UPDATE có điều kiện"""
+    cars = lock_cars(xe_id for xe_id, _ in items)
+    order = Order.objects.create(
+        user=user, total_price=sum(price_of(cars[xe_id]) * quantity for xe_id, quantity in items),
+    )
+    OrderItem.objects.bulk_create([
+        OrderItem(order=order, xe=cars[xe_id], quantity=quantity, price_at_purchase=price_of(cars[xe_id]))
+        for xe_id, quantity in items
+    ])
+    decrement_stock(dict(items))
+    return order
+
+
+class Command(BaseCommand):
+    help = "Benchmark tạo đơn nhiều xe: trừ kho từng dòng so với trừ kho theo lô (seed rồi rollback)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cars", type=int, default=200)
+        parser.add_argument("--items", type=int, nargs="+", default=[1, 5, 20], help="Số xe mỗi đơn")
+        parser.add_argument("--repeat", type=int, default=30)
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        with rollback_after():
+            self.stdout.write(f"Seeding {options['cars']} xe...")
+            seed_cars(options["cars"], prefix="S")
+            # Đủ hàng cho mọi lần đo
+            Xe.objects.filter(ma_xe__startswith="S").update(so_luong=1_000_000)
+            cars = sorted(Xe.objects.filter(ma_xe__startswith="S").values_list("pk", flat=True))
+            user = User.objects.create_user(username="bench_stock", password="bench-pass")
+
+            for size in options["items"]:
+                items = [(xe_id, 1) for xe_id in cars[:size]]
+                self.stdout.write(self.style.MIGRATE_HEADING(f"\n===== Đơn {size} xe ====="))
+                for label, create in (("từng dòng (get/create/save)", per_item_order), ("theo lô", bulk_order)):
+                    with CaptureQueriesContext(connection) as queries:
+                        create(user, items)
+                    stats = measure(lambda: create(user, items), repeat=repeat)
+                    self.stdout.write(
+                        f"{format_timing(label, stats)}  {len(queries):4d} query  "
+                        f"~{1000 / stats['mean']:7.1f} đơn/s"
+                    )
+
+        self.stdout.write(self.style.SUCCESS("\nBenchmark xong, dữ liệu seed đã được rollback."))
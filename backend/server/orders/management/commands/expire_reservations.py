@@ -0,0 +1,61 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from django.utils import timezone
+
+from orders.reservations import ReservationDeadlines, expire_reservations
+
+
+class Command(BaseCommand):
+    help = (
+        "Chạy liên tục, hết hạn các đơn giữ chỗ đúng mốc reserved_until "
+        "(ngủ theo min-heap các mốc sắp tới, nạp lại heap định kỳ)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Hết hạn các đơn đã quá hạn rồi thoát (dùng cho cron)")
+        parser.add_argument(
+            "--refresh", type=float, default=60,
+            help="Số giây tối đa giữa 2 lần nạp lại heap (để thấy đơn giữ chỗ mới)",
+        )
+        parser.add_argument("--lookahead", type=int, default=1000, help="Số mốc gần nhất giữ trong heap")
+
+    def expire(self):
+        expired = expire_reservations()
+        if expired:
+            self.stdout.write(f"{timezone.now():%Y-%m-%d %H:%M:%S} hết hạn {len(expired)} đơn: {expired[:20]}")
+        return expired
+
+    def handle(self, *args, **options):
+        if options["once"]:
+            self.stdout.write(self.style.SUCCESS(f"Đã hết hạn {len(self.expire())} đơn giữ chỗ."))
+            return
+
+        refresh = options["refresh"]
+        deadlines = ReservationDeadlines(lookahead=options["lookahead"])
+        loaded_at = None
+        self.stdout.write(f"Theo dõi hạn giữ chỗ (nạp lại mỗi {refresh:g}s), Ctrl+C để dừng...")
+        try:
+            while True:
+                close_old_connections()
+                if loaded_at is None or time.monotonic() - loaded_at >= refresh or (
+                    not deadlines and deadlines.truncated
+                ):
+                    # Nạp lại sau khi expire: các đơn quá hạn lúc ngủ cũng được xử lý ngay
+                    self.expire()
+                    deadlines.load()
+                    loaded_at = time.monotonic()
+
+                now = timezone.now()
+                if deadlines.pop_due(now):
+                    self.expire()
+
+                wait = refresh - (time.monotonic() - loaded_at)
+                next_deadline = deadlines.next_deadline()
+                if next_deadline is not None:
+                    wait = min(wait, (next_deadline - now).total_seconds())
+                # reserved_until < now: ngủ quá mốc 1 chút để UPDATE thấy đơn đã hết hạn
+                time.sleep(max(wait, 0) + 0.01)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS("\nĐã dừng."))
@@ -0,0 +1,24 @@
+import requests
+from django.core.management.base import BaseCommand, CommandError
+
+from orders.distances import update_distance_matrix
+from orders.geocoding import GeocodingError
+
+
+class Command(BaseCommand):
+    help = (
+        "Tính ma trận khoảng cách đường đi giữa các Location đang hoạt động "
+        "(mặc định chỉ hàng/cột của Location mới hoặc đã đổi địa chỉ)"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Tính lại toàn bộ ma trận")
+
+    def handle(self, *args, **options):
+        try:
+            updated, missing = update_distance_matrix(full=options["full"])
+        except (requests.exceptions.RequestException, GeocodingError) as e:
+            raise CommandError(f"Không tính được ma trận khoảng cách: {e}")
+        if missing:
+            self.stdout.write(self.style.WARNING(f"Không geocode được {len(missing)} địa điểm: {missing}"))
+        self.stdout.write(self.style.SUCCESS(f"Đã tính lại {len(updated)} địa điểm: {updated}"))
@@ -0,0 +1,25 @@
+# Generated by Django 6.0 on 2026-01-10 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_coupon_order_actual_return_date_and_more'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['end_date', 'start_date'], name='order_period_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(condition=models.Q(('status', 'reserved')), fields=['reserved_until'], name='order_reserved_until_idx'),
+        ),
+    ]
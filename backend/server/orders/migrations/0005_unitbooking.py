@@ -0,0 +1,96 @@
+# Generated by Django 6.0 on 2026-01-12 10:05
+
+from datetime import datetime, time
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+# Cột period + exclusion constraint chỉ có trên PostgreSQL (cần btree_gist cho "xe_id WITH =")
+CREATE_EXCLUSION_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    "ALTER TABLE orders_unitbooking ADD COLUMN period tstzrange "
+    "GENERATED ALWAYS AS (tstzrange(starts_at, ends_at, '[)')) STORED",
+    "ALTER TABLE orders_unitbooking ADD CONSTRAINT unit_booking_no_overlap "
+    "EXCLUDE USING gist (xe_id WITH =, unit WITH =, period WITH &&)",
+]
+DROP_EXCLUSION_SQL = [
+    "ALTER TABLE orders_unitbooking DROP CONSTRAINT IF EXISTS unit_booking_no_overlap",
+    "ALTER TABLE orders_unitbooking DROP COLUMN IF EXISTS period",
+]
+
+
+def create_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for statement in CREATE_EXCLUSION_SQL:
+        schema_editor.execute(statement)
+
+
+def drop_exclusion_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    for statement in DROP_EXCLUSION_SQL:
+        schema_editor.execute(statement)
+
+
+def backfill_bookings(apps, schema_editor):
+    """
+    Giữ chiếc cho các đơn thuê chưa kết thúc: mỗi đơn lấy chiếc trống có số nhỏ nhất.
+    Dữ liệu cũ có thể đã đặt trùng (kiểm tra trước khi ghi không khóa) nên cho phép
+    số chiếc vượt so_luong thay vì làm hỏng migration.
+    """
+    OrderItem = apps.get_model("orders", "OrderItem")
+    UnitBooking = apps.get_model("orders", "UnitBooking")
+
+    items = (
+        OrderItem.objects.filter(order__end_date__gte=timezone.localdate(), order__start_date__isnull=False)
+        .exclude(order__status__in=("cancelled", "expired"))
+        .exclude(order__payment_status="failed")
+        .select_related("order")
+        .order_by("xe_id", "order__start_date", "order_id")
+    )
+    busy = {}
+    bookings = []
+    for item in items:
+        order = item.order
+        starts_at = timezone.make_aware(datetime.combine(order.start_date, order.start_time or time.min))
+        ends_at = timezone.make_aware(datetime.combine(order.end_date, order.end_time or time.max))
+        if ends_at <= starts_at:
+            continue
+        taken = busy.setdefault(item.xe_id, [])
+        for _ in range(max(item.quantity, 0)):
+            overlapping = {unit for unit, begin, finish in taken if begin < ends_at and finish > starts_at}
+            unit = next(number for number in range(1, len(overlapping) + 2) if number not in overlapping)
+            taken.append((unit, starts_at, ends_at))
+            bookings.append(UnitBooking(
+                order_id=order.id, xe_id=item.xe_id, unit=unit, starts_at=starts_at, ends_at=ends_at,
+            ))
+    UnitBooking.objects.bulk_create(bookings, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0004_order_hot_filter_indexes'),
+        ('products', '0011_xe_catalog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UnitBooking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('unit', models.PositiveSmallIntegerField(help_text='Số thứ tự chiếc xe (1..so_luong)')),
+                ('starts_at', models.DateTimeField()),
+                ('ends_at', models.DateTimeField()),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unit_bookings', to='orders.order')),
+                ('xe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='unit_bookings', to='products.xe')),
+            ],
+            options={
+                'constraints': [models.CheckConstraint(condition=models.Q(('ends_at__gt', models.F('starts_at'))), name='unit_booking_period_valid')],
+            },
+        ),
+        migrations.RunPython(create_exclusion_constraint, drop_exclusion_constraint),
+        migrations.RunPython(backfill_bookings, migrations.RunPython.noop),
+    ]
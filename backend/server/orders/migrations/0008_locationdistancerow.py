@@ -0,0 +1,27 @@
+# Generated by Django 6.0 on 2026-01-17 09:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0007_geocodedaddress'),
+        ('products', '0011_xe_catalog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LocationDistanceRow',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('address', models.CharField(help_text='Địa chỉ đã chuẩn hóa lúc tính', max_length=500)),
+                ('lat', models.FloatField()),
+                ('lng', models.FloatField()),
+                ('distances', models.JSONField(default=dict)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('location', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='distance_row', to='products.location')),
+            ],
+        ),
+    ]
@@ -1,6 +1,6 @@
 from django.db import models
 from users.models import NhanVien, KhachHang, NCC
-from products.models import Xe
+from products.models import Location, Xe
 
 
 # ==================== Billing Models ====================
@@ -199,9 +199,103 @@ class Order(models.Model):
     # Giữ chỗ
     reserved_until = models.DateTimeField(null=True, blank=True, help_text="Thời hạn giữ chỗ (timeout)")
 
+    class Meta:
+        indexes = [
+            # Danh sách đơn của user (OrderViewSet, mới nhất trước)
+            models.Index(fields=["user", "-created_at"], name="order_user_created_idx"),
+            # Đơn giao với 1 khoảng ngày (lịch xe): end_date đứng đầu vì đơn chủ yếu là
+            # lịch sử, end_date >= ngày cần xem lọc được gần hết. Không dùng partial index
+            # theo status: điều kiện NOT IN (tham số) không khớp được partial index trên SQLite
+            models.Index(fields=["end_date", "start_date"], name="order_period_idx"),
+            # Danh sách admin (/order/summary/): keyset theo (created_at, id), lọc kèm
+            # status/payment_status hoặc khoảng ngày tạo
+            models.Index(fields=["-created_at", "-id"], name="order_created_idx"),
+            models.Index(fields=["status", "-created_at", "-id"], name="order_status_created_idx"),
+            models.Index(fields=["payment_status", "-created_at", "-id"], name="order_payment_created_idx"),
+            # release_expired_reservations: chỉ index các đơn đang giữ chỗ
+            models.Index(
+                fields=["reserved_until"], name="order_reserved_until_idx",
+                condition=models.Q(status="reserved"),
+            ),
+        ]
+
     def __str__(self):
         return f"Order #{self.id} - {self.user.username}"
 
+    def check_reservation_expired(self):
+        """Đơn giữ chỗ đã quá reserved_until thì chuyển sang expired (True nếu đã hết hạn)"""
+        from django.utils import timezone
+        from orders.reservations import expire_reservations
+
+        if self.status == "expired":
+            return True
+        if self.status != "reserved" or not self.reserved_until or self.reserved_until >= timezone.now():
+            return False
+        if not expire_reservations(order_ids=[self.pk]):
+            # Worker khác vừa expire đơn này
+            self.refresh_from_db(fields=["status"])
+            return self.status == "expired"
+        self.status = "expired"
+        return True
+
+
+class UnitBooking(models.Model):
+    """
+    Lịch của từng chiếc xe (xe có so_chiec chiếc, đánh số 1..so_chiec)
+
+    Chỉ đơn thuê còn hiệu lực mới có dòng ở đây. Trên PostgreSQL bảng có thêm cột
+    ``period`` (tstzrange [starts_at, ends_at) sinh tự động) và exclusion constraint
+    GiST: cùng xe, cùng chiếc thì các khoảng không được chồng nhau (migration 0005),
+    nên 2 đơn đặt cùng lúc không thể cùng giữ 1 chiếc.
+    """
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="unit_bookings")
+    xe = models.ForeignKey(Xe, on_delete=models.CASCADE, related_name="unit_bookings")
+    unit = models.PositiveSmallIntegerField(help_text="Số thứ tự chiếc xe (1..so_luong)")
+    starts_at = models.DateTimeField()
+    ends_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(condition=models.Q(ends_at__gt=models.F("starts_at")), name="unit_booking_period_valid"),
+        ]
+
+    def __str__(self):
+        return f"{self.xe_id} #{self.unit} ({self.starts_at} - {self.ends_at})"
+
+
+class GeocodedAddress(models.Model):
+    """
+    Cache geocode theo địa chỉ đã chuẩn hóa (orders.geocoding), dùng chung cho tính
+    giá và các API bản đồ. lat/lng rỗng = provider không tìm thấy (cache ngắn hơn).
+    """
+    address_hash = models.CharField(max_length=64, unique=True, help_text="sha256 của địa chỉ đã chuẩn hóa")
+    address = models.CharField(max_length=500)
+    lat = models.FloatField(null=True, blank=True)
+    lng = models.FloatField(null=True, blank=True)
+    formatted = models.CharField(max_length=500, blank=True)
+    expires_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.address
+
+
+class LocationDistanceRow(models.Model):
+    """
+    1 hàng của ma trận khoảng cách đường đi giữa các Location (orders.distances):
+    distances = {id Location đích: km}. address/lat/lng là địa chỉ và tọa độ lúc
+    tính, địa chỉ hiện tại khác address = Location đã dời, cần tính lại hàng và cột.
+    """
+    location = models.OneToOneField(Location, on_delete=models.CASCADE, related_name="distance_row")
+    address = models.CharField(max_length=500, help_text="Địa chỉ đã chuẩn hóa lúc tính")
+    lat = models.FloatField()
+    lng = models.FloatField()
+    distances = models.JSONField(default=dict)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.location_id}: {len(self.distances)} điểm đến"
+
 
 class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="items")
@@ -0,0 +1,171 @@
+"""
+Lịch chiếm dụng theo ngày của cả đội xe (cho /api/xe/calendar/?month=)
+
+Mỗi tháng được build 1 lần (1 query OrderItem) thành ma trận NumPy uint8
+[xe x ngày]: giá trị là số chiếc bị đặt trong ngày (tối đa 255). Đơn được tính
+mọi ngày từ start_date tới end_date, chỉ đơn còn hiệu lực (xem orders.availability).
+Sau đó mỗi thay đổi của đơn/OrderItem chỉ trừ phần đóng góp cũ và cộng phần
+mới của đơn đó (orders/signals.py), không build lại cả tháng.
+
+Lịch là process-local như autocomplete index: mỗi worker giữ tối đa
+OCCUPANCY_CALENDAR_MONTHS tháng gần dùng nhất, tự build lại sau
+OCCUPANCY_CALENDAR_MAX_AGE giây để bắt kịp thay đổi từ các process khác.
+"""
+import calendar
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.utils import timezone
+
+from orders.availability import active_items
+
+MAX_UNITS = np.iinfo(np.uint8).max
+
+
+def month_bounds(first_day):
+    """(ngày đầu, ngày cuối, số ngày) của tháng chứa first_day"""
+    first_day = first_day.replace(day=1)
+    days = calendar.monthrange(first_day.year, first_day.month)[1]
+    return first_day, first_day + timedelta(days=days - 1), days
+
+
+class MonthOccupancy:
+    """Ma trận chiếm dụng của 1 tháng"""
+    __slots__ = ("first_day", "last_day", "days", "rows", "matrix", "contributions", "built_at")
+
+    def __init__(self, first_day):
+        self.first_day, self.last_day, self.days = month_bounds(first_day)
+        self.rows = {}
+        self.matrix = np.zeros((0, self.days), dtype=np.uint8)
+        # order_id -> [(xe_id, ngày đầu, ngày cuối, số chiếc)] đã cộng vào ma trận
+        self.contributions = {}
+        self.built_at = time.monotonic()
+
+    def clip(self, start_date, end_date):
+        """Khoảng offset ngày [start, end] của đơn trong tháng, None nếu không giao"""
+        if start_date > self.last_day or end_date < self.first_day:
+            return None
+        start = max(start_date, self.first_day) - self.first_day
+        end = min(end_date, self.last_day) - self.first_day
+        return start.days, end.days
+
+    def fill(self, bookings):
+        """Build ma trận từ [(order_id, xe_id, start_date, end_date, quantity)] bằng mảng hiệu"""
+        spans = []
+        for order_id, xe_id, start_date, end_date, quantity in bookings:
+            span = self.clip(start_date, end_date)
+            if span is None or quantity <= 0:
+                continue
+            self.contributions.setdefault(order_id, []).append((xe_id, *span, quantity))
+            spans.append((self.rows.setdefault(xe_id, len(self.rows)), *span, quantity))
+        diff = np.zeros((len(self.rows), self.days + 1), dtype=np.int32)
+        if spans:
+            rows, starts, ends, quantities = (np.array(column) for column in zip(*spans))
+            np.add.at(diff, (rows, starts), quantities)
+            np.add.at(diff, (rows, ends + 1), -quantities)
+        self.matrix = np.clip(np.cumsum(diff[:, :-1], axis=1), 0, MAX_UNITS).astype(np.uint8)
+
+    def apply(self, xe_id, start, end, delta):
+        row = self.rows.get(xe_id)
+        if row is None:
+            row = self.rows[xe_id] = len(self.rows)
+            self.matrix = np.vstack([self.matrix, np.zeros((1, self.days), dtype=np.uint8)])
+        values = self.matrix[row, start:end + 1].astype(np.int16) + delta
+        self.matrix[row, start:end + 1] = np.clip(values, 0, MAX_UNITS)
+
+    def replace_order(self, order_id, bookings):
+        """Thay phần đóng góp của 1 đơn bằng [(xe_id, start_date, end_date, quantity)] mới"""
+        for xe_id, start, end, quantity in self.contributions.pop(order_id, ()):
+            self.apply(xe_id, start, end, -quantity)
+        spans = []
+        for xe_id, start_date, end_date, quantity in bookings:
+            span = self.clip(start_date, end_date)
+            if span is not None and quantity > 0:
+                self.apply(xe_id, *span, quantity)
+                spans.append((xe_id, *span, quantity))
+        if spans:
+            self.contributions[order_id] = spans
+
+    def row(self, xe_id):
+        index = self.rows.get(xe_id)
+        if index is None:
+            return np.zeros(self.days, dtype=np.uint8)
+        return self.matrix[index]
+
+
+class OccupancyCalendar:
+    def __init__(self):
+        self._lock = threading.RLock()
+        self.months = OrderedDict()
+
+    def clear(self):
+        with self._lock:
+            self.months.clear()
+
+    def build(self, first_day):
+        """Build lại 1 tháng từ database (1 query)"""
+        month = MonthOccupancy(first_day)
+        bookings = active_items().filter(
+            order__start_date__lte=month.last_day, order__end_date__gte=month.first_day,
+        ).values_list("order_id", "xe_id", "order__start_date", "order__end_date", "quantity")
+        month.fill(bookings.iterator(chunk_size=5000))
+        with self._lock:
+            self.months[month.first_day] = month
+            self.months.move_to_end(month.first_day)
+            while len(self.months) > getattr(settings, "OCCUPANCY_CALENDAR_MONTHS", 24):
+                self.months.popitem(last=False)
+        return month
+
+    def month(self, first_day):
+        """MonthOccupancy của tháng (build nếu chưa có hoặc đã quá cũ)"""
+        first_day = first_day.replace(day=1)
+        max_age = getattr(settings, "OCCUPANCY_CALENDAR_MAX_AGE", 300)
+        with self._lock:
+            month = self.months.get(first_day)
+            if month is not None and time.monotonic() - month.built_at <= max_age:
+                self.months.move_to_end(first_day)
+                return month
+        return self.build(first_day)
+
+    def occupancy(self, first_day, xe_ids):
+        """{xe_id: mảng uint8 số chiếc bị đặt theo ngày} (bản sao) cho các xe"""
+        month = self.month(first_day)
+        with self._lock:
+            return {xe_id: month.row(xe_id).copy() for xe_id in xe_ids}
+
+    def refresh_order(self, order_id):
+        """Cập nhật tăng dần các tháng đang giữ theo trạng thái hiện tại của 1 đơn"""
+        self.refresh_orders([order_id])
+
+    def refresh_orders(self, order_ids):
+        """Như refresh_order cho nhiều đơn (1 query)"""
+        if not self.months or not order_ids:
+            return
+        bookings = {order_id: [] for order_id in order_ids}
+        rows = active_items().filter(
+            order_id__in=list(bookings), order__start_date__isnull=False, order__end_date__isnull=False,
+        ).values_list("order_id", "xe_id", "order__start_date", "order__end_date", "quantity")
+        for order_id, *booking in rows:
+            bookings[order_id].append(booking)
+        with self._lock:
+            for month in self.months.values():
+                for order_id, order_bookings in bookings.items():
+                    month.replace_order(order_id, order_bookings)
+
+
+def parse_month(value):
+    """"2025-01" -> date(2025, 1, 1); rỗng -> tháng hiện tại; không hợp lệ -> None"""
+    if not value:
+        return timezone.localdate().replace(day=1)
+    try:
+        year, month = (int(part) for part in value.strip().split("-"))
+        return date(year, month, 1)
+    except ValueError:
+        return None
+
+
+occupancy_calendar = OccupancyCalendar()
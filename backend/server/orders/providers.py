@@ -0,0 +1,230 @@
+"""
+HTTP client dùng chung cho các provider bản đồ (Nominatim, OSRM, OpenRouteService)
+
+- 1 requests.Session cho mỗi provider: giữ kết nối keep-alive giữa các request
+  thay vì bắt tay TCP/TLS lại mỗi lần gọi
+- ``Deadline``: hạn tổng của 1 request API, mỗi lần gọi provider dùng timeout =
+  min(timeout của provider, thời gian còn lại)
+- ``run_parallel``: chạy các lần gọi độc lập (vd. geocode 2 địa chỉ) song song
+  trên thread pool dùng chung, chờ tối đa tới deadline
+- ``CircuitBreaker``: mỗi provider có cửa sổ trượt lỗi/độ trễ của các lần gọi gần
+  đây. Tỉ lệ lỗi (lỗi mạng, HTTP 5xx, gọi quá chậm) vượt ngưỡng thì ngắt mạch:
+  các lần gọi sau báo ProviderUnavailable ngay để dùng ước tính offline
+  (orders.geo) thay vì chờ hết timeout. Sau MAPS_BREAKER_COOLDOWN giây cho 1 lần
+  gọi thử (half-open), thành công thì đóng mạch lại.
+
+Worker của pool chỉ gọi HTTP, không query database (kết nối DB gắn với thread).
+Trạng thái circuit breaker là process-local như các index trong bộ nhớ khác.
+"""
+import logging
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = "MORENT-CarRental/1.0"  # Nominatim yêu cầu User-Agent
+OSRM_URL = "http://router.project-osrm.org"
+
+_lock = threading.Lock()
+_sessions = {}
+_breakers = {}
+_executor = None
+
+
+class DeadlineExceeded(requests.exceptions.Timeout):
+    """Hết hạn tổng của request: là Timeout nên các chỗ bắt RequestException vẫn xử lý được"""
+
+
+class ProviderUnavailable(requests.exceptions.ConnectionError):
+    """Provider đang bị ngắt mạch: không gọi, báo lỗi ngay"""
+
+
+class Deadline:
+    """Hạn tổng cho các lần gọi provider trong 1 request API"""
+
+    def __init__(self, seconds=None):
+        if seconds is None:
+            seconds = getattr(settings, "MAPS_REQUEST_DEADLINE", 10)
+        self.expires_at = time.monotonic() + seconds
+
+    def remaining(self):
+        return max(self.expires_at - time.monotonic(), 0)
+
+    def timeout(self, limit):
+        """Timeout cho 1 lần gọi: không quá limit và không quá thời gian còn lại"""
+        remaining = self.remaining()
+        if remaining <= 0:
+            raise DeadlineExceeded("Hết thời gian chờ provider bản đồ.")
+        return min(limit, remaining)
+
+
+def get_session(provider):
+    """Session dùng chung của provider (tạo lần đầu dùng)"""
+    session = _sessions.get(provider)
+    if session is not None:
+        return session
+    with _lock:
+        if provider not in _sessions:
+            session = requests.Session()
+            size = getattr(settings, "MAPS_HTTP_POOL_SIZE", 10)
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=size)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            session.headers["User-Agent"] = USER_AGENT
+            _sessions[provider] = session
+        return _sessions[provider]
+
+
+def osrm_url(service, coordinates):
+    """URL OSRM (OSRM_URL trong settings) cho service route/table với chuỗi "lng,lat;lng,lat" """
+    return f"{getattr(settings, 'OSRM_URL', OSRM_URL).rstrip('/')}/{service}/v1/driving/{coordinates}"
+
+
+class CircuitBreaker:
+    """Ngắt mạch 1 provider theo cửa sổ trượt (thời gian, lỗi, độ trễ) các lần gọi gần đây"""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.state = self.CLOSED
+            self.calls = deque()  # (thời điểm, lỗi?, độ trễ giây)
+            self.opened_at = None
+            self.probing = False
+
+    def _trim(self, now):
+        window = getattr(settings, "MAPS_BREAKER_WINDOW", 60)
+        while self.calls and now - self.calls[0][0] > window:
+            self.calls.popleft()
+
+    def allow(self):
+        """Có được gọi provider không (half-open: chỉ 1 lần gọi thử tại 1 thời điểm)"""
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self.opened_at < getattr(settings, "MAPS_BREAKER_COOLDOWN", 30):
+                    return False
+                self.state, self.probing = self.HALF_OPEN, False
+            if self.state == self.HALF_OPEN:
+                if self.probing:
+                    return False
+                self.probing = True
+            return True
+
+    def record(self, ok, latency):
+        """Ghi kết quả 1 lần gọi, gọi quá MAPS_BREAKER_SLOW_CALL giây tính là lỗi"""
+        failed = not ok or latency >= getattr(settings, "MAPS_BREAKER_SLOW_CALL", 5)
+        now = time.monotonic()
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                if failed:
+                    self._open(now)
+                else:
+                    self.state, self.probing = self.CLOSED, False
+                    self.calls.clear()
+                return
+            self.calls.append((now, failed, latency))
+            self._trim(now)
+            failures = sum(1 for _, call_failed, _ in self.calls if call_failed)
+            if (
+                self.state == self.CLOSED
+                and len(self.calls) >= getattr(settings, "MAPS_BREAKER_MIN_CALLS", 5)
+                and failures / len(self.calls) >= getattr(settings, "MAPS_BREAKER_ERROR_RATE", 0.5)
+            ):
+                self._open(now)
+
+    def _open(self, now):
+        self.state, self.opened_at, self.probing = self.OPEN, now, False
+        logger.warning(f"Ngắt mạch provider {self.provider}: {self._snapshot(now)}")
+
+    def _snapshot(self, now):
+        self._trim(now)
+        latencies = sorted(latency for _, _, latency in self.calls)
+        failures = sum(1 for _, failed, _ in self.calls if failed)
+        return {
+            "state": self.state,
+            "calls": len(self.calls),
+            "error_rate": round(failures / len(self.calls), 3) if self.calls else 0.0,
+            "p95_latency": round(latencies[int(0.95 * (len(latencies) - 1))], 3) if latencies else None,
+        }
+
+    def snapshot(self):
+        """Trạng thái và thống kê cửa sổ hiện tại (log/giám sát)"""
+        with self._lock:
+            return self._snapshot(time.monotonic())
+
+
+def get_breaker(provider):
+    with _lock:
+        if provider not in _breakers:
+            _breakers[provider] = CircuitBreaker(provider)
+        return _breakers[provider]
+
+
+def reset_breakers():
+    with _lock:
+        breakers = list(_breakers.values())
+    for breaker in breakers:
+        breaker.reset()
+
+
+def get(provider, url, timeout, deadline=None, **kwargs):
+    """
+    GET qua session của provider, timeout bị giới hạn bởi deadline (nếu có)
+
+    Raises:
+        ProviderUnavailable: provider đang bị ngắt mạch
+        requests.exceptions.RequestException: lỗi mạng/hết deadline
+    """
+    if deadline is not None:
+        timeout = deadline.timeout(timeout)
+    breaker = get_breaker(provider)
+    if not breaker.allow():
+        raise ProviderUnavailable(f"Provider {provider} đang tạm ngắt.")
+    started = time.monotonic()
+    try:
+        response = get_session(provider).get(url, timeout=timeout, **kwargs)
+    except BaseException:
+        breaker.record(False, time.monotonic() - started)
+        raise
+    breaker.record(response.status_code < 500, time.monotonic() - started)
+    return response
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "MAPS_HTTP_WORKERS", 8), thread_name_prefix="maps-http",
+            )
+        return _executor
+
+
+def run_parallel(calls, deadline=None):
+    """
+    Chạy các hàm không tham số song song, trả kết quả theo thứ tự
+
+    Raises:
+        DeadlineExceeded: quá deadline mà còn lần gọi chưa xong
+        Exception: lỗi đầu tiên (theo thứ tự calls) của các lần gọi
+    """
+    if len(calls) <= 1:
+        return [call() for call in calls]
+    futures = [_get_executor().submit(call) for call in calls]
+    _, pending = wait(futures, timeout=deadline.remaining() if deadline is not None else None)
+    if pending:
+        for future in pending:
+            future.cancel()
+        raise DeadlineExceeded("Hết thời gian chờ provider bản đồ.")
+    return [future.result() for future in futures]
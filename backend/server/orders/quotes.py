@@ -0,0 +1,111 @@
+"""
+Báo giá thuê xe có chữ ký (calculate_price_api -> OrderViewSet.create)
+
+calculate_price_api trả kèm quote_token: toàn bộ bảng giá đã tính, ký bằng
+SECRET_KEY (django.core.signing) và hết hạn sau PRICE_QUOTE_TTL giây. Tạo đơn
+chỉ cần kiểm tra chữ ký rồi dùng lại bảng giá: không tính lại (không geocode),
+client cũng không tự gửi được các khoản phí.
+"""
+from datetime import date, datetime, time
+from decimal import Decimal
+
+from django.conf import settings
+from django.core import signing
+
+SALT = "orders.quote"
+MONEY_FIELDS = ("base_price", "delivery_fee", "pickup_fee", "additional_fee", "discount_amount", "total_price")
+
+
+class InvalidQuote(Exception):
+    """Token báo giá sai chữ ký, bị sửa hoặc đã hết hạn"""
+
+
+def sign_quote(xe, start_date, end_date, start_time, end_time, pickup_location, return_location,
+               coupon, price_info):
+    """Token báo giá cho kết quả calculate_rental_price"""
+    payload = {
+        "xe_id": xe.pk,
+        "start_date": start_date.isoformat(),
+        "end_date": end_date.isoformat(),
+        "start_time": start_time.isoformat() if start_time else None,
+        "end_time": end_time.isoformat() if end_time else None,
+        "pickup_location": pickup_location or "",
+        "return_location": return_location or "",
+        "coupon_id": coupon.pk if coupon else None,
+        "coupon_code": coupon.code if coupon else "",
+        "rental_days": price_info["rental_days"],
+        "rental_hours": price_info["rental_hours"],
+        **{field: str(price_info[field]) for field in MONEY_FIELDS},
+    }
+    return signing.dumps(payload, salt=SALT, compress=True)
+
+
+def load_quote(token):
+    """
+    Bảng giá trong token (ngày/giờ, Decimal đã parse lại)
+
+    Raises:
+        InvalidQuote: sai chữ ký hoặc quá PRICE_QUOTE_TTL giây
+    """
+    try:
+        quote = signing.loads(token, salt=SALT, max_age=getattr(settings, "PRICE_QUOTE_TTL", 900))
+    except signing.SignatureExpired:
+        raise InvalidQuote("Báo giá đã hết hạn, vui lòng tính giá lại.")
+    except signing.BadSignature:
+        raise InvalidQuote("Báo giá không hợp lệ.")
+    for field in ("start_date", "end_date"):
+        quote[field] = date.fromisoformat(quote[field])
+    for field in ("start_time", "end_time"):
+        quote[field] = time.fromisoformat(quote[field]) if quote[field] else None
+    for field in MONEY_FIELDS:
+        quote[field] = Decimal(quote[field])
+    return quote
+
+
+def quote_mismatch(quote, items, data):
+    """
+    Lý do đơn không khớp báo giá (None nếu khớp)
+
+    Báo giá tính cho 1 chiếc của 1 xe; ngày/giờ thuê gửi kèm (nếu có) phải trùng báo giá.
+    """
+    if items != [(quote["xe_id"], 1)]:
+        return "Báo giá không khớp với xe trong đơn."
+    for field in ("start_date", "end_date"):
+        value = data.get(field)
+        if value and str(value) != quote[field].isoformat():
+            return "Báo giá không khớp với thời gian thuê."
+    for field in ("start_time", "end_time"):
+        value = data.get(field)
+        if value and _parse_time(value) != quote[field]:
+            return "Báo giá không khớp với thời gian thuê."
+    return None
+
+
+def _parse_time(value):
+    try:
+        return time.fromisoformat(str(value))
+    except ValueError:
+        return None
+
+
+def quote_window(quote):
+    """
+    (start_datetime, end_datetime) của báo giá, cùng quy tắc với orders.bookings.order_period:
+    không có giờ thì tính từ đầu ngày bắt đầu tới cuối ngày kết thúc. None nếu không hợp lệ.
+    """
+    start_dt = datetime.combine(quote["start_date"], quote["start_time"] or time.min)
+    end_dt = datetime.combine(quote["end_date"], quote["end_time"] or time.max)
+    return (start_dt, end_dt) if end_dt > start_dt else None
+
+
+def quote_order_fields(quote):
+    """Các field của Order lấy từ báo giá"""
+    fields = {
+        field: quote[field]
+        for field in (
+            "start_date", "end_date", "start_time", "end_time", "pickup_location", "return_location",
+            "rental_days", "rental_hours", "coupon_code", *MONEY_FIELDS,
+        )
+    }
+    fields["coupon_id"] = quote["coupon_id"]
+    return fields
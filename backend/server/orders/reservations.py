@@ -0,0 +1,132 @@
+"""
+Hết hạn giữ chỗ (status "reserved" quá reserved_until)
+
+``expire_reservations`` chuyển mọi đơn quá hạn sang "expired" bằng 1 câu
+``UPDATE ... RETURNING id``: không đọc từng đơn rồi save, 2 worker chạy song song
+cũng không expire trùng 1 đơn (UPDATE chỉ trả về các dòng nó thực sự đổi).
+Việc hoàn số lượng xe, trả UnitBooking và thông báo làm theo tập id trả về.
+
+``ReservationDeadlines`` là min-heap các mốc reserved_until sắp tới để command
+``expire_reservations`` ngủ đến đúng mốc kế tiếp thay vì poll liên tục.
+"""
+import heapq
+import logging
+
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from core.notifications import create_order_status_notifications
+from orders.models import Order, OrderItem, UnitBooking
+from orders.occupancy import occupancy_calendar
+from orders.stock import increment_stock
+
+logger = logging.getLogger(__name__)
+
+RESERVED = "reserved"
+EXPIRED = "expired"
+
+
+def _update_returning(now, order_ids=None):
+    """UPDATE đơn quá hạn -> [(order_id, user_id)] của các dòng đã đổi"""
+    opts = Order._meta
+    qn = connection.ops.quote_name
+    id_column = qn(opts.pk.column)
+    status_column = qn(opts.get_field("status").column)
+    sql = (
+        f"UPDATE {qn(opts.db_table)} SET {status_column} = %s "
+        f"WHERE {status_column} = %s AND {qn(opts.get_field('reserved_until').column)} < %s"
+    )
+    params = [EXPIRED, RESERVED, connection.ops.adapt_datetimefield_value(now)]
+    if order_ids is not None:
+        sql += f" AND {id_column} IN ({', '.join(['%s'] * len(order_ids))})"
+        params.extend(order_ids)
+    if connection.vendor in ("postgresql", "sqlite"):
+        with connection.cursor() as cursor:
+            cursor.execute(f"{sql} RETURNING {id_column}, {qn(opts.get_field('user').column)}", params)
+            return [tuple(row) for row in cursor.fetchall()]
+
+    # Database không có UPDATE ... RETURNING: khóa các dòng rồi mới UPDATE
+    expired = Order.objects.select_for_update().filter(status=RESERVED, reserved_until__lt=now)
+    if order_ids is not None:
+        expired = expired.filter(pk__in=order_ids)
+    rows = list(expired.values_list("pk", "user_id"))
+    Order.objects.filter(pk__in=[order_id for order_id, _ in rows]).update(status=EXPIRED)
+    return rows
+
+
+def _restore_stock(order_ids):
+    """Hoàn số lượng xe của các đơn (1 SUM + 1 UPDATE cho mọi xe)"""
+    increment_stock(dict(
+        OrderItem.objects.filter(order_id__in=order_ids).values_list("xe_id").annotate(total=Sum("quantity"))
+    ))
+
+
+def expire_reservations(now=None, order_ids=None):
+    """
+    Chuyển các đơn giữ chỗ quá hạn sang "expired"
+
+    Args:
+        now: mốc so sánh với reserved_until (mặc định timezone.now())
+        order_ids: chỉ xét các đơn này (mặc định mọi đơn)
+
+    Returns:
+        list id các đơn vừa hết hạn
+    """
+    now = now or timezone.now()
+    if order_ids is not None and not order_ids:
+        return []
+    with transaction.atomic():
+        rows = _update_returning(now, order_ids)
+        if not rows:
+            return []
+        expired_ids = [order_id for order_id, _ in rows]
+        _restore_stock(expired_ids)
+        UnitBooking.objects.filter(order_id__in=expired_ids).delete()
+        create_order_status_notifications(rows, RESERVED, EXPIRED)
+        transaction.on_commit(lambda: occupancy_calendar.refresh_orders(expired_ids))
+    logger.info(f"Đã hết hạn giữ chỗ {len(expired_ids)} đơn")
+    return expired_ids
+
+
+class ReservationDeadlines:
+    """
+    Min-heap (reserved_until, order_id) của các đơn đang giữ chỗ
+
+    Mốc trong heap có thể cũ (đơn đã thanh toán, được gia hạn): không sao, UPDATE
+    luôn kiểm tra lại status và reserved_until. Đơn giữ chỗ mới tạo sau lần load
+    được thấy ở lần load kế tiếp.
+    """
+
+    def __init__(self, lookahead=1000):
+        self.lookahead = lookahead
+        self.heap = []
+        # Lần load trước bị cắt ở lookahead: hết heap thì phải load tiếp
+        self.truncated = False
+
+    def __len__(self):
+        return len(self.heap)
+
+    def load(self):
+        """Nạp lookahead mốc gần nhất (dùng partial index order_reserved_until_idx)"""
+        rows = list(
+            Order.objects.filter(status=RESERVED, reserved_until__isnull=False)
+            .order_by("reserved_until").values_list("reserved_until", "pk")[:self.lookahead]
+        )
+        self.heap = rows
+        heapq.heapify(self.heap)
+        self.truncated = len(rows) == self.lookahead
+        return len(rows)
+
+    def push(self, deadline, order_id):
+        heapq.heappush(self.heap, (deadline, order_id))
+
+    def next_deadline(self):
+        return self.heap[0][0] if self.heap else None
+
+    def pop_due(self, now):
+        """Lấy ra id các đơn có mốc < now"""
+        due = []
+        while self.heap and self.heap[0][0] < now:
+            due.append(heapq.heappop(self.heap)[1])
+        return due
@@ -0,0 +1,88 @@
+"""
+Đường đi giữa 2 điểm qua OSRM cho các API bản đồ, có cache và nén geometry
+
+- Route được cache (Django cache, dùng chung giữa các process) theo cặp điểm
+  đầu/cuối làm tròn ROUTE_CACHE_PRECISION chữ số thập phân (4 chữ số ~ 11 m):
+  tra lại cùng cặp điểm không gọi OSRM.
+- Geometry trả về được rút gọn Douglas–Peucker với sai số ~1 pixel ở mức zoom
+  của bản đồ (orders.geo), tùy chọn encoded polyline thay cho GeoJSON.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from orders import providers
+from orders.geo import encode_polyline, simplify, zoom_tolerance
+
+GEOMETRY_FORMATS = ("geojson", "polyline")
+MAX_ZOOM = 22
+
+
+def _cache_key(lat1, lng1, lat2, lng2):
+    precision = getattr(settings, "ROUTE_CACHE_PRECISION", 4)
+    return "route:" + ";".join(f"{value:.{precision}f}" for value in (lat1, lng1, lat2, lng2))
+
+
+def get_route(lat1, lng1, lat2, lng2, deadline=None):
+    """
+    Đường đi bằng ô tô giữa 2 điểm (cache trước, không có mới gọi OSRM)
+
+    Returns:
+        {"distance": km, "duration": giây, "coordinates": [[lng, lat], ...]}
+        hoặc None nếu OSRM không tìm được đường
+
+    Raises:
+        requests.exceptions.RequestException: OSRM lỗi, hết deadline hoặc đang bị ngắt mạch
+    """
+    key = _cache_key(lat1, lng1, lat2, lng2)
+    route = cache.get(key)
+    if route is not None:
+        return route
+
+    params = {
+        "overview": "full",  # Lấy full geometry, rút gọn theo zoom khi trả về
+        "geometries": "geojson",
+        "steps": "false",
+    }
+    response = providers.get(
+        "osrm", providers.osrm_url("route", f"{lng1},{lat1};{lng2},{lat2}"),
+        params=params, timeout=15, deadline=deadline,
+    )
+    response.raise_for_status()
+    data = response.json()
+    if data.get("code") != "Ok" or not data.get("routes"):
+        return None
+    best = data["routes"][0]
+    route = {
+        "distance": round(best["distance"] / 1000, 2),  # OSRM trả về mét
+        "duration": round(best["duration"]),  # OSRM trả về giây
+        "coordinates": (best.get("geometry") or {}).get("coordinates") or [],
+    }
+    cache.set(key, route, timeout=getattr(settings, "ROUTE_CACHE_TTL", 24 * 3600))
+    return route
+
+
+def parse_geometry_options(data):
+    """
+    (zoom, geometry_format) từ body request, mặc định ROUTE_DEFAULT_ZOOM và GeoJSON
+
+    Raises:
+        ValueError: zoom/geometry_format không hợp lệ
+    """
+    zoom = data.get("zoom")
+    zoom = getattr(settings, "ROUTE_DEFAULT_ZOOM", 16) if zoom in (None, "") else int(zoom)
+    if not 0 <= zoom <= MAX_ZOOM:
+        raise ValueError("zoom")
+    geometry_format = data.get("geometry_format") or "geojson"
+    if geometry_format not in GEOMETRY_FORMATS:
+        raise ValueError("geometry_format")
+    return zoom, geometry_format
+
+
+def route_geometry(coordinates, zoom, geometry_format="geojson"):
+    """Các field geometry của response: GeoJSON đã rút gọn, hoặc geometry=None kèm polyline"""
+    if not coordinates:
+        return {"geometry": None}
+    points = simplify(coordinates, zoom_tolerance(zoom))
+    if geometry_format == "polyline":
+        return {"geometry": None, "polyline": encode_polyline(points)}
+    return {"geometry": {"type": "LineString", "coordinates": points.tolist()}}
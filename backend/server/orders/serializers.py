@@ -1,4 +1,5 @@
 ﻿from rest_framework import serializers
+from core.fieldsets import SparseFieldsetsMixin
 from orders.models import (
     HoaDonNhap, ChiTietHDN, HoaDonXuat, ChiTietHDX,
     BaoHanh,
@@ -10,7 +11,7 @@ from products.serializers import XeSerializer
 
 # ==================== Billing Serializers ====================
 
-class ChiTietHDNSerializer(serializers.ModelSerializer):
+class ChiTietHDNSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = ChiTietHDN
         fields = "__all__"
@@ -19,23 +20,25 @@ class ChiTietHDNSerializer(serializers.ModelSerializer):
         xe = validated_data["xe"]
         so_luong = validated_data["so_luong"]
         xe.so_luong += so_luong
+        # Nhập thêm xe: tăng cả số chiếc cho thuê theo lịch
+        xe.so_chiec = xe.unit_capacity + so_luong
         xe.save()
         return ChiTietHDN.objects.create(**validated_data)
 
 
-class HoaDonNhapSerializer(serializers.ModelSerializer):
+class HoaDonNhapSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = HoaDonNhap
         fields = "__all__"
 
 
-class HoaDonXuatSerializer(serializers.ModelSerializer):
+class HoaDonXuatSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = HoaDonXuat
         fields = "__all__"
 
 
-class ChiTietHDXSerializer(serializers.ModelSerializer):
+class ChiTietHDXSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = ChiTietHDX
         fields = "__all__"
@@ -53,13 +56,14 @@ class ChiTietHDXSerializer(serializers.ModelSerializer):
         xe = validated_data["xe"]
         so_luong = validated_data["so_luong"]
         xe.so_luong -= so_luong
+        xe.so_chiec = max(xe.unit_capacity - so_luong, 0)
         xe.save()
         return ChiTietHDX.objects.create(**validated_data)
 
 
 # ==================== Warranty Serializers ====================
 
-class BaoHanhSerializer(serializers.ModelSerializer):
+class BaoHanhSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = BaoHanh
         fields = "__all__"
@@ -67,7 +71,7 @@ class BaoHanhSerializer(serializers.ModelSerializer):
 
 # ==================== Commerce Serializers ====================
 
-class CartItemSerializer(serializers.ModelSerializer):
+class CartItemSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     xe = XeSerializer(read_only=True)
     xe_id = serializers.PrimaryKeyRelatedField(
         queryset=Xe.objects.all(), source="xe", write_only=True
@@ -81,7 +85,7 @@ class CartItemSerializer(serializers.ModelSerializer):
         fields = ["id", "cart_id", "xe", "xe_id", "quantity"]
 
 
-class CartSerializer(serializers.ModelSerializer):
+class CartSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     items = CartItemSerializer(many=True, read_only=True)
     session_key = serializers.CharField(required=False, allow_blank=True)
 
@@ -91,7 +95,7 @@ class CartSerializer(serializers.ModelSerializer):
         read_only_fields = ["user", "created_at", "updated_at"]
 
 
-class OrderItemSerializer(serializers.ModelSerializer):
+class OrderItemSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     xe = XeSerializer(read_only=True)
     xe_id = serializers.PrimaryKeyRelatedField(
         queryset=Xe.objects.all(), source="xe", write_only=True
@@ -103,7 +107,26 @@ class OrderItemSerializer(serializers.ModelSerializer):
         read_only_fields = ["price_at_purchase"]
 
 
-class OrderSerializer(serializers.ModelSerializer):
+class OrderSummarySerializer(serializers.Serializer):
+    """
+    Đơn dạng gọn cho danh sách admin (/order/summary/): đọc từ dict của values(),
+    không load Xe/ảnh xe như OrderSerializer
+    """
+    id = serializers.IntegerField()
+    user_id = serializers.IntegerField()
+    username = serializers.CharField(source="user__username")
+    status = serializers.CharField()
+    payment_status = serializers.CharField()
+    total_price = serializers.DecimalField(max_digits=12, decimal_places=2)
+    discount_amount = serializers.DecimalField(max_digits=12, decimal_places=2)
+    created_at = serializers.DateTimeField()
+    start_date = serializers.DateField()
+    end_date = serializers.DateField()
+    item_count = serializers.IntegerField()
+    cars = serializers.ListField(child=serializers.CharField())
+
+
+class OrderSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     items = OrderItemSerializer(many=True, read_only=True)
 
     class Meta:
@@ -0,0 +1,26 @@
+"""
+Signals cho orders: đơn không còn hiệu lực thì trả các chiếc xe đã giữ (UnitBooking)
+và lịch chiếm dụng trong bộ nhớ (orders.occupancy) được cập nhật sau khi commit
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from orders.bookings import holds_units, release_units
+from orders.models import Order, OrderItem
+from orders.occupancy import occupancy_calendar
+
+
+@receiver(post_save, sender=Order)
+def order_saved(sender, instance, created, **kwargs):
+    if not created and not holds_units(instance):
+        release_units(instance)
+
+
+@receiver(post_save, sender=Order)
+@receiver(post_delete, sender=Order)
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def refresh_occupancy(sender, instance, **kwargs):
+    order_id = instance.pk if sender is Order else instance.order_id
+    transaction.on_commit(lambda: occupancy_calendar.refresh_order(order_id))
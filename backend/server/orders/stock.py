@@ -0,0 +1,92 @@
+"""
+Trừ/hoàn tồn kho xe (Xe.so_luong) theo lô
+
+Mọi đường tạo đơn khóa các xe bằng 1 ``select_for_update`` theo thứ tự ma_xe
+(2 đơn cùng chứa xe A và B luôn khóa A trước B nên không deadlock), rồi trừ kho
+bằng 1 UPDATE có điều kiện ``so_luong >= số lượng``: thiếu hàng ở bất kỳ xe nào
+thì không xe nào bị trừ.
+"""
+from django.db import transaction
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from core.cache import bump_version
+from products.models import Xe
+
+
+class InsufficientStock(Exception):
+    """Xe không còn đủ số lượng"""
+
+    def __init__(self, xe, available):
+        self.xe = xe
+        self.available = available
+        super().__init__(f"Xe '{xe.ten_xe}' chỉ còn {available} chiếc.")
+
+
+class _PartialUpdate(Exception):
+    pass
+
+
+def lock_cars(xe_ids):
+    """{ma_xe: Xe} đã khóa dòng (select_for_update, thứ tự khóa cố định theo ma_xe)"""
+    return Xe.objects.select_for_update().order_by("pk").in_bulk(sorted(set(xe_ids)))
+
+
+def _per_car(quantities):
+    return Case(
+        *(When(pk=xe_id, then=Value(quantity)) for xe_id, quantity in quantities.items()),
+        default=Value(0), output_field=IntegerField(),
+    )
+
+
+def _stock_changed():
+    # update() không phát signal: tự tăng version cache như track_model_versions
+    bump_version(Xe)
+    transaction.on_commit(lambda: bump_version(Xe))
+
+
+def decrement_stock(quantities):
+    """
+    Trừ kho nhiều xe trong 1 UPDATE
+
+    Args:
+        quantities: {ma_xe: số lượng}
+
+    Raises:
+        InsufficientStock: có xe không đủ số lượng (không xe nào bị trừ)
+    """
+    quantities = {xe_id: quantity for xe_id, quantity in quantities.items() if quantity > 0}
+    if not quantities:
+        return
+    enough = Q()
+    for xe_id, quantity in quantities.items():
+        enough |= Q(pk=xe_id, so_luong__gte=quantity)
+    try:
+        # Savepoint: UPDATE chỉ trừ được 1 phần thì rollback cả phần đó
+        with transaction.atomic():
+            updated = Xe.objects.filter(enough).update(
+                so_luong=F("so_luong") - _per_car(quantities), updated_at=timezone.now(),
+            )
+            if updated != len(quantities):
+                raise _PartialUpdate()
+    except _PartialUpdate:
+        cars = Xe.objects.in_bulk(list(quantities))
+        for xe_id, quantity in sorted(quantities.items()):
+            xe = cars.get(xe_id)
+            if xe is None or xe.so_luong < quantity:
+                raise InsufficientStock(xe or Xe(pk=xe_id, ten_xe=xe_id), max(xe.so_luong, 0) if xe else 0)
+        # Không xảy ra khi các xe đã được lock_cars: coi như xe đầu tiên hết hàng
+        xe_id = min(quantities)
+        raise InsufficientStock(cars.get(xe_id) or Xe(pk=xe_id, ten_xe=xe_id), 0)
+    _stock_changed()
+
+
+def increment_stock(quantities):
+    """Hoàn kho nhiều xe trong 1 UPDATE ({ma_xe: số lượng})"""
+    quantities = {xe_id: quantity for xe_id, quantity in quantities.items() if quantity}
+    if not quantities:
+        return
+    Xe.objects.filter(pk__in=list(quantities)).update(
+        so_luong=F("so_luong") + _per_car(quantities), updated_at=timezone.now(),
+    )
+    _stock_changed()
@@ -1,21 +1,28 @@
 """
 Utilities cho orders: kiểm tra xung đột, tính tiền, etc.
 """
-from django.db.models import Q
 from django.utils import timezone
 from datetime import timedelta, datetime, date, time
 from decimal import Decimal
+from orders import providers
+from orders.availability import check_capacity
+from orders.distances import location_distances
+from orders.geocoding import geocode_many
 from orders.models import Order, OrderItem
+from orders.reservations import expire_reservations
 from products.models import Xe
-import requests
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-def check_schedule_conflict(xe_id, start_date, end_date, start_time=None, end_time=None, exclude_order_id=None):
+def check_schedule_conflict(xe_id, start_date, end_date, start_time=None, end_time=None, exclude_order_id=None,
+                            quantity=1):
     """
     Kiểm tra xung đột lịch đặt xe
+
+    Chỉ tính là xung đột khi số chiếc bị đặt đồng thời cộng ``quantity`` vượt
+    Xe.so_chiec (xe nhiều chiếc vẫn nhận đơn trùng lịch khi còn chiếc trống).
     
     Args:
         xe_id: ID của xe
@@ -24,57 +31,23 @@ def check_schedule_conflict(xe_id, start_date, end_date, start_time=None, end_ti
         start_time: Giờ bắt đầu (optional)
         end_time: Giờ kết thúc (optional)
         exclude_order_id: ID order cần loại trừ (khi update)
+        quantity: Số chiếc cần đặt
     
     Returns:
         (has_conflict: bool, conflicting_orders: list)
     """
-    # Chuyển đổi date và time thành datetime để so sánh chính xác
-    if start_time:
-        start_datetime = datetime.combine(start_date, start_time)
-    else:
-        start_datetime = datetime.combine(start_date, time.min)
-    
-    if end_time:
-        end_datetime = datetime.combine(end_date, end_time)
-    else:
-        end_datetime = datetime.combine(end_date, time.max)
-    
-    # Lấy tất cả orders của xe này có xung đột
-    # Xung đột xảy ra khi:
-    # 1. Order khác bắt đầu trong khoảng thời gian của order này
-    # 2. Order khác kết thúc trong khoảng thời gian của order này
-    # 3. Order khác bao trùm toàn bộ khoảng thời gian của order này
-    
-    conflicting_orders = Order.objects.filter(
-        items__xe_id=xe_id
-    ).exclude(
-        status__in=["cancelled", "expired"]
-    ).exclude(
-        payment_status="failed"
-    ).filter(
-        Q(start_date__lte=end_date, end_date__gte=start_date)
-    )
-    
-    # Loại trừ order hiện tại nếu đang update
-    if exclude_order_id:
-        conflicting_orders = conflicting_orders.exclude(id=exclude_order_id)
-    
-    # Kiểm tra chi tiết hơn với thời gian
-    final_conflicts = []
-    for order in conflicting_orders:
-        order_start = datetime.combine(order.start_date, order.start_time or time.min)
-        order_end = datetime.combine(order.end_date, order.end_time or time.max)
-        
-        # Kiểm tra overlap
-        if not (end_datetime <= order_start or start_datetime >= order_end):
-            final_conflicts.append(order)
-    
-    return len(final_conflicts) > 0, final_conflicts
+    start_datetime = datetime.combine(start_date, start_time or time.min)
+    end_datetime = datetime.combine(end_date, end_time or time.max)
+    result = check_capacity(xe_id, start_datetime, end_datetime, quantity, exclude_order_id=exclude_order_id)
+    if result.available >= quantity:
+        return False, []
+    return True, list(Order.objects.filter(id__in=result.order_ids).order_by("start_date", "id"))
 
 
 def _calculate_distance_km(address1, address2):
     """
-    Tính khoảng cách (km) giữa 2 địa chỉ sử dụng OpenRouteService API
+    Tính khoảng cách (km) giữa 2 địa chỉ: tra ma trận khoảng cách giữa các Location,
+    không có thì dùng OpenRouteService API
     
     Args:
         address1: Địa chỉ điểm 1
@@ -85,54 +58,33 @@ def _calculate_distance_km(address1, address2):
     """
     if not address1 or not address2:
         return None
+
+    # 2 Location đã có trong ma trận khoảng cách (orders.distances): tra O(1), không gọi mạng
+    distance_km = location_distances.distance(address1, address2)
+    if distance_km is not None:
+        return round(distance_km, 2)
     
     try:
-        # Geocode địa chỉ 1
-        geocode_url1 = f"https://api.openrouteservice.org/v2/geocoding/search"
-        params1 = {
-            "api_key": "",  # OpenRouteService miễn phí không cần key
-            "text": address1,
-            "boundary.country": "VN"
-        }
-        response1 = requests.get(geocode_url1, params=params1, timeout=5)
-        
-        if response1.status_code != 200:
-            logger.warning(f"Geocoding failed for {address1}: {response1.status_code}")
-            return None
-        
-        data1 = response1.json()
-        if not data1.get("features") or len(data1["features"]) == 0:
-            logger.warning(f"No geocoding results for {address1}")
-            return None
-        
-        coords1 = data1["features"][0]["geometry"]["coordinates"]  # [lng, lat]
-        
-        # Geocode địa chỉ 2
-        params2 = {
-            "api_key": "",
-            "text": address2,
-            "boundary.country": "VN"
-        }
-        response2 = requests.get(geocode_url1, params=params2, timeout=5)
-        
-        if response2.status_code != 200:
-            logger.warning(f"Geocoding failed for {address2}: {response2.status_code}")
-            return None
-        
-        data2 = response2.json()
-        if not data2.get("features") or len(data2["features"]) == 0:
-            logger.warning(f"No geocoding results for {address2}")
-            return None
-        
-        coords2 = data2["features"][0]["geometry"]["coordinates"]  # [lng, lat]
-        
+        # Geocode qua cache dùng chung (orders.geocoding): địa chỉ đã gặp không gọi mạng,
+        # 2 địa chỉ chưa có được hỏi provider song song, cả hàm chờ tối đa 1 deadline
+        deadline = providers.Deadline()
+        coords = []
+        for address, result in zip((address1, address2), geocode_many([address1, address2], deadline=deadline)):
+            if result is None:
+                logger.warning(f"No geocoding results for {address}")
+                return None
+            coords.append((result.lng, result.lat))
+        coords1, coords2 = coords
+
         # Tính khoảng cách
         directions_url = "https://api.openrouteservice.org/v2/directions/driving-car"
         directions_params = {
             "api_key": "",
             "coordinates": f"{coords1[0]},{coords1[1]}|{coords2[0]},{coords2[1]}"
         }
-        directions_response = requests.get(directions_url, params=directions_params, timeout=5)
+        directions_response = providers.get(
+            "openrouteservice", directions_url, params=directions_params, timeout=5, deadline=deadline,
+        )
         
         if directions_response.status_code != 200:
             logger.warning(f"Directions API failed: {directions_response.status_code}")
@@ -334,18 +286,9 @@ def reserve_order(order, timeout_minutes=15):
 
 def release_expired_reservations():
     """
-    Hàm để chạy định kỳ (cron job) để giải phóng các order hết hạn giữ chỗ
-    """
-    from django.utils import timezone
-    now = timezone.now()
-    
-    expired_orders = Order.objects.filter(
-        status="reserved",
-        reserved_until__lt=now
-    )
-    
-    for order in expired_orders:
-        order.check_reservation_expired()
-    
-    return expired_orders.count()
+    Giải phóng các order hết hạn giữ chỗ (1 câu UPDATE, xem orders.reservations)
 
+    Returns:
+        số order vừa hết hạn
+    """
+    return len(expire_reservations())
@@ -10,32 +10,33 @@ from orders.serializers import (
     BaoHanhSerializer,
 )
 from core.permissions import IsNhanVien
+from core.fieldsets import SparseQuerysetMixin
 
 
 # ==================== Billing ViewSets ====================
 
-class HoaDonNhapViewSet(viewsets.ModelViewSet):
+class HoaDonNhapViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho HoaDonNhap"""
     queryset = HoaDonNhap.objects.all()
     serializer_class = HoaDonNhapSerializer
     permission_classes = [IsAuthenticated, IsNhanVien]
 
 
-class ChiTietHDNViewSet(viewsets.ModelViewSet):
+class ChiTietHDNViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho ChiTietHDN"""
     queryset = ChiTietHDN.objects.all()
     serializer_class = ChiTietHDNSerializer
     permission_classes = [IsAuthenticated, IsNhanVien]
 
 
-class HoaDonXuatViewSet(viewsets.ModelViewSet):
+class HoaDonXuatViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho HoaDonXuat"""
     queryset = HoaDonXuat.objects.all()
     serializer_class = HoaDonXuatSerializer
     permission_classes = [IsAuthenticated, IsNhanVien]
 
 
-class ChiTietHDXViewSet(viewsets.ModelViewSet):
+class ChiTietHDXViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho ChiTietHDX"""
     queryset = ChiTietHDX.objects.all()
     serializer_class = ChiTietHDXSerializer
@@ -44,7 +45,7 @@ class ChiTietHDXViewSet(viewsets.ModelViewSet):
 
 # ==================== Warranty ViewSets ====================
 
-class BaoHanhViewSet(viewsets.ModelViewSet):
+class BaoHanhViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho BaoHanh"""
     queryset = BaoHanh.objects.all()
     serializer_class = BaoHanhSerializer
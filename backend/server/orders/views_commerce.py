@@ -1,20 +1,30 @@
-﻿from django.db import transaction
+﻿from datetime import datetime, time, timedelta
+
+from django.db import transaction
+from django.db.models import F, Q
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.decorators import action
 from rest_framework.exceptions import PermissionDenied
+from core.fieldsets import SparseQuerysetMixin
+from core.idempotency import idempotent
 
-from orders.models import Cart, CartItem, Order, OrderItem
-from products.models import Xe
-from orders.serializers import CartSerializer, CartItemSerializer, OrderSerializer
+from orders.availability import check_capacity, parse_window
+from orders.bookings import UnitsUnavailable, book_units
+from orders.models import Cart, CartItem, Coupon, Order, OrderItem
+from orders.quotes import InvalidQuote, load_quote, quote_mismatch, quote_order_fields, quote_window
+from orders.stock import InsufficientStock, decrement_stock, lock_cars
+from orders.serializers import CartSerializer, CartItemSerializer, OrderSerializer, OrderSummarySerializer
 
 
 def _get_session_key(request):
     return request.headers.get("X-Session-Key") or request.query_params.get("session_key") or ""
 
 
-class CartViewSet(viewsets.ModelViewSet):
+class CartViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = CartSerializer
 
     def get_queryset(self):
@@ -37,7 +47,7 @@ class CartViewSet(viewsets.ModelViewSet):
             serializer.save(user=None, session_key=session_key)
 
 
-class CartItemViewSet(viewsets.ModelViewSet):
+class CartItemViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = CartItemSerializer
 
     def get_queryset(self):
@@ -62,13 +72,20 @@ class CartItemViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
     permission_classes = [IsAuthenticated]
+    cursor_orderings = {"-created_at": ("-created_at", "-id")}
+    cursor_only_actions = ("summary",)
+    # Cột đọc cho /order/summary/ (values(), không load model)
+    summary_fields = (
+        "id", "user_id", "user__username", "status", "payment_status", "total_price", "discount_amount",
+        "created_at", "start_date", "end_date",
+    )
 
     def get_permissions(self):
-        """Chỉ admin mới có thể update/delete đơn hàng"""
-        if self.action in ['update', 'partial_update', 'destroy']:
+        """Chỉ admin mới có thể update/delete đơn hàng và xem danh sách tổng hợp"""
+        if self.action in ['update', 'partial_update', 'destroy', 'summary']:
             return [IsAuthenticated(), IsAdminUser()]
         return [IsAuthenticated()]
 
@@ -153,6 +170,56 @@ class OrderViewSet(viewsets.ModelViewSet):
         kwargs['partial'] = True
         return self.update(request, *args, **kwargs)
 
+    def filter_summary(self, queryset):
+        """
+        Lọc theo ?status=, ?payment_status= (nhiều giá trị cách nhau dấu phẩy) và
+        ?created_from=/?created_to= (YYYY-MM-DD); trả về (queryset, lỗi)
+        """
+        params = self.request.query_params
+        for field in ("status", "payment_status"):
+            values = [value.strip() for value in params.get(field, "").split(",") if value.strip()]
+            if values:
+                queryset = queryset.filter(**{f"{field}__in": values})
+        for param, lookup in (("created_from", "gte"), ("created_to", "lt")):
+            value = params.get(param)
+            if not value:
+                continue
+            day = parse_date(value)
+            if day is None:
+                return None, f"{param} không hợp lệ (YYYY-MM-DD)."
+            if param == "created_to":
+                day += timedelta(days=1)
+            # So sánh với mốc đầu ngày (không dùng __date) để dùng được index trên created_at
+            start_of_day = timezone.make_aware(datetime.combine(day, time.min))
+            queryset = queryset.filter(**{f"created_at__{lookup}": start_of_day})
+        return queryset, None
+
+    @action(detail=False, methods=["get"], url_path="summary")
+    def summary(self, request):
+        """
+        Danh sách đơn gọn cho admin: 1 query đơn (values()) + 1 query tên xe của trang,
+        phân trang keyset theo -created_at (link next/previous, không đếm tổng)
+        """
+        queryset, error = self.filter_summary(Order.objects.all())
+        if error:
+            return Response({"detail": error}, status=status.HTTP_400_BAD_REQUEST)
+        rows = self.paginate_queryset(queryset.values(*self.summary_fields))
+
+        cars = {row["id"]: [] for row in rows}
+        item_counts = dict.fromkeys(cars, 0)
+        items = OrderItem.objects.filter(order_id__in=list(cars)).order_by("id").values_list(
+            "order_id", "xe__ten_xe", "quantity",
+        )
+        for order_id, ten_xe, quantity in items:
+            if ten_xe not in cars[order_id]:
+                cars[order_id].append(ten_xe)
+            item_counts[order_id] += quantity
+        for row in rows:
+            row["cars"] = cars[row["id"]]
+            row["item_count"] = item_counts[row["id"]]
+        return self.get_paginated_response(OrderSummarySerializer(rows, many=True).data)
+
+    @idempotent("orders.create")
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         user = request.user
@@ -160,33 +227,98 @@ class OrderViewSet(viewsets.ModelViewSet):
         if not isinstance(items_data, list) or len(items_data) == 0:
             return Response({"detail": "items trống."}, status=status.HTTP_400_BAD_REQUEST)
 
-        total = 0
-        order_items = []
-
+        parsed = []
         for item in items_data:
             xe_id = item.get("xe_id")
-            quantity = int(item.get("quantity", 0))
+            try:
+                quantity = int(item.get("quantity", 0))
+            except (TypeError, ValueError):
+                quantity = 0
             if not xe_id or quantity <= 0:
                 return Response(
                     {"detail": "Thiếu xe_id hoặc quantity không hợp lệ."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
+            parsed.append((str(xe_id), quantity))
+
+        # Có quote_token (calculate_price_api): ngày thuê và các khoản phí lấy từ báo giá đã ký,
+        # không tính lại; không có thì bỏ qua mọi khoản phí client tự gửi
+        quote = None
+        if request.data.get("quote_token"):
             try:
-                xe = Xe.objects.get(pk=xe_id)
-            except Xe.DoesNotExist:
+                quote = load_quote(request.data.get("quote_token"))
+            except InvalidQuote as e:
+                return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+            mismatch = quote_mismatch(quote, parsed, request.data)
+            if mismatch:
+                return Response({"detail": mismatch}, status=status.HTTP_400_BAD_REQUEST)
+            # Khoảng thuê gồm cả giờ của báo giá: 2 đơn theo giờ nối tiếp trong ngày không trùng nhau
+            start_date, end_date = quote["start_date"], quote["end_date"]
+            window = quote_window(quote)
+        else:
+            start_date, end_date = request.data.get("start_date"), request.data.get("end_date")
+            window = parse_window(start_date, end_date)
+
+        # Thuê theo lịch: kiểm tra số chiếc còn trống trong khoảng thuê (không chỉ tồn kho)
+        if (start_date or end_date) and window is None:
+            return Response({"detail": "start_date/end_date không hợp lệ."}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Khóa mọi xe của đơn trong 1 query (thứ tự cố định): 2 đơn cùng xe không cùng
+        # lúc thấy còn hàng/còn chiếc trống
+        cars = lock_cars(xe_id for xe_id, _ in parsed)
+        total = 0
+        order_items = []
+        requested = {}
+
+        for xe_id, quantity in parsed:
+            xe = cars.get(xe_id)
+            if xe is None:
                 return Response({"detail": f"Xe {xe_id} không tồn tại."}, status=404)
 
-            if xe.so_luong < quantity:
+            # Nhiều dòng cùng xe được cộng dồn
+            requested[xe.pk] = requested.get(xe.pk, 0) + quantity
+            if xe.so_luong < requested[xe.pk]:
                 return Response(
                     {"detail": f"Xe '{xe.ten_xe}' chỉ còn {xe.so_luong} chiếc."},
                     status=status.HTTP_400_BAD_REQUEST,
                 )
 
+            if window:
+                capacity = check_capacity(xe.pk, *window, quantity=requested[xe.pk], capacity=xe.unit_capacity)
+                if capacity.available < requested[xe.pk]:
+                    return Response(
+                        {
+                            "detail": f"Xe '{xe.ten_xe}' chỉ còn {capacity.available} chiếc trống trong thời gian thuê.",
+                            "available_units": capacity.available,
+                        },
+                        status=status.HTTP_409_CONFLICT,
+                    )
+
             # Ưu tiên gia_thue cho thuê xe, sau đó gia_khuyen_mai, cuối cùng là gia
             price = xe.gia_thue if xe.gia_thue else (xe.gia_khuyen_mai if xe.gia_khuyen_mai else xe.gia)
             total += price * quantity
             order_items.append((xe, quantity, price))
 
+        fields = {
+            "start_date": start_date,
+            "end_date": end_date,
+            "pickup_location": request.data.get("pickup_location", ""),
+            "return_location": request.data.get("return_location", ""),
+            "rental_days": request.data.get("rental_days", 1),
+            "rental_hours": request.data.get("rental_hours", 0),
+        }
+        if quote:
+            fields.update(quote_order_fields(quote))
+            total = fields.pop("total_price")
+            # Coupon của báo giá: tăng used_count nếu còn hiệu lực và còn lượt dùng
+            if quote["coupon_id"] and not Coupon.objects.filter(
+                Q(usage_limit__isnull=True) | Q(usage_limit=0) | Q(used_count__lt=F("usage_limit")),
+                pk=quote["coupon_id"], is_active=True, valid_to__gte=timezone.now(),
+            ).update(used_count=F("used_count") + 1):
+                return Response(
+                    {"detail": "Mã coupon không hợp lệ hoặc đã hết hạn."}, status=status.HTTP_400_BAD_REQUEST
+                )
+
         order = Order.objects.create(
             user=user,
             total_price=total,
@@ -196,25 +328,28 @@ class OrderViewSet(viewsets.ModelViewSet):
             shipping_address=request.data.get("shipping_address", ""),
             shipping_city=request.data.get("shipping_city", ""),
             payment_method=request.data.get("payment_method", ""),
-            start_date=request.data.get("start_date"),
-            end_date=request.data.get("end_date"),
-            pickup_location=request.data.get("pickup_location", ""),
-            return_location=request.data.get("return_location", ""),
-            rental_days=request.data.get("rental_days", 1),
-            rental_hours=request.data.get("rental_hours", 0),
-            base_price=request.data.get("base_price", 0),
-            delivery_fee=request.data.get("delivery_fee", 0),
-            pickup_fee=request.data.get("pickup_fee", 0),
-            additional_fee=request.data.get("additional_fee", 0),
-            discount_amount=request.data.get("discount_amount", 0),
-            late_fee=request.data.get("late_fee", 0),
+            **fields,
         )
-        for xe, qty, price in order_items:
-            OrderItem.objects.create(
-                order=order, xe=xe, quantity=qty, price_at_purchase=price
-            )
-            xe.so_luong -= qty
-            xe.save()
+        if window:
+            # Giữ từng chiếc (exclusion constraint trên PostgreSQL chặn 2 đơn cùng giữ 1 chiếc)
+            starts_at, ends_at = (timezone.make_aware(point) for point in window)
+            try:
+                for xe_id, quantity in requested.items():
+                    book_units(order, cars[xe_id], quantity, starts_at, ends_at)
+            except UnitsUnavailable as e:
+                transaction.set_rollback(True)
+                return Response(
+                    {"detail": str(e), "available_units": e.available}, status=status.HTTP_409_CONFLICT
+                )
+        OrderItem.objects.bulk_create([
+            OrderItem(order=order, xe=xe, quantity=qty, price_at_purchase=price)
+            for xe, qty, price in order_items
+        ])
+        try:
+            decrement_stock(requested)
+        except InsufficientStock as e:
+            transaction.set_rollback(True)
+            return Response({"detail": str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
         # Gửi email xác nhận đơn hàng
         try:
@@ -231,11 +366,14 @@ class OrderViewSet(viewsets.ModelViewSet):
 
 @transaction.atomic
 def _checkout_transaction(cart):
-    items = list(cart.items.select_related("xe"))
+    items = list(CartItem.objects.filter(cart=cart).order_by("id"))
+    cars = lock_cars(item.xe_id for item in items)
+    requested = {}
     total = 0
     for item in items:
-        xe = item.xe
-        if xe.so_luong < item.quantity:
+        xe = cars[item.xe_id]
+        requested[xe.pk] = requested.get(xe.pk, 0) + item.quantity
+        if xe.so_luong < requested[xe.pk]:
             return None, {"detail": f"Xe '{xe.ten_xe}' chỉ còn {xe.so_luong} chiếc."}
         # Ưu tiên gia_thue cho thuê xe, sau đó gia_khuyen_mai, cuối cùng là gia
         price = xe.gia_thue if xe.gia_thue else (xe.gia_khuyen_mai if xe.gia_khuyen_mai else xe.gia)
@@ -258,16 +396,19 @@ def _checkout_transaction(cart):
         late_fee=0,
         rental_hours=0,
     )
+    order_items = []
     for item in items:
-        xe = item.xe
+        xe = cars[item.xe_id]
         # Ưu tiên gia_thue cho thuê xe, sau đó gia_khuyen_mai, cuối cùng là gia
         price = xe.gia_thue if xe.gia_thue else (xe.gia_khuyen_mai if xe.gia_khuyen_mai else xe.gia)
-        OrderItem.objects.create(
-            order=order, xe=xe, quantity=item.quantity, price_at_purchase=price
-        )
-        xe.so_luong -= item.quantity
-        xe.save()
-    cart.items.all().delete()
+        order_items.append(OrderItem(order=order, xe=xe, quantity=item.quantity, price_at_purchase=price))
+    OrderItem.objects.bulk_create(order_items)
+    try:
+        decrement_stock(requested)
+    except InsufficientStock as e:
+        transaction.set_rollback(True)
+        return None, {"detail": str(e)}
+    CartItem.objects.filter(pk__in=[item.pk for item in items]).delete()
     return order, None
 
 
@@ -276,6 +417,7 @@ from rest_framework.decorators import api_view, permission_classes  # noqa: E402
 
 @api_view(["POST"])
 @permission_classes([AllowAny])
+@idempotent("orders.checkout")
 def checkout(request):
     session_key = _get_session_key(request)
     user = request.user if request.user.is_authenticated else None
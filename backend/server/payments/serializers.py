@@ -1,8 +1,9 @@
 from rest_framework import serializers
+from core.fieldsets import SparseFieldsetsMixin
 from payments.models import Payment
 
 
-class PaymentSerializer(serializers.ModelSerializer):
+class PaymentSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer cho Payment"""
     order_id = serializers.IntegerField(source='order.id', read_only=True)
     user_name = serializers.CharField(source='user.username', read_only=True)
@@ -2,6 +2,8 @@ from rest_framework import viewsets, status
 from rest_framework.decorators import api_view, permission_classes, action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
+from core.fieldsets import SparseQuerysetMixin
+from core.idempotency import idempotent
 from django.shortcuts import get_object_or_404
 from django.utils import timezone
 from django.db import transaction
@@ -12,7 +14,7 @@ from payments.payment_gateways import get_payment_gateway
 from orders.models import Order
 
 
-class PaymentViewSet(viewsets.ModelViewSet):
+class PaymentViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho Payment"""
     queryset = Payment.objects.all()
     serializer_class = PaymentSerializer
@@ -26,6 +28,7 @@ class PaymentViewSet(viewsets.ModelViewSet):
         return queryset
     
     @action(detail=False, methods=["post"], url_path="create")
+    @idempotent("payments.create")
     def create_payment(self, request):
         """Tạo payment request"""
         serializer = PaymentCreateSerializer(data=request.data)
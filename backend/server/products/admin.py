@@ -18,7 +18,7 @@ class LoaiXeAdmin(admin.ModelAdmin):
 
 @admin.register(Xe)
 class XeAdmin(admin.ModelAdmin):
-    list_display = ("ma_xe", "ten_xe", "loai_xe", "gia", "gia_khuyen_mai", "gia_thue", "so_luong", "trang_thai")
+    list_display = ("ma_xe", "ten_xe", "loai_xe", "gia", "gia_khuyen_mai", "gia_thue", "so_luong", "so_chiec", "trang_thai")
     list_filter = ("loai_xe", "trang_thai", "mau_sac")
     search_fields = ("ma_xe", "ten_xe", "loai_xe__ten_loai", "seo_keywords")
     prepopulated_fields = {"slug": ("ten_xe",)}
@@ -0,0 +1,260 @@
+"""
+Autocomplete index trong bộ nhớ cho search-suggestions
+
+Index được build 1 lần (2 query) từ Xe.ten_xe và LoaiXe.ten_loai, sau đó cập nhật
+tăng dần qua signals (products/signals.py). Gợi ý trả về không cần chạm database:
+- Trie theo tiền tố từng từ (text đã bỏ dấu) cho gõ dở: "yam gr" -> "Yamaha Grande"
+- Trigram map cho gõ sai chính tả: "yamha" -> "Yamaha ..."
+Kết quả theo từng query được cache (LRU) tới lần cập nhật index kế tiếp,
+nên các tiền tố phổ biến khi gõ liên tục chỉ tốn 1 lần lookup dict.
+
+Index là process-local: mỗi worker có bản riêng, tự build lại sau
+AUTOCOMPLETE_MAX_AGE giây để bắt kịp thay đổi từ các process khác. Mỗi lần chỉ
+1 thread build; index mới được dựng ngoài lock rồi mới thay vào, trong lúc build
+các request khác vẫn đọc bản cũ (lần build đầu tiên thì phải chờ).
+"""
+import heapq
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+
+from products.search import tokenize
+
+# Chỉ lưu key ở các node trie tới độ sâu này; tiền tố dài hơn được kiểm tra lại trên text
+MAX_TRIE_DEPTH = 8
+TRIGRAM_THRESHOLD = 0.34
+RESULT_CACHE_SIZE = 2048
+
+
+def _trigrams(word):
+    padded = f"  {word} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class Suggestion:
+    """1 mục trong index: xe hoặc loại xe"""
+    __slots__ = ("key", "type", "id", "text", "words", "static_rank")
+
+    def __init__(self, type, id, text):
+        self.key = (type, id)
+        self.type = type
+        self.id = id
+        self.text = text
+        self.words = tokenize(text)
+        # Loại xe xếp trước xe, text ngắn xếp trước
+        self.static_rank = (0 if type == "category" else 1, len(text), text)
+
+    def as_dict(self):
+        return {"type": self.type, "text": self.text, "value": self.text, "id": self.id}
+
+
+class AutocompleteIndex:
+    def __init__(self):
+        self._lock = threading.RLock()
+        # Chỉ 1 thread build lại index tại 1 thời điểm
+        self._build_lock = threading.Lock()
+        # Cập nhật nhận được trong lúc build, áp lại lên index mới trước khi thay vào
+        self._pending = None
+        self.entries = {}
+        self.trie = {}
+        self.trigrams = {}
+        self.results = OrderedDict()
+        self.built_at = None
+
+    # ---------- Build / cập nhật ----------
+
+    def _is_stale(self):
+        max_age = getattr(settings, "AUTOCOMPLETE_MAX_AGE", 300)
+        return self.built_at is None or time.monotonic() - self.built_at > max_age
+
+    def build(self):
+        """Build lại toàn bộ index từ database"""
+        with self._build_lock:
+            self._rebuild()
+
+    def ensure_built(self):
+        if not self._is_stale():
+            return
+        # Index cũ vẫn dùng được: thread khác đang build thì không chờ
+        if not self._build_lock.acquire(blocking=self.built_at is None):
+            return
+        try:
+            # Thread khác vừa build xong trong lúc chờ lock
+            if self._is_stale():
+                self._rebuild()
+        finally:
+            self._build_lock.release()
+
+    def _rebuild(self):
+        from products.models import LoaiXe, Xe
+
+        with self._lock:
+            self._pending = []
+        try:
+            # Dựng index mới ngoài lock: request đọc bản cũ không bị chặn
+            fresh = AutocompleteIndex()
+            for ma_loai, ten_loai in LoaiXe.objects.values_list("ma_loai", "ten_loai"):
+                fresh._add(Suggestion("category", ma_loai, ten_loai))
+            for ma_xe, ten_xe in Xe.objects.values_list("ma_xe", "ten_xe").iterator(chunk_size=2000):
+                fresh._add(Suggestion("car", ma_xe, ten_xe))
+            fresh.built_at = time.monotonic()
+            with self._lock:
+                for method, arg in self._pending:
+                    getattr(fresh, method)(arg)
+                self.entries, self.trie, self.trigrams = fresh.entries, fresh.trie, fresh.trigrams
+                self.results = OrderedDict()
+                self.built_at = fresh.built_at
+        finally:
+            with self._lock:
+                self._pending = None
+
+    def _record(self, method, arg):
+        if self._pending is not None:
+            self._pending.append((method, arg))
+
+    def update_car(self, xe):
+        with self._lock:
+            self._record("update_car", xe)
+            if self.built_at is None:
+                return
+            self._remove(("car", xe.pk))
+            self._add(Suggestion("car", xe.pk, xe.ten_xe))
+
+    def remove_car(self, ma_xe):
+        with self._lock:
+            self._record("remove_car", ma_xe)
+            self._remove(("car", ma_xe))
+
+    def update_category(self, loai_xe):
+        with self._lock:
+            self._record("update_category", loai_xe)
+            if self.built_at is None:
+                return
+            self._remove(("category", loai_xe.pk))
+            self._add(Suggestion("category", loai_xe.pk, loai_xe.ten_loai))
+
+    def remove_category(self, ma_loai):
+        with self._lock:
+            self._record("remove_category", ma_loai)
+            self._remove(("category", ma_loai))
+
+    def _add(self, entry):
+        self.results.clear()
+        self.entries[entry.key] = entry
+        for word in set(entry.words):
+            node = self.trie
+            for char in word[:MAX_TRIE_DEPTH]:
+                node = node.setdefault(char, {"": set()})
+                node[""].add(entry.key)
+            for gram in _trigrams(word):
+                self.trigrams.setdefault(gram, set()).add(entry.key)
+
+    def _remove(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is None:
+            return
+        self.results.clear()
+        for word in set(entry.words):
+            node = self.trie
+            for char in word[:MAX_TRIE_DEPTH]:
+                node = node.get(char)
+                if node is None:
+                    break
+                node[""].discard(key)
+            for gram in _trigrams(word):
+                keys = self.trigrams.get(gram)
+                if keys is not None:
+                    keys.discard(key)
+                    if not keys:
+                        del self.trigrams[gram]
+
+    # ---------- Query ----------
+
+    def _prefix_keys(self, token):
+        node = self.trie
+        for char in token[:MAX_TRIE_DEPTH]:
+            node = node.get(char)
+            if node is None:
+                return set()
+        return node[""]
+
+    @staticmethod
+    def _score(entry, tokens):
+        """
+        Score (nhỏ hơn = tốt hơn) hoặc None nếu không match hết các token:
+        text bắt đầu bằng query xếp trước match ở từ giữa
+        """
+        for token in tokens:
+            if not any(word.startswith(token) for word in entry.words):
+                return None
+        starts = bool(entry.words) and entry.words[0].startswith(tokens[0])
+        return (0 if starts else 1,) + entry.static_rank
+
+    def search(self, query, limit=10):
+        tokens = tokenize(query)
+        if not tokens:
+            return []
+        self.ensure_built()
+        cache_key = (tuple(tokens), limit)
+        with self._lock:
+            cached = self.results.get(cache_key)
+            if cached is not None:
+                self.results.move_to_end(cache_key)
+                return list(cached)
+
+            results = self._search(tokens, limit)
+            self.results[cache_key] = results
+            if len(self.results) > RESULT_CACHE_SIZE:
+                self.results.popitem(last=False)
+            return list(results)
+
+    def _search(self, tokens, limit):
+        # Bắt đầu từ tập ứng viên nhỏ nhất rồi giao dần
+        candidates = None
+        for keys in sorted((self._prefix_keys(token) for token in tokens), key=len):
+            candidates = set(keys) if candidates is None else candidates & keys
+            if not candidates:
+                break
+
+        scored = []
+        for key in candidates or ():
+            entry = self.entries[key]
+            score = self._score(entry, tokens)
+            if score is not None:
+                scored.append((score, entry))
+        ranked = [entry for _, entry in heapq.nsmallest(limit * 3, scored, key=lambda item: item[0])]
+        if not ranked:
+            ranked = self._fuzzy(tokens, limit * 3)
+
+        # Bỏ trùng tên hiển thị (vd. nhiều xe cùng tên)
+        results = []
+        seen = set()
+        for entry in ranked:
+            marker = (entry.type, entry.text.lower())
+            if marker not in seen:
+                seen.add(marker)
+                results.append(entry.as_dict())
+            if len(results) >= limit:
+                break
+        return results
+
+    def _fuzzy(self, tokens, limit):
+        """Gợi ý gần đúng theo tỉ lệ trigram chung (bắt lỗi gõ sai)"""
+        query_grams = set()
+        for token in tokens:
+            query_grams |= _trigrams(token)
+        counts = Counter()
+        for gram in query_grams:
+            counts.update(self.trigrams.get(gram, ()))
+        scored = []
+        for key, shared in counts.items():
+            similarity = shared / len(query_grams)
+            if similarity >= TRIGRAM_THRESHOLD:
+                entry = self.entries[key]
+                scored.append(((-similarity,) + entry.static_rank, entry))
+        return [entry for _, entry in heapq.nsmallest(limit, scored, key=lambda item: item[0])]
+
+
+autocomplete_index = AutocompleteIndex()
@@ -0,0 +1,236 @@
+"""
+Facet counts cho bộ lọc danh mục xe (/api/xe/facets/)
+
+Thay vì mỗi giá trị facet 1 request list, toàn bộ facet được tính từ 1 query
+GROUP BY theo các chiều facet (loại, nhiên liệu, hộp số, số chỗ, màu, còn hàng,
+bucket giá thuê). Số nhóm chỉ phụ thuộc số giá trị khác nhau của các chiều,
+không phụ thuộc số xe, nên việc cộng dồn từng facet bằng Python rất rẻ.
+
+Facet dạng "disjunctive": count của 1 facet áp dụng mọi filter khác trừ chính nó,
+để khi đã chọn "Hybrid" vẫn thấy được số xe "Điện", "Xăng".
+Khoảng giá (min_price/max_price, gia_thue_min/gia_thue_max), min_rating, status,
+search và khoảng xe trống (available_from/available_to) được áp dụng thẳng trong
+SQL cho mọi facet.
+"""
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import BooleanField, Case, Count, F, IntegerField, Value, When
+from django.db.models.functions import Cast
+
+from core.cache import get_versions
+from orders.availability import WINDOW_PARAMS
+from products.models import LoaiXe, Review, Xe
+
+# Các filter được tính như facet (đánh giá lại trên từng nhóm)
+FACET_PARAMS = ("loai", "fuel_type", "transmission", "min_seats", "max_seats", "color", "in_stock")
+# Các filter áp dụng trong SQL trước khi group
+SQL_PARAMS = ("min_price", "max_price", "gia_thue_min", "gia_thue_max", "min_rating", "status", "search") + WINDOW_PARAMS
+INT_PARAMS = ("min_price", "max_price", "gia_thue_min", "gia_thue_max", "min_seats", "max_seats")
+
+GROUP_FIELDS = ("loai_xe_id", "loai_nhien_lieu", "hop_so", "so_cho", "mau_sac", "in_stock_flag", "price_bucket")
+MIN_BUCKET_SIZE = 10_000
+MAX_BUCKETS = 50
+
+
+def normalize_filters(params):
+    """
+    Chuẩn hóa query params thành dict filter (bỏ param lạ/rỗng/không hợp lệ)
+    để 2 request cùng ý nghĩa dùng chung cache key
+    """
+    filters = {}
+    for name in FACET_PARAMS + SQL_PARAMS:
+        value = (params.get(name) or "").strip()
+        if not value:
+            continue
+        if name in INT_PARAMS:
+            try:
+                value = int(value)
+            except ValueError:
+                continue
+        elif name == "min_rating":
+            try:
+                value = str(Decimal(value).normalize())
+            except InvalidOperation:
+                continue
+        elif name == "in_stock":
+            # View chỉ lọc khi in_stock=true
+            if value.lower() != "true":
+                continue
+            value = True
+        elif name in ("color", "search"):
+            value = " ".join(value.casefold().split())
+        filters[name] = value
+    return filters
+
+
+def bucket_size_from(params):
+    default = getattr(settings, "FACETS_PRICE_BUCKET_SIZE", 500_000)
+    try:
+        size = int(params.get("bucket_size") or default)
+    except ValueError:
+        size = default
+    return max(size, MIN_BUCKET_SIZE)
+
+
+def cache_key(filters, bucket_size):
+    # Kèm version Xe/LoaiXe: sửa xe là facet được tính lại ngay, không đợi hết timeout
+    raw = json.dumps([filters, bucket_size, get_versions((Xe, LoaiXe, Review))], sort_keys=True, ensure_ascii=True)
+    return "xe-facets:" + hashlib.md5(raw.encode()).hexdigest()
+
+
+def _group_rows(queryset, bucket_size):
+    """1 query GROUP BY theo mọi chiều facet, trả về list (dict chiều, count)"""
+    rows = (
+        queryset.order_by()
+        .annotate(
+            in_stock_flag=Case(
+                When(so_luong__gt=0, trang_thai="in_stock", then=Value(True)),
+                default=Value(False),
+                output_field=BooleanField(),
+            ),
+            price_bucket=Cast(F("gia_thue") / Value(bucket_size), IntegerField()),
+        )
+        .values(*GROUP_FIELDS)
+        .annotate(count=Count("pk"))
+    )
+    return list(rows)
+
+
+def _matchers(filters):
+    """Predicate cho từng facet filter, đánh giá trên 1 nhóm"""
+    matchers = {}
+    if "loai" in filters:
+        matchers["loai"] = lambda row: row["loai_xe_id"] == filters["loai"]
+    if "fuel_type" in filters:
+        matchers["fuel_type"] = lambda row: row["loai_nhien_lieu"] == filters["fuel_type"]
+    if "transmission" in filters:
+        matchers["transmission"] = lambda row: row["hop_so"] == filters["transmission"]
+    if "min_seats" in filters or "max_seats" in filters:
+        low = filters.get("min_seats")
+        high = filters.get("max_seats")
+        matchers["seats"] = lambda row: (
+            (low is None or row["so_cho"] >= low) and (high is None or row["so_cho"] <= high)
+        )
+    if "color" in filters:
+        # Giống mau_sac__icontains
+        matchers["color"] = lambda row: filters["color"] in (row["mau_sac"] or "").casefold()
+    if filters.get("in_stock"):
+        matchers["in_stock"] = lambda row: bool(row["in_stock_flag"])
+    return matchers
+
+
+def _choice_facet(counts, choices):
+    """Facet theo choices của model: luôn trả đủ các giá trị (kể cả count 0)"""
+    return [{"value": value, "label": str(label), "count": counts.get(value, 0)} for value, label in choices]
+
+
+def _ranked_facet(counts, labels=None):
+    items = [
+        {"value": value, "label": str(labels.get(value, value)) if labels else str(value), "count": count}
+        for value, count in counts.items()
+        if count
+    ]
+    items.sort(key=lambda item: (-item["count"], str(item["value"])))
+    return items
+
+
+def compute_facets(queryset, filters, bucket_size):
+    """
+    Tính facet counts + histogram giá thuê
+
+    Args:
+        queryset: Xe queryset đã áp dụng các SQL_PARAMS (không áp dụng FACET_PARAMS)
+        filters: dict từ normalize_filters
+        bucket_size: độ rộng bucket histogram gia_thue (VNĐ)
+    """
+    rows = _group_rows(queryset, bucket_size)
+    matchers = _matchers(filters)
+
+    counters = {name: {} for name in ("loai", "fuel_type", "transmission", "seats", "color", "in_stock")}
+    histogram = {}
+    total = 0
+    for row in rows:
+        # Nhóm trượt >= 2 filter không đóng góp cho facet nào;
+        # trượt đúng 1 filter thì chỉ đóng góp cho chính facet đó
+        failed = [name for name, match in matchers.items() if not match(row)]
+        if len(failed) > 1:
+            continue
+        count = row["count"]
+        if not failed:
+            total += count
+            bucket = row["price_bucket"] or 0
+            histogram[bucket] = histogram.get(bucket, 0) + count
+        for name, value in (
+            ("loai", row["loai_xe_id"]),
+            ("fuel_type", row["loai_nhien_lieu"]),
+            ("transmission", row["hop_so"]),
+            ("seats", row["so_cho"]),
+            ("color", row["mau_sac"]),
+            ("in_stock", bool(row["in_stock_flag"])),
+        ):
+            if not failed or failed[0] == name:
+                counters[name][value] = counters[name].get(value, 0) + count
+
+    category_labels = dict(
+        LoaiXe.objects.filter(pk__in=[key for key in counters["loai"] if key]).values_list("ma_loai", "ten_loai")
+    )
+    seats = [
+        {"value": value, "label": f"{value} chỗ", "count": count}
+        for value, count in sorted(counters["seats"].items())
+        if count
+    ]
+    in_stock_label = dict(Xe._meta.get_field("trang_thai").choices)["in_stock"]
+
+    # Gộp bucket cuối nếu histogram quá dài (giá ngoại lai)
+    buckets = sorted(histogram.items())
+    if len(buckets) > MAX_BUCKETS:
+        head, tail = buckets[:MAX_BUCKETS - 1], buckets[MAX_BUCKETS - 1:]
+        buckets = head + [(tail[0][0], sum(count for _, count in tail))]
+        last_open = True
+    else:
+        last_open = False
+
+    histogram_items = []
+    for index, (bucket, count) in enumerate(buckets):
+        is_last = index == len(buckets) - 1
+        histogram_items.append({
+            "min": bucket * bucket_size,
+            "max": None if (is_last and last_open) else (bucket + 1) * bucket_size - 1,
+            "count": count,
+        })
+
+    return {
+        "total": total,
+        "facets": {
+            "loai": _ranked_facet(counters["loai"], category_labels),
+            "fuel_type": _choice_facet(counters["fuel_type"], Xe._meta.get_field("loai_nhien_lieu").choices),
+            "transmission": _choice_facet(counters["transmission"], Xe._meta.get_field("hop_so").choices),
+            "seats": seats,
+            "color": _ranked_facet(counters["color"]),
+            "in_stock": [{"value": True, "label": str(in_stock_label), "count": counters["in_stock"].get(True, 0)}],
+        },
+        "price_histogram": {
+            "field": "gia_thue",
+            "bucket_size": bucket_size,
+            "buckets": histogram_items,
+        },
+    }
+
+
+def get_facets(queryset, params):
+    """compute_facets có cache theo filter đã chuẩn hóa (FACETS_CACHE_TIMEOUT giây)"""
+    filters = normalize_filters(params)
+    bucket_size = bucket_size_from(params)
+    if any(name in filters for name in WINDOW_PARAMS):
+        # Phụ thuộc lịch đặt xe, thay đổi theo từng đơn nên không cache
+        return compute_facets(queryset, filters, bucket_size)
+    key = cache_key(filters, bucket_size)
+    data = cache.get(key)
+    if data is None:
+        data = compute_facets(queryset, filters, bucket_size)
+        cache.set(key, data, getattr(settings, "FACETS_CACHE_TIMEOUT", 60))
+    return data
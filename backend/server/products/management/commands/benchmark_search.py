@@ -0,0 +1,53 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from core.benchmarks import explain, format_timing, measure, rollback_after, seed_cars
+from products.models import Xe
+from products.search import search_queryset
+
+QUERIES = ["toyota", "xe tay ga", "xe so", "vinfast lux", "do", "tiet kiem nhien lieu", "Côn tay"]
+
+
+def legacy_search(query):
+    """Cách search cũ của XeViewSet: icontains OR trên 6 field"""
+    return Xe.objects.select_related("loai_xe").filter(
+        Q(ten_xe__icontains=query) |
+        Q(mau_sac__icontains=query) |
+        Q(loai_xe__ten_loai__icontains=query) |
+        Q(seo_keywords__icontains=query) |
+        Q(mo_ta_ngan__icontains=query) |
+        Q(mo_ta__icontains=query)
+    ).order_by("ma_xe")
+
+
+def ranked_search(query):
+    return search_queryset(Xe.objects.select_related("loai_xe"), query).order_by("-search_rank", "ma_xe")
+
+
+class Command(BaseCommand):
+    help = "Benchmark search xe: icontains cũ vs search index (seed dữ liệu rồi rollback)"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--cars", type=int, default=100_000)
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument("--explain", action="store_true", help="In query plan cho từng query")
+
+    def handle(self, *args, **options):
+        with rollback_after():
+            self.stdout.write(f"Seeding {options['cars']} xe...")
+            seed_cars(options["cars"])
+
+            for query in QUERIES:
+                legacy_qs = legacy_search(query)
+                ranked_qs = ranked_search(query)
+                self.stdout.write(self.style.MIGRATE_HEADING(
+                    f"\n'{query}': legacy={legacy_qs.count()} rows, index={ranked_qs.count()} rows"
+                ))
+                legacy = measure(lambda: list(legacy_qs[:10]), repeat=options["repeat"])
+                ranked = measure(lambda: list(ranked_qs[:10]), repeat=options["repeat"])
+                self.stdout.write(format_timing("  icontains OR (trang đầu)", legacy))
+                self.stdout.write(format_timing("  search index + rank (trang đầu)", ranked))
+                if options["explain"]:
+                    self.stdout.write(explain(ranked_qs[:10]))
+
+        self.stdout.write(self.style.SUCCESS("\nBenchmark xong, dữ liệu seed đã được rollback."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from products.ratings import rebuild_ratings
+
+
+class Command(BaseCommand):
+    help = "Tính lại điểm đánh giá tổng hợp (avg_rating, review_count, histogram) của xe từ bảng Review"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=1000)
+
+    def handle(self, *args, **options):
+        count = rebuild_ratings(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Đã sửa điểm đánh giá cho {count} xe."))
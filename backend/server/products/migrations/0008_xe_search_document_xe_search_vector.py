@@ -0,0 +1,83 @@
+# Generated by Django 6.0 on 2026-01-05 09:12
+
+import unicodedata
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+from django.db.models.expressions import RawSQL
+
+
+# Bản sao cố định của products.search lúc tạo migration: migration không phụ thuộc
+# vào code hiện tại (đổi SEARCH_WEIGHTS/fold_text sau này không đổi dữ liệu ở đây)
+SEARCH_WEIGHTS = (
+    ("ten_xe", "A"),
+    ("loai_xe__ten_loai", "A"),
+    ("seo_keywords", "B"),
+    ("mau_sac", "B"),
+    ("mo_ta_ngan", "C"),
+    ("mo_ta", "D"),
+)
+
+
+def fold_text(text):
+    if not text:
+        return ""
+    text = str(text).replace("đ", "d").replace("Đ", "D")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def field_value(xe, path):
+    value = xe
+    for attr in path.split("__"):
+        value = getattr(value, attr, None)
+        if value is None:
+            return ""
+    return value
+
+
+def build_search_index(apps, schema_editor):
+    Xe = apps.get_model("products", "Xe")
+    batch = []
+    for xe in Xe.objects.select_related("loai_xe").order_by("pk").iterator(chunk_size=1000):
+        xe.search_document = "\n".join(fold_text(field_value(xe, path)) for path, _ in SEARCH_WEIGHTS)
+        batch.append(xe)
+        if len(batch) >= 1000:
+            Xe.objects.bulk_update(batch, ["search_document"])
+            batch = []
+    if batch:
+        Xe.objects.bulk_update(batch, ["search_document"])
+
+    if schema_editor.connection.vendor == "postgresql":
+        parts = [
+            f"setweight(to_tsvector('simple', split_part(search_document, E'\\n', {index})), '{weight}')"
+            for index, (_, weight) in enumerate(SEARCH_WEIGHTS, start=1)
+        ]
+        Xe.objects.update(search_vector=RawSQL(" || ".join(parts), []))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0007_carimage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xe',
+            name='search_document',
+            field=models.TextField(blank=True, editable=False, help_text='Text không dấu dùng cho tìm kiếm'),
+        ),
+        migrations.AddField(
+            model_name='xe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.RunPython(build_search_index, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='xe',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='xe_search_vector_gin'),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 6.0 on 2026-01-09 10:05
+
+from django.db import migrations, models
+
+
+def rebuild_ratings(apps, schema_editor):
+    """Tính điểm tổng hợp cho các review đã có"""
+    Review = apps.get_model('products', 'Review')
+    Xe = apps.get_model('products', 'Xe')
+    stats = {}
+    for xe_id, rating in Review.objects.values_list('xe_id', 'rating').iterator():
+        row = stats.setdefault(xe_id, {'review_count': 0, 'rating_sum': 0})
+        row['review_count'] += 1
+        row['rating_sum'] += rating
+        row[f'rating_{rating}_count'] = row.get(f'rating_{rating}_count', 0) + 1
+    for xe_id, row in stats.items():
+        row['avg_rating'] = round(row['rating_sum'] / row['review_count'], 2)
+        Xe.objects.filter(pk=xe_id).update(**row)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0009_loaixe_updated_at_xe_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xe',
+            name='review_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='xe',
+            name='rating_sum',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='xe',
+            name='avg_rating',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=3),
+        ),
+        migrations.AddField(
+            model_name='xe',
+            name='rating_1_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='xe',
+            name='rating_2_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='xe',
+            name='rating_3_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='xe',
+            name='rating_4_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='xe',
+            name='rating_5_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='xe',
+            index=models.Index(fields=['avg_rating', 'ma_xe'], name='xe_avg_rating_idx'),
+        ),
+        migrations.RunPython(rebuild_ratings, migrations.RunPython.noop),
+    ]
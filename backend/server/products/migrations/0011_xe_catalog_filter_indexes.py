@@ -0,0 +1,33 @@
+# Generated by Django 6.0 on 2026-01-10 09:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0010_xe_rating_aggregates'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='xe',
+            index=models.Index(fields=['loai_xe', 'gia_thue', 'ma_xe'], name='xe_loai_gia_thue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='xe',
+            index=models.Index(fields=['gia_thue', 'ma_xe'], name='xe_gia_thue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='xe',
+            index=models.Index(fields=['gia', 'ma_xe'], name='xe_gia_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='xe',
+            index=models.Index(condition=models.Q(('so_luong__gt', 0), ('trang_thai', 'in_stock')), fields=['gia_thue', 'ma_xe'], name='xe_in_stock_gia_thue_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='xe',
+            index=models.Index(fields=['loai_nhien_lieu', 'hop_so', 'so_cho'], name='xe_specs_idx'),
+        ),
+    ]
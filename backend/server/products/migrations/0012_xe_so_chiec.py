@@ -0,0 +1,26 @@
+# Generated by Django 6.0 on 2026-01-20 09:00
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def copy_stock(apps, schema_editor):
+    # Xe có sẵn: lấy tồn kho hiện tại làm số chiếc cho thuê (admin chỉnh lại nếu cần)
+    Xe = apps.get_model("products", "Xe")
+    Xe.objects.filter(so_luong__gte=0).update(so_chiec=F("so_luong"))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('products', '0011_xe_catalog_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='xe',
+            name='so_chiec',
+            field=models.PositiveIntegerField(blank=True, help_text='Số chiếc xe cho thuê theo lịch (trống = so_luong lúc tạo xe)', null=True),
+        ),
+        migrations.RunPython(copy_stock, migrations.RunPython.noop),
+    ]
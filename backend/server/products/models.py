@@ -1,5 +1,9 @@
 ﻿from django.db import models
 from django.contrib.auth.models import User
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+
+RATING_STARS = (1, 2, 3, 4, 5)
 
 
 class Location(models.Model):
@@ -22,10 +26,23 @@ class Location(models.Model):
 class LoaiXe(models.Model):
     ma_loai = models.CharField(max_length=10, primary_key=True)
     ten_loai = models.CharField(max_length=255)
+    updated_at = models.DateTimeField(auto_now=True)
 
     def __str__(self):
         return self.ten_loai
 
+    def save(self, *args, **kwargs):
+        # Tên loại xe nằm trong search document của các xe thuộc loại này:
+        # chỉ đánh index lại khi ten_loai thật sự đổi (loại mới thì chưa có xe)
+        update_fields = kwargs.get("update_fields")
+        renamed = (update_fields is None or "ten_loai" in update_fields) and (
+            LoaiXe.objects.filter(pk=self.pk).exclude(ten_loai=self.ten_loai).exists()
+        )
+        super().save(*args, **kwargs)
+        if renamed:
+            from products.search import rebuild_search_index
+            rebuild_search_index(self.xe_set.all())
+
 
 class Xe(models.Model):
     ma_xe = models.CharField(max_length=10, primary_key=True)
@@ -35,6 +52,10 @@ class Xe(models.Model):
     gia_khuyen_mai = models.IntegerField(null=True, blank=True)
     gia_thue = models.IntegerField(default=0, help_text="Giá thuê mỗi ngày (VNĐ)")
     so_luong = models.IntegerField()
+    # Sức chứa khi cho thuê theo lịch: đơn thuê không trừ (so_luong là tồn kho, bị trừ khi có đơn)
+    so_chiec = models.PositiveIntegerField(
+        null=True, blank=True, help_text="Số chiếc xe cho thuê theo lịch (trống = so_luong lúc tạo xe)"
+    )
     mau_sac = models.CharField(max_length=50)
     loai_xe = models.ForeignKey(LoaiXe, on_delete=models.CASCADE)
     mo_ta_ngan = models.TextField(blank=True)
@@ -64,17 +85,79 @@ class Xe(models.Model):
     seo_title = models.CharField(max_length=255, blank=True)
     seo_description = models.CharField(max_length=500, blank=True)
     seo_keywords = models.CharField(max_length=500, blank=True)
+    # Full-text search (xem products/search.py)
+    search_document = models.TextField(blank=True, editable=False, help_text="Text không dấu dùng cho tìm kiếm")
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Thời điểm thay đổi gần nhất của xe, kể cả ảnh (CarImage) và đánh giá (xem products/signals.py)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Điểm đánh giá tổng hợp, cập nhật cùng transaction với Review (xem products/ratings.py)
+    review_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_sum = models.PositiveIntegerField(default=0, editable=False)
+    avg_rating = models.DecimalField(max_digits=3, decimal_places=2, default=0, editable=False)
+    rating_1_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_2_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_3_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_4_count = models.PositiveIntegerField(default=0, editable=False)
+    rating_5_count = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        indexes = [
+            # ?ordering=-avg_rating và ?min_rating= (ma_xe làm tie-breaker cho keyset)
+            models.Index(fields=["avg_rating", "ma_xe"], name="xe_avg_rating_idx"),
+            # Các filter của XeViewSet (xem benchmark_indexes): ?loai= + khoảng giá thuê,
+            # ?ordering=gia_thue/gia (keyset), ?in_stock=true (partial index đúng điều kiện filter)
+            # và bộ filter thông số kỹ thuật
+            models.Index(fields=["loai_xe", "gia_thue", "ma_xe"], name="xe_loai_gia_thue_idx"),
+            models.Index(fields=["gia_thue", "ma_xe"], name="xe_gia_thue_idx"),
+            models.Index(fields=["gia", "ma_xe"], name="xe_gia_idx"),
+            models.Index(
+                fields=["gia_thue", "ma_xe"], name="xe_in_stock_gia_thue_idx",
+                condition=models.Q(trang_thai="in_stock", so_luong__gt=0),
+            ),
+            models.Index(fields=["loai_nhien_lieu", "hop_so", "so_cho"], name="xe_specs_idx"),
+            # Full-text search (products.search, chỉ PostgreSQL)
+            GinIndex(fields=["search_vector"], name="xe_search_vector_gin"),
+        ]
 
     def __str__(self):
         return self.ten_xe
 
+    @property
+    def rating_histogram(self):
+        """Số review theo từng mức sao: {"1": n, ..., "5": n}"""
+        return {str(star): getattr(self, f"rating_{star}_count") for star in RATING_STARS}
+
+    @property
+    def unit_capacity(self):
+        """Số chiếc cho thuê theo lịch (cùng quy tắc với orders.availability.unit_capacity)"""
+        return self.so_chiec if self.so_chiec is not None else max(self.so_luong or 0, 0)
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.so_chiec is None:
+            self.so_chiec = max(self.so_luong or 0, 0)
+        # Giữ search document đồng bộ với dữ liệu xe; update_fields không chạm field nào
+        # của search document (vd. tồn kho, ảnh) thì không build lại
+        from products.search import SEARCH_SOURCE_FIELDS, build_search_document, refresh_search_vector
+        update_fields = kwargs.get("update_fields")
+        reindex = update_fields is None or any(
+            self._meta.get_field(name).name in SEARCH_SOURCE_FIELDS for name in update_fields
+        )
+        if reindex:
+            self.search_document = build_search_document(self)
+        if update_fields is not None:
+            extra = {"search_document", "updated_at"} if reindex else {"updated_at"}
+            kwargs["update_fields"] = set(update_fields) | extra
+        super().save(*args, **kwargs)
+        if reindex:
+            refresh_search_vector(Xe.objects.filter(pk=self.pk))
+
 
 class Review(models.Model):
     """Đánh giá và nhận xét của khách hàng về xe"""
     xe = models.ForeignKey("Xe", on_delete=models.CASCADE, related_name="reviews")
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="reviews")
     rating = models.IntegerField(
-        choices=[(1, "1 sao"), (2, "2 sao"), (3, "3 sao"), (4, "4 sao"), (5, "5 sao")],
+        choices=[(star, f"{star} sao") for star in RATING_STARS],
         default=5,
         help_text="Đánh giá từ 1-5 sao"
     )
@@ -0,0 +1,94 @@
+"""
+Điểm đánh giá tổng hợp lưu sẵn trên Xe (review_count, rating_sum, avg_rating, rating_<n>_count)
+
+- ``apply_rating_change``: cập nhật tăng dần bằng 1 câu UPDATE (F expression, không
+  đọc-sửa-ghi nên không mất cập nhật khi nhiều review cùng lúc). Gọi trong cùng
+  transaction với thao tác trên Review (xem ReviewViewSet).
+- ``rebuild_ratings``: tính lại từ bảng Review để sửa sai lệch (review tạo/xóa ngoài
+  API, vd. admin hoặc xóa user), dùng qua lệnh ``manage.py rebuild_ratings``.
+"""
+from decimal import Decimal
+
+from django.db.models import Case, Count, ExpressionWrapper, F, FloatField, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Cast
+
+from products.models import RATING_STARS, Review, Xe
+
+
+def star_field(star):
+    return f"rating_{star}_count"
+
+
+def _average(count, total):
+    """
+    avg_rating làm tròn half-up tới 0.01, tính bằng phép chia nguyên (không qua float)
+    để trùng từng chữ số với _average_sql
+    """
+    if not count:
+        return Decimal("0")
+    return Decimal((total * 200 + count) // (count * 2)).scaleb(-2)
+
+
+def _average_sql(count, total):
+    """_average bằng SQL: làm tròn trên số nguyên, float chỉ để chia 100 khi ghi vào cột"""
+    hundredths = ExpressionWrapper((total * 200 + count) / (count * 2), output_field=IntegerField())
+    return Cast(hundredths, FloatField()) / 100
+
+
+def apply_rating_change(xe_id, old=None, new=None):
+    """
+    Cập nhật điểm tổng hợp của xe khi 1 review đổi từ ``old`` sao sang ``new`` sao
+    (old=None: review mới, new=None: review bị xóa)
+    """
+    count_delta = (new is not None) - (old is not None)
+    sum_delta = (new or 0) - (old or 0)
+    if not count_delta and not sum_delta:
+        return
+    # Biểu thức SET đọc giá trị cũ của dòng nên avg tính từ count/sum mới theo delta
+    new_count = F("review_count") + count_delta
+    new_sum = F("rating_sum") + sum_delta
+    updates = {
+        "review_count": new_count,
+        "rating_sum": new_sum,
+        "avg_rating": Case(
+            When(review_count__lte=-count_delta, then=Value(Decimal("0"))),
+            default=_average_sql(new_count, new_sum),
+            output_field=Xe._meta.get_field("avg_rating"),
+        ),
+    }
+    if old is not None:
+        updates[star_field(old)] = F(star_field(old)) - 1
+    if new is not None:
+        updates[star_field(new)] = F(star_field(new)) + 1
+    Xe.objects.filter(pk=xe_id).update(**updates)
+
+
+def rebuild_ratings(batch_size=1000):
+    """
+    Tính lại điểm tổng hợp cho toàn bộ xe từ bảng Review (1 query GROUP BY),
+    chỉ ghi các xe bị lệch
+
+    Returns:
+        số xe đã sửa
+    """
+    stats = {
+        row["xe_id"]: row
+        for row in Review.objects.order_by().values("xe_id").annotate(
+            review_count=Count("id"),
+            rating_sum=Sum("rating"),
+            **{star_field(star): Count("id", filter=Q(rating=star)) for star in RATING_STARS},
+        )
+    }
+    columns = ["review_count", "rating_sum"] + [star_field(star) for star in RATING_STARS]
+    changed = []
+    current = Xe.objects.only("pk", "avg_rating", *columns).order_by("pk")
+    for xe in current.iterator(chunk_size=batch_size):
+        row = stats.get(xe.pk, {})
+        expected = {column: row.get(column) or 0 for column in columns}
+        expected["avg_rating"] = _average(expected["review_count"], expected["rating_sum"])
+        if any(getattr(xe, name) != value for name, value in expected.items()):
+            for name, value in expected.items():
+                setattr(xe, name, value)
+            changed.append(xe)
+    Xe.objects.bulk_update(changed, columns + ["avg_rating"], batch_size=batch_size)
+    return len(changed)
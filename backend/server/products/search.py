@@ -0,0 +1,144 @@
+"""
+Full-text search cho danh mục xe: chuẩn hóa tiếng Việt không dấu, search document
+có trọng số, GIN index trên PostgreSQL và fallback cho SQLite (test)
+"""
+import re
+import unicodedata
+
+from django.db import connection
+from django.db.models import F, Value
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import StrIndex
+
+# Trọng số theo mức độ quan trọng của field (A > B > C > D)
+SEARCH_WEIGHTS = (
+    ("ten_xe", "A"),
+    ("loai_xe__ten_loai", "A"),
+    ("seo_keywords", "B"),
+    ("mau_sac", "B"),
+    ("mo_ta_ngan", "C"),
+    ("mo_ta", "D"),
+)
+# Field của Xe mà search document phụ thuộc: save(update_fields=...) không chạm field nào thì bỏ qua
+SEARCH_SOURCE_FIELDS = frozenset(path.split("__")[0] for path, _ in SEARCH_WEIGHTS)
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def fold_text(text):
+    """
+    Chuẩn hóa text để so khớp không dấu: bỏ dấu tiếng Việt, đ -> d, lowercase
+
+    Ví dụ: "Xe Tay Ga Đời Mới" -> "xe tay ga doi moi"
+    """
+    if not text:
+        return ""
+    text = str(text).replace("đ", "d").replace("Đ", "D")
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    return " ".join(text.lower().split())
+
+
+def tokenize(text):
+    """Tách text (đã fold) thành danh sách token chữ/số"""
+    return _TOKEN_RE.findall(fold_text(text))
+
+
+def uses_postgres_search():
+    """Chỉ dùng tsvector/GIN khi chạy trên PostgreSQL"""
+    return connection.vendor == "postgresql"
+
+
+def _field_value(xe, path):
+    value = xe
+    for attr in path.split("__"):
+        value = getattr(value, attr, None)
+        if value is None:
+            return ""
+    return value
+
+
+def build_search_parts(xe):
+    """Trả về [(text_đã_fold, weight), ...] theo thứ tự SEARCH_WEIGHTS"""
+    return [(fold_text(_field_value(xe, path)), weight) for path, weight in SEARCH_WEIGHTS]
+
+
+def build_search_document(xe):
+    """
+    Search document dạng text đã fold, mỗi field 1 dòng theo thứ tự SEARCH_WEIGHTS
+    (fold_text gộp khoảng trắng nên "\n" chỉ xuất hiện làm dấu phân cách).
+    Fallback SQLite rank theo vị trí match: field quan trọng đứng trước.
+    """
+    return "\n".join(text for text, _ in build_search_parts(xe))
+
+
+def _search_vector_sql():
+    """setweight(to_tsvector(dòng i), weight_i) || ... tính từ search_document"""
+    parts = [
+        f"setweight(to_tsvector('simple', split_part(search_document, E'\\n', {index})), '{weight}')"
+        for index, (_, weight) in enumerate(SEARCH_WEIGHTS, start=1)
+    ]
+    return RawSQL(" || ".join(parts), [])
+
+
+def refresh_search_vector(queryset):
+    """Tính lại search_vector từ search_document (chỉ PostgreSQL, 1 câu UPDATE)"""
+    if uses_postgres_search():
+        queryset.update(search_vector=_search_vector_sql())
+
+
+def rebuild_search_index(queryset=None, batch_size=1000):
+    """Build lại search index cho toàn bộ (hoặc một phần) xe, trả về số xe đã cập nhật"""
+    from products.models import Xe
+
+    if queryset is None:
+        queryset = Xe.objects.all()
+
+    count = 0
+    batch = []
+    for xe in queryset.select_related("loai_xe").order_by("pk").iterator(chunk_size=batch_size):
+        xe.search_document = build_search_document(xe)
+        batch.append(xe)
+        if len(batch) >= batch_size:
+            Xe.objects.bulk_update(batch, ["search_document"])
+            count += len(batch)
+            batch = []
+    if batch:
+        Xe.objects.bulk_update(batch, ["search_document"])
+        count += len(batch)
+
+    refresh_search_vector(queryset)
+    return count
+
+
+def build_prefix_tsquery(query):
+    """"xe tay ga" -> "xe:* & tay:* & ga:*" (cho phép gõ dở từ cuối)"""
+    return " & ".join(f"{token}:*" for token in tokenize(query))
+
+
+def search_queryset(queryset, query):
+    """
+    Lọc và xếp hạng queryset Xe theo query (không phân biệt dấu)
+
+    - PostgreSQL: search_vector @@ to_tsquery + ts_rank (dùng GIN index)
+    - SQLite/khác: mọi token phải có trong search_document, rank theo vị trí match đầu tiên
+    Queryset trả về có annotation ``search_rank`` (càng lớn càng liên quan).
+    """
+    tokens = tokenize(query)
+    if not tokens:
+        return queryset
+
+    if uses_postgres_search():
+        from django.contrib.postgres.search import SearchQuery, SearchRank
+
+        ts_query = SearchQuery(build_prefix_tsquery(query), search_type="raw", config="simple")
+        return queryset.filter(search_vector=ts_query).annotate(
+            search_rank=SearchRank(F("search_vector"), ts_query)
+        )
+
+    for token in tokens:
+        queryset = queryset.filter(search_document__contains=token)
+    # Match càng gần đầu document (tên xe, loại xe) thì càng liên quan
+    return queryset.annotate(
+        search_rank=Value(0) - StrIndex("search_document", Value(tokens[0]))
+    )
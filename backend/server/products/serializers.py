@@ -1,11 +1,18 @@
 ﻿from rest_framework import serializers
-from products.models import Location, LoaiXe, Xe, Review, CarImage, BlogPost
+from core.fieldsets import SparseFieldsetsMixin
+from products.models import RATING_STARS, Location, LoaiXe, Xe, Review, CarImage, BlogPost
 from django.contrib.auth.models import User
+from django.db.models import OuterRef, Subquery, TextField, Value
+from django.db.models.functions import Coalesce, NullIf, Substr
+from django.utils.text import Truncator
+
+
+RATING_COUNT_FIELDS = [f"rating_{star}_count" for star in RATING_STARS]
 
 
 # ==================== Location Serializers ====================
 
-class LocationSerializer(serializers.ModelSerializer):
+class LocationSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = Location
         fields = "__all__"
@@ -14,7 +21,7 @@ class LocationSerializer(serializers.ModelSerializer):
 
 # ==================== LoaiXe Serializers ====================
 
-class LoaiXeSerializer(serializers.ModelSerializer):
+class LoaiXeSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = LoaiXe
         fields = "__all__"
@@ -22,23 +29,35 @@ class LoaiXeSerializer(serializers.ModelSerializer):
 
 # ==================== Xe Serializers ====================
 
-class XeSerializer(serializers.ModelSerializer):
+class XeSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     image_file = serializers.ImageField(write_only=True, required=False, help_text="Upload ảnh từ máy tính")
     image_url_display = serializers.SerializerMethodField()
     loai_xe_detail = LoaiXeSerializer(source='loai_xe', read_only=True)
     car_images = serializers.SerializerMethodField()  # Thêm danh sách ảnh
+    rating_histogram = serializers.ReadOnlyField()
     
     class Meta:
         model = Xe
-        fields = "__all__"
+        exclude = [
+            "search_document", "search_vector",  # Dữ liệu nội bộ cho tìm kiếm
+            "rating_sum", *RATING_COUNT_FIELDS,  # Trả gộp qua rating_histogram
+        ]
         read_only_fields = ['image']  # image chỉ đọc, upload qua image_file
         depth = 1  # Tự động serialize ForeignKey với depth 1
+        # ?fields=image_url lấy giá trị từ image_url_display (xem to_representation)
+        sparse_aliases = {"image_url": ["image_url_display"]}
+        # Cột/quan hệ các field tính toán đọc tới, dùng để cắt queryset (core.fieldsets)
+        sparse_sources = {
+            "image_url_display": ["image", "image_url"],
+            "car_images": ["car_images"],
+            "rating_histogram": RATING_COUNT_FIELDS,
+        }
     
     def to_internal_value(self, data):
         """Convert string numbers to integers for FormData"""
         # Khi nhận FormData, data có thể là QueryDict hoặc dict
         # Convert các field số từ string sang int
-        int_fields = ['gia', 'gia_thue', 'gia_khuyen_mai', 'so_luong', 'so_cho', 'dung_tich_nhien_lieu']
+        int_fields = ['gia', 'gia_thue', 'gia_khuyen_mai', 'so_luong', 'so_chiec', 'so_cho', 'dung_tich_nhien_lieu']
         
         # Xử lý QueryDict (từ FormData)
         if hasattr(data, 'get'):
@@ -150,7 +169,8 @@ class XeSerializer(serializers.ModelSerializer):
         
         # Đảm bảo loai_xe được hiển thị đúng (depth=1 sẽ tự động serialize thành object)
         # Nếu loai_xe không có hoặc là string, đảm bảo nó là object
-        if instance.loai_xe:
+        # (bỏ qua khi client không lấy loai_xe qua ?fields=/?omit=)
+        if 'loai_xe' in self.fields and instance.loai_xe:
             if 'loai_xe' not in ret or not isinstance(ret.get('loai_xe'), dict):
                 # Nếu depth không hoạt động, serialize thủ công
                 ret['loai_xe'] = {
@@ -227,9 +247,74 @@ class XeSerializer(serializers.ModelSerializer):
         return instance
 
 
+class XeListSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
+    """
+    Serializer gọn cho danh sách/card xe: chỉ ảnh chính + tóm tắt ngắn
+
+    Cần queryset từ ``XeListSerializer.setup_queryset`` (ảnh chính và tóm tắt
+    được annotate sẵn), cả trang chỉ tốn 1 query. Chi tiết xe vẫn dùng XeSerializer
+    với đầy đủ gallery.
+    """
+    SUMMARY_LENGTH = 160
+
+    loai_xe = LoaiXeSerializer(read_only=True)
+    image_url = serializers.SerializerMethodField()
+    primary_image = serializers.SerializerMethodField()
+    summary = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Xe
+        fields = [
+            "ma_xe", "ten_xe", "slug", "gia", "gia_khuyen_mai", "gia_thue",
+            "so_luong", "mau_sac", "loai_xe", "trang_thai", "image_url",
+            "primary_image", "summary", "dung_tich_nhien_lieu", "hop_so",
+            "so_cho", "loai_nhien_lieu", "avg_rating", "review_count",
+        ]
+        read_only_fields = fields
+        sparse_sources = {"image_url": ["image", "image_url"], "primary_image": ["image", "image_url"], "summary": []}
+
+    @classmethod
+    def setup_queryset(cls, queryset):
+        """Annotate ảnh chính + tóm tắt, bỏ các cột text dài không dùng"""
+        primary = CarImage.objects.filter(xe=OuterRef("pk")).order_by("-is_primary", "-order", "created_at")
+        return queryset.select_related("loai_xe").defer(
+            "mo_ta", "mo_ta_ngan", "seo_title", "seo_description", "seo_keywords",
+            "search_document", "search_vector",
+        ).annotate(
+            primary_image_path=Subquery(primary.values("image")[:1]),
+            primary_image_link=Subquery(primary.values("image_url")[:1]),
+            summary_text=Coalesce(
+                NullIf("mo_ta_ngan", Value("")),
+                Substr("mo_ta", 1, cls.SUMMARY_LENGTH + 1),
+                output_field=TextField(),
+            ),
+        )
+
+    def _absolute(self, url):
+        request = self.context.get("request")
+        return request.build_absolute_uri(url) if request else url
+
+    def get_image_url(self, obj):
+        """Giống XeSerializer: ưu tiên ảnh upload, sau đó image_url"""
+        if obj.image:
+            return self._absolute(obj.image.url)
+        return obj.image_url or None
+
+    def get_primary_image(self, obj):
+        """Ảnh chính trong gallery, không có thì dùng ảnh của xe"""
+        path = getattr(obj, "primary_image_path", None)
+        if path:
+            return self._absolute(CarImage._meta.get_field("image").storage.url(path))
+        return getattr(obj, "primary_image_link", None) or self.get_image_url(obj)
+
+    def get_summary(self, obj):
+        text = getattr(obj, "summary_text", None) or ""
+        return Truncator(text).chars(self.SUMMARY_LENGTH)
+
+
 # ==================== Review Serializers ====================
 
-class UserReviewSerializer(serializers.ModelSerializer):
+class UserReviewSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer cho user trong review"""
     avatar_url = serializers.SerializerMethodField()
     
@@ -237,6 +322,7 @@ class UserReviewSerializer(serializers.ModelSerializer):
         model = User
         fields = ["id", "username", "first_name", "last_name", "email", "avatar_url"]
         read_only_fields = ["avatar_url"]
+        sparse_sources = {"avatar_url": ["profile"]}
     
     def get_avatar_url(self, obj):
         """Trả về avatar URL từ profile"""
@@ -257,7 +343,7 @@ class UserReviewSerializer(serializers.ModelSerializer):
         return None
 
 
-class ReviewSerializer(serializers.ModelSerializer):
+class ReviewSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer cho Review"""
     user = UserReviewSerializer(read_only=True)
     user_name = serializers.SerializerMethodField()
@@ -277,6 +363,7 @@ class ReviewSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["user", "created_at", "updated_at"]
+        sparse_sources = {"user_name": ["user"], "user_title": []}
     
     def get_user_name(self, obj):
         """Lấy tên đầy đủ hoặc username"""
@@ -301,7 +388,7 @@ class ReviewSerializer(serializers.ModelSerializer):
         return super().create(validated_data)
 
 
-class ReviewCreateSerializer(serializers.ModelSerializer):
+class ReviewCreateSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer đơn giản để tạo review"""
     class Meta:
         model = Review
@@ -326,7 +413,7 @@ class ReviewCreateSerializer(serializers.ModelSerializer):
 
 # ==================== CarImage Serializers ====================
 
-class CarImageSerializer(serializers.ModelSerializer):
+class CarImageSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer cho CarImage"""
     image_url_display = serializers.SerializerMethodField()
     
@@ -344,6 +431,8 @@ class CarImageSerializer(serializers.ModelSerializer):
             "updated_at",
         ]
         read_only_fields = ["created_at", "updated_at"]
+        sparse_aliases = {"image_url": ["image_url_display"]}
+        sparse_sources = {"image_url_display": ["image", "image_url"]}
     
     def get_image_url_display(self, obj):
         """Trả về image_url từ image field hoặc image_url field"""
@@ -362,7 +451,7 @@ class CarImageSerializer(serializers.ModelSerializer):
         return ret
 
 
-class CarImageCreateSerializer(serializers.ModelSerializer):
+class CarImageCreateSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer đơn giản để tạo nhiều ảnh"""
     class Meta:
         model = CarImage
@@ -381,7 +470,7 @@ class CarImageCreateSerializer(serializers.ModelSerializer):
 
 # ==================== BlogPost Serializers ====================
 
-class BlogPostSerializer(serializers.ModelSerializer):
+class BlogPostSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = BlogPost
         fields = "__all__"
@@ -0,0 +1,46 @@
+"""
+Signals cho products: giữ các index trong bộ nhớ đồng bộ với database
+(chỉ cập nhật sau khi transaction commit để không giữ dữ liệu bị rollback)
+và tăng version cache của các endpoint catalog (core.cache)
+"""
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from core.cache import track_model_versions
+from products.autocomplete import autocomplete_index
+from products.models import BlogPost, CarImage, LoaiXe, Location, Review, Xe
+
+track_model_versions(Xe, CarImage, LoaiXe, Location, BlogPost, Review)
+
+
+@receiver(post_save, sender=Xe)
+def xe_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete_index.update_car(instance))
+
+
+@receiver(post_delete, sender=Xe)
+def xe_deleted(sender, instance, **kwargs):
+    ma_xe = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.remove_car(ma_xe))
+
+
+@receiver(post_save, sender=LoaiXe)
+def loai_xe_saved(sender, instance, **kwargs):
+    transaction.on_commit(lambda: autocomplete_index.update_category(instance))
+
+
+@receiver(post_delete, sender=LoaiXe)
+def loai_xe_deleted(sender, instance, **kwargs):
+    ma_loai = instance.pk
+    transaction.on_commit(lambda: autocomplete_index.remove_category(ma_loai))
+
+
+@receiver(post_save, sender=CarImage)
+@receiver(post_delete, sender=CarImage)
+@receiver(post_save, sender=Review)
+@receiver(post_delete, sender=Review)
+def touch_xe(sender, instance, **kwargs):
+    """Ảnh/đánh giá thay đổi = xe thay đổi (ETag/Last-Modified của xe dựa vào Xe.updated_at)"""
+    Xe.objects.filter(pk=instance.xe_id).update(updated_at=timezone.now())
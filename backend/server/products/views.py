@@ -2,12 +2,23 @@
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser, AllowAny, IsAuthenticated
+from django.db import transaction
 from django.shortcuts import get_object_or_404
+from decimal import Decimal, InvalidOperation
 import logging
 
+from core.cache import CachedResponseMixin, ConditionalGetMixin
+from core.fieldsets import SparseQuerysetMixin
+from orders.availability import WINDOW_PARAMS, fully_booked_cars, parse_window, unit_capacity
+from orders.occupancy import month_bounds, occupancy_calendar, parse_month
+
 from products.models import Location, LoaiXe, Xe, Review, CarImage, BlogPost
+from products.search import search_queryset
+from products.autocomplete import autocomplete_index
+from products.facets import FACET_PARAMS, get_facets
+from products.ratings import apply_rating_change
 from products.serializers import (
-    LocationSerializer, LoaiXeSerializer, XeSerializer,
+    LocationSerializer, LoaiXeSerializer, XeSerializer, XeListSerializer,
     ReviewSerializer, ReviewCreateSerializer,
     CarImageSerializer, CarImageCreateSerializer,
     BlogPostSerializer
@@ -16,8 +27,9 @@ from products.serializers import (
 
 # ==================== Location ViewSet ====================
 
-class LocationViewSet(viewsets.ModelViewSet):
+class LocationViewSet(CachedResponseMixin, ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho Location"""
+    cache_models = (Location,)
     queryset = Location.objects.filter(trang_thai=True).order_by('ten_dia_diem')
     serializer_class = LocationSerializer
     
@@ -33,8 +45,9 @@ class LocationViewSet(viewsets.ModelViewSet):
 
 # ==================== LoaiXe ViewSet ====================
 
-class LoaiXeViewSet(viewsets.ModelViewSet):
+class LoaiXeViewSet(CachedResponseMixin, ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho LoaiXe"""
+    cache_models = (LoaiXe,)
     queryset = LoaiXe.objects.all().order_by('ma_loai', 'ten_loai')
     serializer_class = LoaiXeSerializer
     
@@ -50,20 +63,79 @@ class LoaiXeViewSet(viewsets.ModelViewSet):
 
 # ==================== Xe ViewSet ====================
 
-class XeViewSet(viewsets.ModelViewSet):
+class XeViewSet(CachedResponseMixin, ConditionalGetMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho Xe với advanced search và filters"""
+    cache_models = (Xe, CarImage, LoaiXe, Review)
+    # Xe.updated_at đã gồm thay đổi ảnh/đánh giá; loai_xe được nhúng trong response
+    last_modified_fields = ("updated_at", "loai_xe__updated_at")
     queryset = Xe.objects.select_related("loai_xe").order_by('ma_xe', 'ten_xe')
     serializer_class = XeSerializer
-    filter_backends = [filters.SearchFilter, filters.OrderingFilter]
-    search_fields = ["ten_xe", "mau_sac", "loai_xe__ten_loai", "seo_keywords", "mo_ta_ngan", "mo_ta"]
-    ordering_fields = ["gia", "gia_thue", "so_luong", "ten_xe", "ma_xe"]
-    ordering = ["ma_xe"]  # Default ordering - sử dụng ma_xe thay vì created_at
+    # ?search= được xử lý bởi products.search (không dấu + xếp hạng), không dùng SearchFilter
+    filter_backends = [filters.OrderingFilter]
+    ordering_fields = ["gia", "gia_thue", "so_luong", "ten_xe", "ma_xe", "avg_rating", "review_count"]
+    # Keyset pagination (?cursor=) cho các ordering ổn định, xem core.pagination
+    cursor_orderings = {
+        "ma_xe": ("ma_xe",),
+        "gia": ("gia", "ma_xe"),
+        "-gia": ("-gia", "-ma_xe"),
+        "gia_thue": ("gia_thue", "ma_xe"),
+        "-gia_thue": ("-gia_thue", "-ma_xe"),
+        "avg_rating": ("avg_rating", "ma_xe"),
+        "-avg_rating": ("-avg_rating", "-ma_xe"),
+    }
+
+    @property
+    def ordering(self):
+        """Default ordering: theo độ liên quan khi search, ngược lại theo ma_xe"""
+        request = getattr(self, "request", None)
+        if request and request.query_params.get("search", "").strip():
+            return ["-search_rank", "ma_xe"]
+        return ["ma_xe"]
 
     def get_permissions(self):
-        if self.action in ["list", "retrieve"]:
+        if self.action in ["list", "retrieve", "search_suggestions", "facets"]:
             return [AllowAny()]
         return [IsAdminUser()]
 
+    def uses_compact_list(self):
+        """
+        Danh sách public dùng XeListSerializer (card gọn); admin vẫn nhận bản đầy đủ
+        vì trang quản lý xe điền form sửa từ chính dữ liệu list
+        """
+        user = self.request.user
+        return self.action == "list" and not (user and user.is_staff)
+
+    def filters_by_window(self, request):
+        return any(request.query_params.get(name) for name in WINDOW_PARAMS)
+
+    def is_cacheable(self, request):
+        # Kết quả lọc xe trống đổi theo từng đơn đặt, không cache
+        return super().is_cacheable(request) and not self.filters_by_window(request)
+
+    def exclude_fully_booked(self, qs, window, params):
+        """
+        Bỏ xe kín chiếc trong khoảng thời gian khỏi queryset đã lọc; tính 1 lần mỗi request
+        cho cùng bộ filter (validators + list)
+        """
+        cache = self.__dict__.setdefault("_fully_booked", {})
+        key = (window, tuple(sorted(params.items())))
+        if key not in cache:
+            cache[key] = fully_booked_cars(*window, cars=qs)
+        full = cache[key]
+        return qs.exclude(pk__in=full) if full else qs
+
+    def get_validators(self, request, queryset):
+        # ETag chỉ dựa trên xe nên không phản ánh đơn đặt mới; vẫn giữ COUNT cho pagination
+        validators, count = super().get_validators(request, queryset)
+        if self.filters_by_window(request):
+            validators = None
+        return validators, count
+
+    def get_serializer_class(self):
+        if self.uses_compact_list():
+            return XeListSerializer
+        return XeSerializer
+
     def get_serializer_context(self):
         """Truyền request vào serializer để build absolute URI cho image"""
         context = super().get_serializer_context()
@@ -96,13 +168,22 @@ class XeViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         """Advanced filtering với nhiều tiêu chí"""
-        from django.db.models import Q
-        
         qs = Xe.objects.select_related("loai_xe")
+        if self.uses_compact_list():
+            qs = XeListSerializer.setup_queryset(qs)
+        elif self.action in ["list", "retrieve"]:
+            # XeSerializer trả kèm gallery car_images
+            qs = qs.prefetch_related("car_images")
+        # Ordering được xử lý bởi OrderingFilter
+        return self.apply_filters(qs, self.request.query_params)
+
+    def apply_filters(self, qs, params, skip=()):
+        """Áp dụng các filter từ query params (bỏ qua các param trong skip)"""
+        params = {key: value for key, value in params.items() if key not in skip}
         
         # Price filters
-        min_price = self.request.query_params.get("min_price")
-        max_price = self.request.query_params.get("max_price")
+        min_price = params.get("min_price")
+        max_price = params.get("max_price")
         if min_price:
             try:
                 qs = qs.filter(gia__gte=int(min_price))
@@ -115,8 +196,8 @@ class XeViewSet(viewsets.ModelViewSet):
                 pass
         
         # Rental price filters
-        gia_thue_min = self.request.query_params.get("gia_thue_min")
-        gia_thue_max = self.request.query_params.get("gia_thue_max")
+        gia_thue_min = params.get("gia_thue_min")
+        gia_thue_max = params.get("gia_thue_max")
         if gia_thue_min:
             try:
                 qs = qs.filter(gia_thue__gte=int(gia_thue_min))
@@ -128,39 +209,49 @@ class XeViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
         
+        # Rating filter (avg_rating lưu sẵn trên xe, có index)
+        min_rating = params.get("min_rating")
+        if min_rating:
+            try:
+                min_rating = Decimal(min_rating)
+            except InvalidOperation:
+                min_rating = None
+            if min_rating is not None and min_rating.is_finite():
+                qs = qs.filter(avg_rating__gte=min_rating)
+        
         # Category filter
-        loai = self.request.query_params.get("loai")
+        loai = params.get("loai")
         if loai:
             qs = qs.filter(loai_xe__ma_loai=loai)
         
         # Status filter
-        status = self.request.query_params.get("status")
+        status = params.get("status")
         if status:
             qs = qs.filter(trang_thai=status)
         
         # Stock filter
-        in_stock = self.request.query_params.get("in_stock")
+        in_stock = params.get("in_stock")
         if in_stock and in_stock.lower() == "true":
             qs = qs.filter(so_luong__gt=0, trang_thai="in_stock")
         
         # Color filter
-        color = self.request.query_params.get("color")
+        color = params.get("color")
         if color:
             qs = qs.filter(mau_sac__icontains=color)
         
         # Fuel type filter
-        fuel_type = self.request.query_params.get("fuel_type")
+        fuel_type = params.get("fuel_type")
         if fuel_type:
             qs = qs.filter(loai_nhien_lieu=fuel_type)
         
         # Transmission filter
-        transmission = self.request.query_params.get("transmission")
+        transmission = params.get("transmission")
         if transmission:
             qs = qs.filter(hop_so=transmission)
         
         # Seats filter
-        min_seats = self.request.query_params.get("min_seats")
-        max_seats = self.request.query_params.get("max_seats")
+        min_seats = params.get("min_seats")
+        max_seats = params.get("max_seats")
         if min_seats:
             try:
                 qs = qs.filter(so_cho__gte=int(min_seats))
@@ -172,71 +263,88 @@ class XeViewSet(viewsets.ModelViewSet):
             except ValueError:
                 pass
         
-        # Full-text search với PostgreSQL (nếu có)
-        search_query = self.request.query_params.get("search")
+        # Full-text search không dấu (GIN index trên PostgreSQL), annotate search_rank
+        search_query = params.get("search", "").strip()
         if search_query:
-            # Sử dụng Q objects để search nhiều fields
-            qs = qs.filter(
-                Q(ten_xe__icontains=search_query) |
-                Q(mau_sac__icontains=search_query) |
-                Q(loai_xe__ten_loai__icontains=search_query) |
-                Q(seo_keywords__icontains=search_query) |
-                Q(mo_ta_ngan__icontains=search_query) |
-                Q(mo_ta__icontains=search_query)
-            )
+            qs = search_queryset(qs, search_query)
+        
+        # Availability filter: bỏ xe đã kín chiếc trong khoảng thời gian (xe nhiều chiếc còn trống
+        # vẫn hiện), đặt cuối để chỉ sweep-line các xe đã qua mọi filter khác
+        available_from = params.get("available_from")
+        available_to = params.get("available_to")
+        if available_from or available_to:
+            window = parse_window(available_from, available_to)
+            if window:
+                qs = self.exclude_fully_booked(qs, window, params)
         
-        # Ordering được xử lý bởi OrderingFilter
         return qs
     
     @action(detail=False, methods=["get"], url_path="search-suggestions")
     def search_suggestions(self, request):
-        """API trả về search suggestions/autocomplete"""
+        """API trả về search suggestions/autocomplete (từ index trong bộ nhớ, không query DB)"""
         query = request.query_params.get("q", "").strip()
         
         if not query or len(query) < 2:
             return Response({"suggestions": []})
         
-        # Lấy suggestions từ tên xe và loại xe
-        from django.db.models import Q
-        
-        cars = Xe.objects.filter(
-            Q(ten_xe__icontains=query) | Q(loai_xe__ten_loai__icontains=query)
-        ).select_related("loai_xe")[:10]
-        
-        suggestions = []
-        seen = set()
-        
-        for car in cars:
-            # Thêm tên xe
-            if car.ten_xe.lower() not in seen:
-                suggestions.append({
-                    "type": "car",
-                    "text": car.ten_xe,
-                    "value": car.ten_xe,
-                    "id": car.ma_xe
-                })
-                seen.add(car.ten_xe.lower())
-            
-            # Thêm loại xe
-            if car.loai_xe.ten_loai.lower() not in seen:
-                suggestions.append({
-                    "type": "category",
-                    "text": car.loai_xe.ten_loai,
-                    "value": car.loai_xe.ten_loai,
-                    "id": car.loai_xe.ma_loai
-                })
-                seen.add(car.loai_xe.ten_loai.lower())
-        
-        return Response({"suggestions": suggestions[:10]})
+        return Response({"suggestions": autocomplete_index.search(query, limit=10)})
+
+    @action(detail=False, methods=["get"], url_path="facets")
+    def facets(self, request):
+        """
+        Số lượng xe theo từng giá trị filter + histogram giá thuê cho bộ filter hiện tại
+
+        Nhận cùng query params với /api/xe/ (thêm bucket_size cho histogram).
+        """
+        qs = self.apply_filters(Xe.objects.all(), request.query_params, skip=FACET_PARAMS)
+        return Response(get_facets(qs, request.query_params))
+
+    @action(detail=False, methods=["get"], url_path="calendar")
+    def calendar(self, request):
+        """
+        Lịch đặt của cả đội xe theo ngày trong 1 tháng (admin, dạng Gantt)
+
+        ?month=2025-01 (mặc định tháng hiện tại), nhận thêm các filter của /api/xe/.
+        occupancy[i] là số chiếc bị đặt ngày i+1, lấy từ lịch trong bộ nhớ (orders.occupancy)
+        nên cả tháng chỉ tốn 1 query danh sách xe. Ngày kín xe so với sức chứa (so_chiec),
+        không so với tồn kho so_luong đã bị trừ theo đơn.
+        """
+        first_day = parse_month(request.query_params.get("month"))
+        if first_day is None:
+            return Response({"detail": "month phải có dạng YYYY-MM."}, status=status.HTTP_400_BAD_REQUEST)
+        cars = list(
+            self.apply_filters(Xe.objects.all(), request.query_params)
+            .order_by("ma_xe")
+            .annotate(capacity=unit_capacity())
+            .values_list("ma_xe", "ten_xe", "so_luong", "capacity")
+        )
+        occupancy = occupancy_calendar.occupancy(first_day, [ma_xe for ma_xe, *_ in cars])
+        _, _, days = month_bounds(first_day)
+        return Response({
+            "month": first_day.strftime("%Y-%m"),
+            "days": days,
+            "cars": [
+                {
+                    "ma_xe": ma_xe,
+                    "ten_xe": ten_xe,
+                    "so_luong": so_luong,
+                    "capacity": capacity,
+                    "occupancy": occupancy[ma_xe].tolist(),
+                    "fully_booked_days": int((occupancy[ma_xe] >= max(capacity, 1)).sum()),
+                }
+                for ma_xe, ten_xe, so_luong, capacity in cars
+            ],
+        })
 
 
 # ==================== Review ViewSet ====================
 
-class ReviewViewSet(viewsets.ModelViewSet):
+class ReviewViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho Review"""
     queryset = Review.objects.all()
     serializer_class = ReviewSerializer
     permission_classes = [AllowAny]  # Cho phép xem reviews, nhưng chỉ authenticated user mới tạo được
+    cursor_orderings = {"-created_at": ("-created_at", "-id")}
     
     def get_permissions(self):
         """Chỉ authenticated user mới có thể tạo, cập nhật, xóa review"""
@@ -266,12 +374,14 @@ class ReviewViewSet(viewsets.ModelViewSet):
                     status=status.HTTP_400_BAD_REQUEST
                 )
             
-            review = Review.objects.create(
-                xe=xe,
-                user=request.user,
-                rating=serializer.validated_data["rating"],
-                comment=serializer.validated_data["comment"]
-            )
+            with transaction.atomic():
+                review = Review.objects.create(
+                    xe=xe,
+                    user=request.user,
+                    rating=serializer.validated_data["rating"],
+                    comment=serializer.validated_data["comment"]
+                )
+                apply_rating_change(xe.pk, new=review.rating)
             
             return Response(
                 ReviewSerializer(review, context={"request": request}).data,
@@ -289,6 +399,19 @@ class ReviewViewSet(viewsets.ModelViewSet):
             )
         return super().update(request, *args, **kwargs)
     
+    def perform_update(self, serializer):
+        """Cập nhật điểm tổng hợp của xe trong cùng transaction (khóa review để đọc sao cũ)"""
+        with transaction.atomic():
+            old_xe_id, old_rating = Review.objects.select_for_update().values_list(
+                "xe_id", "rating"
+            ).get(pk=serializer.instance.pk)
+            review = serializer.save()
+            if review.xe_id != old_xe_id:
+                apply_rating_change(old_xe_id, old=old_rating)
+                apply_rating_change(review.xe_id, new=review.rating)
+            else:
+                apply_rating_change(review.xe_id, old=old_rating, new=review.rating)
+    
     def destroy(self, request, *args, **kwargs):
         """Chỉ cho phép user xóa review của chính mình"""
         review = self.get_object()
@@ -299,6 +422,13 @@ class ReviewViewSet(viewsets.ModelViewSet):
             )
         return super().destroy(request, *args, **kwargs)
     
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            locked = Review.objects.select_for_update().filter(pk=instance.pk).values_list("xe_id", "rating").first()
+            instance.delete()
+            if locked:
+                apply_rating_change(locked[0], old=locked[1])
+    
     @action(detail=False, methods=["get"])
     def by_car(self, request):
         """Lấy tất cả reviews của một xe cụ thể"""
@@ -316,7 +446,7 @@ class ReviewViewSet(viewsets.ModelViewSet):
 
 # ==================== CarImage ViewSet ====================
 
-class CarImageViewSet(viewsets.ModelViewSet):
+class CarImageViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho CarImage"""
     queryset = CarImage.objects.all()
     serializer_class = CarImageSerializer
@@ -398,8 +528,9 @@ class CarImageViewSet(viewsets.ModelViewSet):
 
 # ==================== BlogPost ViewSet ====================
 
-class BlogPostViewSet(viewsets.ModelViewSet):
+class BlogPostViewSet(CachedResponseMixin, SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho BlogPost"""
+    cache_models = (BlogPost,)
     queryset = BlogPost.objects.all().order_by("-published_at")
     serializer_class = BlogPostSerializer
 
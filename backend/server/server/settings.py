@@ -114,6 +114,7 @@ CORS_ALLOW_HEADERS = [
     "x-csrftoken",
     "x-requested-with",
     "x-session-key",
+    "idempotency-key",
 ]
 
 ROOT_URLCONF = 'server.urls'
@@ -212,7 +213,7 @@ REST_FRAMEWORK = {
     "DEFAULT_PERMISSION_CLASSES": (
         "rest_framework.permissions.AllowAny",  # Changed to AllowAny, override in viewsets
     ),
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.HybridPagination",
     "PAGE_SIZE": 10,
     # Throttling Configuration
     # Trong môi trường development: TẮT hoặc TĂNG RẤT CAO
@@ -243,6 +244,76 @@ SPECTACULAR_SETTINGS = {
     "SERVE_INCLUDE_SCHEMA": False,
 }
 
+# ==================== Cache Configuration ====================
+# Dùng Redis khi có CACHE_REDIS_URL (chia sẻ giữa các worker), ngược lại cache trong bộ nhớ process
+CACHE_REDIS_URL = os.getenv("CACHE_REDIS_URL", "")
+if CACHE_REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": CACHE_REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+# Response cache cho catalog public (core.cache): thời gian còn "mới" và thời gian được trả bản cũ
+RESPONSE_CACHE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_TIMEOUT", "60"))
+RESPONSE_CACHE_STALE_TIMEOUT = int(os.getenv("RESPONSE_CACHE_STALE_TIMEOUT", "300"))
+
+# ==================== Search Configuration ====================
+# Autocomplete index (process-local) tự build lại sau số giây này
+AUTOCOMPLETE_MAX_AGE = int(os.getenv("AUTOCOMPLETE_MAX_AGE", "300"))
+# Cache facet counts (/api/xe/facets/) theo bộ filter đã chuẩn hóa
+FACETS_CACHE_TIMEOUT = int(os.getenv("FACETS_CACHE_TIMEOUT", "60"))
+# Độ rộng mặc định mỗi bucket histogram giá thuê (VNĐ)
+FACETS_PRICE_BUCKET_SIZE = int(os.getenv("FACETS_PRICE_BUCKET_SIZE", "500000"))
+
+# ==================== Booking Calendar ====================
+# Lịch chiếm dụng theo ngày (process-local, /api/xe/calendar/): build lại sau số giây này
+OCCUPANCY_CALENDAR_MAX_AGE = int(os.getenv("OCCUPANCY_CALENDAR_MAX_AGE", "300"))
+# Số tháng giữ trong bộ nhớ mỗi worker
+OCCUPANCY_CALENDAR_MONTHS = int(os.getenv("OCCUPANCY_CALENDAR_MONTHS", "24"))
+
+# ==================== Maps ====================
+# Cache geocode (orders.geocoding): số địa chỉ giữ trong bộ nhớ mỗi worker và thời hạn trong database
+GEOCODE_CACHE_SIZE = int(os.getenv("GEOCODE_CACHE_SIZE", "4096"))
+GEOCODE_CACHE_TTL = int(os.getenv("GEOCODE_CACHE_TTL", str(30 * 24 * 3600)))
+# Địa chỉ không tìm thấy được hỏi lại provider sau số giây này
+GEOCODE_NEGATIVE_TTL = int(os.getenv("GEOCODE_NEGATIVE_TTL", "3600"))
+GEOCODE_TIMEOUT = float(os.getenv("GEOCODE_TIMEOUT", "5"))
+NOMINATIM_URL = os.getenv("NOMINATIM_URL", "https://nominatim.openstreetmap.org/search")
+# Client HTTP tới provider bản đồ (orders.providers): hạn tổng mỗi request API (giây),
+# số thread gọi song song và số kết nối keep-alive giữ cho mỗi provider
+MAPS_REQUEST_DEADLINE = float(os.getenv("MAPS_REQUEST_DEADLINE", "10"))
+MAPS_HTTP_WORKERS = int(os.getenv("MAPS_HTTP_WORKERS", "8"))
+MAPS_HTTP_POOL_SIZE = int(os.getenv("MAPS_HTTP_POOL_SIZE", "10"))
+# Circuit breaker mỗi provider: cửa sổ trượt (giây), số lần gọi tối thiểu và tỉ lệ lỗi để ngắt,
+# gọi chậm hơn SLOW_CALL giây tính là lỗi, sau COOLDOWN giây cho 1 lần gọi thử
+MAPS_BREAKER_WINDOW = float(os.getenv("MAPS_BREAKER_WINDOW", "60"))
+MAPS_BREAKER_MIN_CALLS = int(os.getenv("MAPS_BREAKER_MIN_CALLS", "5"))
+MAPS_BREAKER_ERROR_RATE = float(os.getenv("MAPS_BREAKER_ERROR_RATE", "0.5"))
+MAPS_BREAKER_SLOW_CALL = float(os.getenv("MAPS_BREAKER_SLOW_CALL", "5"))
+MAPS_BREAKER_COOLDOWN = float(os.getenv("MAPS_BREAKER_COOLDOWN", "30"))
+# OSRM: route cho API bản đồ, table cho ma trận khoảng cách giữa các Location
+OSRM_URL = os.getenv("OSRM_URL", "http://router.project-osrm.org")
+# Route OSRM (orders.routing): cache theo cặp điểm làm tròn ROUTE_CACHE_PRECISION chữ số thập phân,
+# geometry rút gọn ~1 pixel ở ROUTE_DEFAULT_ZOOM khi request không gửi zoom
+ROUTE_CACHE_TTL = int(os.getenv("ROUTE_CACHE_TTL", str(24 * 3600)))
+ROUTE_CACHE_PRECISION = int(os.getenv("ROUTE_CACHE_PRECISION", "4"))
+ROUTE_DEFAULT_ZOOM = int(os.getenv("ROUTE_DEFAULT_ZOOM", "16"))
+
+# ==================== Price quotes ====================
+# Số giây quote_token của calculate_price_api còn dùng được để tạo đơn (orders.quotes)
+PRICE_QUOTE_TTL = int(os.getenv("PRICE_QUOTE_TTL", "900"))
+
+# ==================== Idempotency ====================
+# Số giây giữ response của Idempotency-Key (core.idempotency), sau đó purge_idempotency_keys xóa
+IDEMPOTENCY_KEY_TTL = int(os.getenv("IDEMPOTENCY_KEY_TTL", str(24 * 3600)))
+
 # ==================== Email Configuration ====================
 EMAIL_BACKEND = os.getenv(
     "EMAIL_BACKEND",
@@ -1,11 +1,12 @@
 ﻿from rest_framework import serializers
+from core.fieldsets import SparseFieldsetsMixin
 from django.contrib.auth.models import User
 from users.models import Admin, NhanVien, KhachHang, NCC, UserProfile
 
 
 # ==================== Admin Serializers ====================
 
-class AdminSerializer(serializers.ModelSerializer):
+class AdminSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = Admin
         fields = "__all__"
@@ -13,19 +14,19 @@ class AdminSerializer(serializers.ModelSerializer):
 
 # ==================== People Serializers ====================
 
-class NhanVienSerializer(serializers.ModelSerializer):
+class NhanVienSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = NhanVien
         fields = "__all__"
 
 
-class KhachHangSerializer(serializers.ModelSerializer):
+class KhachHangSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = KhachHang
         fields = "__all__"
 
 
-class NCCSerializer(serializers.ModelSerializer):
+class NCCSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     class Meta:
         model = NCC
         fields = "__all__"
@@ -33,7 +34,7 @@ class NCCSerializer(serializers.ModelSerializer):
 
 # ==================== Auth Serializers ====================
 
-class RegisterSerializer(serializers.ModelSerializer):
+class RegisterSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
 
     class Meta:
@@ -83,7 +84,7 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 # ==================== User Profile Serializer ====================
 
-class UserProfileSerializer(serializers.ModelSerializer):
+class UserProfileSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     """Serializer cho UserProfile"""
     avatar_url = serializers.SerializerMethodField()
 
@@ -91,6 +92,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         model = UserProfile
         fields = ["avatar", "avatar_url", "phone", "address", "date_of_birth", "gender"]
         read_only_fields = ["avatar_url"]
+        sparse_sources = {"avatar_url": ["avatar", "avatar_url"]}
 
     def get_avatar_url(self, obj):
         """Trả về URL đầy đủ của avatar
@@ -115,7 +117,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
 
 # ==================== User Serializers ====================
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetsMixin, serializers.ModelSerializer):
     role = serializers.SerializerMethodField()
     password = serializers.CharField(write_only=True, required=False, allow_blank=True)
     date_joined = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
@@ -127,6 +129,7 @@ class UserSerializer(serializers.ModelSerializer):
         model = User
         fields = ["id", "username", "email", "first_name", "last_name", "is_staff", "is_superuser", "is_active", "date_joined", "last_login", "role", "password", "avatar_url", "profile"]
         read_only_fields = ["id", "date_joined", "last_login", "avatar_url", "profile"]
+        sparse_sources = {"role": ["is_staff", "is_superuser"], "avatar_url": ["profile"]}
 
     def get_role(self, obj):
         if obj.is_superuser:
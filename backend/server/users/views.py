@@ -5,6 +5,7 @@ from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import AllowAny, IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
 from rest_framework_simplejwt.tokens import RefreshToken
+from core.fieldsets import SparseQuerysetMixin
 import os
 
 User = get_user_model()
@@ -19,21 +20,21 @@ from users.serializers import (
 
 # ==================== People ViewSets ====================
 
-class NhanVienViewSet(viewsets.ModelViewSet):
+class NhanVienViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho NhanVien"""
     queryset = NhanVien.objects.all()
     serializer_class = NhanVienSerializer
     permission_classes = [IsAdminUser]
 
 
-class KhachHangViewSet(viewsets.ModelViewSet):
+class KhachHangViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho KhachHang"""
     queryset = KhachHang.objects.all()
     serializer_class = KhachHangSerializer
     permission_classes = [IsAuthenticated]
 
 
-class NCCViewSet(viewsets.ModelViewSet):
+class NCCViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho NCC"""
     queryset = NCC.objects.all()
     serializer_class = NCCSerializer
@@ -42,7 +43,7 @@ class NCCViewSet(viewsets.ModelViewSet):
 
 # ==================== Account ViewSets ====================
 
-class AdminViewSet(viewsets.ModelViewSet):
+class AdminViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """ViewSet cho Admin"""
     queryset = Admin.objects.all()
     serializer_class = AdminSerializer
@@ -781,7 +782,7 @@ def resend_verification_email(request):
 
 # ==================== User ViewSet ====================
 
-class UserViewSet(viewsets.ModelViewSet):
+class UserViewSet(SparseQuerysetMixin, viewsets.ModelViewSet):
     """
     ViewSet để quản lý tất cả tài khoản User (CRUD - chỉ admin)
     """
@@ -0,0 +1,178 @@
+"""
+Test header Idempotency-Key (core.idempotency) cho tạo đơn, checkout và thanh toán
+"""
+import threading
+import unittest
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from core.models import IdempotencyKey
+from orders.models import Cart, CartItem, Order
+from orders.views_commerce import OrderViewSet
+from products.models import LoaiXe, Xe
+
+
+def create_xe(so_luong=5):
+    loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+    return Xe.objects.create(
+        ma_xe="X001", ten_xe="Vision", slug="vision", gia=30000000, gia_thue=150000,
+        so_luong=so_luong, mau_sac="Đỏ", loai_xe=loai,
+    )
+
+
+ORDER = {"items": [{"xe_id": "X001", "quantity": 1}]}
+
+
+class IdempotencyKeyTest(TestCase):
+    """Gửi lại cùng key nhận lại response cũ, không tạo thêm dữ liệu"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.client.force_authenticate(user=self.user)
+        self.xe = create_xe()
+
+    def post(self, url, data=None, key="key-1"):
+        headers = {"HTTP_IDEMPOTENCY_KEY": key} if key else {}
+        return self.client.post(url, data or {}, format="json", **headers)
+
+    def test_order_create_replay(self):
+        first = self.post("/api/order/", ORDER)
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+
+        with self.assertNumQueries(1):
+            # Chỉ SELECT dòng đã lưu, không chạy lại view
+            replay = self.post("/api/order/", ORDER)
+        self.assertEqual(replay.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay.data["id"], first.data["id"])
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual(Xe.objects.get(pk="X001").so_luong, 4)
+
+        # Key khác / không có key: tạo đơn mới
+        self.assertEqual(self.post("/api/order/", ORDER, key="key-2").status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.post("/api/order/", ORDER, key=None).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 3)
+
+    def test_key_scoped_by_user_and_body(self):
+        self.post("/api/order/", ORDER)
+        response = self.post("/api/order/", {"items": [{"xe_id": "X001", "quantity": 2}]})
+        self.assertEqual(response.status_code, status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+        other = User.objects.create_user(username="other", password="pass12345")
+        self.client.force_authenticate(user=other)
+        self.assertEqual(self.post("/api/order/", ORDER).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Order.objects.count(), 2)
+
+        self.assertEqual(self.post("/api/order/", ORDER, key="x" * 256).status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_client_errors_are_replayed(self):
+        Xe.objects.filter(pk="X001").update(so_luong=0)
+        self.assertEqual(self.post("/api/order/", ORDER).status_code, status.HTTP_400_BAD_REQUEST)
+        Xe.objects.filter(pk="X001").update(so_luong=5)
+        # Cùng key trả lại lỗi cũ, muốn thử lại phải dùng key mới
+        self.assertEqual(self.post("/api/order/", ORDER).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post("/api/order/", ORDER, key="key-2").status_code, status.HTTP_201_CREATED)
+
+    def test_checkout_replay(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, xe=self.xe, quantity=2)
+        first = self.post("/api/checkout/")
+        self.assertEqual(first.status_code, status.HTTP_201_CREATED)
+        # Giỏ đã trống nhưng request lặp vẫn nhận đơn đã tạo, không phải "Giỏ hàng trống"
+        replay = self.post("/api/checkout/")
+        self.assertEqual(replay.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(replay.data["id"], first.data["id"])
+
+    def test_replay_keeps_headers(self):
+        with mock.patch.object(OrderViewSet, "get_success_headers", return_value={"Location": "/api/order/1/"}):
+            first = self.post("/api/order/", ORDER)
+        replay = self.post("/api/order/", ORDER)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        self.assertEqual((replay.status_code, replay["Location"]), (first.status_code, first["Location"]))
+        self.assertEqual(replay["Content-Type"], first["Content-Type"])
+
+    def test_guest_key_needs_session(self):
+        self.client.force_authenticate(user=None)
+        # Không có session: không phân biệt được khách, không nhận key
+        response = self.post("/api/checkout/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("X-Session-Key", response.data["detail"])
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+        # Cùng key ở 2 session khác nhau được lưu riêng, không nhận response của nhau
+        for session_key in ("guest-1", "guest-2"):
+            response = self.client.post(
+                "/api/checkout/", {}, format="json", HTTP_IDEMPOTENCY_KEY="key-1", HTTP_X_SESSION_KEY=session_key,
+            )
+            self.assertNotIn("Idempotent-Replayed", response)
+        self.assertEqual(IdempotencyKey.objects.count(), 2)
+
+    def test_payment_replay(self):
+        order = Order.objects.create(user=self.user, total_price=150000)
+        data = {"order_id": order.id, "payment_method": "bitcoin"}
+        first = self.post("/api/payment/create/", data)
+        self.assertEqual(first.status_code, status.HTTP_400_BAD_REQUEST)
+        with self.assertNumQueries(1):
+            replay = self.post("/api/payment/create/", data)
+        self.assertEqual(replay.data, first.data)
+        self.assertEqual(replay["Idempotent-Replayed"], "true")
+        # Cùng key ở endpoint khác không đụng nhau
+        self.assertEqual(self.post("/api/order/", ORDER).status_code, status.HTTP_201_CREATED)
+
+    def test_expired_keys(self):
+        self.post("/api/order/", ORDER)
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        # Key hết hạn: coi như chưa dùng
+        self.assertNotIn("Idempotent-Replayed", self.post("/api/order/", ORDER))
+        self.assertEqual(Order.objects.count(), 2)
+
+        IdempotencyKey.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        out = StringIO()
+        call_command("purge_idempotency_keys", stdout=out)
+        self.assertIn("Đã xóa 1", out.getvalue())
+        self.assertFalse(IdempotencyKey.objects.exists())
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Cần PostgreSQL để ghi đồng thời từ nhiều thread")
+class ConcurrentIdempotencyTest(TransactionTestCase):
+    """Nhiều request cùng key đến cùng lúc: chỉ 1 đơn, mọi request nhận cùng response"""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        create_xe()
+
+    def test_parallel_duplicates(self):
+        barrier = threading.Barrier(self.THREADS)
+        responses = []
+
+        def worker():
+            try:
+                client = APIClient()
+                client.force_authenticate(user=self.user)
+                barrier.wait()
+                responses.append(client.post("/api/order/", ORDER, format="json", HTTP_IDEMPOTENCY_KEY="same"))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(Order.objects.count(), 1)
+        self.assertEqual({response.status_code for response in responses}, {status.HTTP_201_CREATED})
+        self.assertEqual({response.data["id"] for response in responses}, {Order.objects.get().id})
+        self.assertEqual(Xe.objects.get(pk="X001").so_luong, 4)
@@ -0,0 +1,89 @@
+"""
+Test keyset/cursor pagination (core.pagination.HybridPagination)
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.models import Notification
+from products.models import LoaiXe, Xe
+
+
+class CursorPaginationTest(TestCase):
+    """Test ?cursor= trên /api/xe/ và /api/notifications/"""
+
+    def setUp(self):
+        self.client = APIClient()
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        for index in range(25):
+            Xe.objects.create(
+                ma_xe=f"X{index:03d}", ten_xe=f"Xe {index}", slug=f"xe-{index}",
+                # Nhiều xe trùng giá để kiểm tra tie-breaker ma_xe
+                gia=(index % 4) * 1000000, so_luong=1, mau_sac="Đỏ", loai_xe=loai,
+            )
+
+    def walk(self, url, params):
+        """Đi hết các trang theo link next, trả về list các trang"""
+        pages = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            pages.append(response.data)
+            if not response.data["next"]:
+                return pages
+            response = self.client.get(response.data["next"])
+
+    def test_page_number_is_default(self):
+        response = self.client.get("/api/xe/", {"page": 2})
+        self.assertEqual(response.data["count"], 25)
+        self.assertEqual(len(response.data["results"]), 10)
+
+    def test_cursor_walk_by_price_with_ties(self):
+        pages = self.walk("/api/xe/", {"cursor": "", "ordering": "-gia"})
+        ids = [car["ma_xe"] for page in pages for car in page["results"]]
+        expected = list(
+            Xe.objects.order_by("-gia", "-ma_xe").values_list("ma_xe", flat=True)
+        )
+        self.assertEqual(ids, expected)
+        self.assertEqual([len(page["results"]) for page in pages], [10, 10, 5])
+        self.assertIsNone(pages[0]["previous"])
+
+    def test_previous_link(self):
+        pages = self.walk("/api/xe/", {"cursor": ""})
+        response = self.client.get(pages[2]["previous"])
+        self.assertEqual(response.data["results"], pages[1]["results"])
+        response = self.client.get(response.data["previous"])
+        self.assertEqual(response.data["results"], pages[0]["results"])
+        self.assertIsNone(response.data["previous"])
+
+    def test_search_cursor_falls_back_to_ma_xe(self):
+        # Default ordering khi search (-search_rank) không keyset được: đi theo ma_xe
+        pages = self.walk("/api/xe/", {"cursor": "", "search": "xe tay ga"})
+        ids = [car["ma_xe"] for page in pages for car in page["results"]]
+        self.assertEqual(ids, sorted(Xe.objects.values_list("ma_xe", flat=True)))
+        self.assertEqual(len(pages), 3)
+
+    def test_unsupported_ordering(self):
+        response = self.client.get("/api/xe/", {"cursor": "", "ordering": "ten_xe"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_invalid_cursor(self):
+        response = self.client.get("/api/xe/", {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_notifications_same_created_at(self):
+        user = User.objects.create_user(username="user1", password="pass12345")
+        Notification.objects.bulk_create([
+            Notification(user=user, type="system", title=f"N{index}", message="...")
+            for index in range(23)
+        ])
+        Notification.objects.update(created_at=timezone.now())
+        self.client.force_authenticate(user=user)
+
+        pages = self.walk("/api/notifications/", {"cursor": ""})
+        titles = [item["title"] for page in pages for item in page["results"]]
+        self.assertEqual(len(titles), 23)
+        self.assertEqual(len(set(titles)), 23)
@@ -0,0 +1,217 @@
+"""
+Test kiểm tra số chiếc còn trống theo lịch (orders.availability.check_capacity)
+"""
+from datetime import date, datetime, time
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.availability import check_capacity, peak_booked
+from orders.models import Order, OrderItem
+from orders.utils import check_schedule_conflict
+from products.models import LoaiXe, Xe
+
+
+class PeakBookedTest(TestCase):
+    """Sweep-line trên các khoảng nửa mở"""
+
+    def test_peak(self):
+        day = lambda hour: datetime(2025, 1, 1, hour)  # noqa: E731
+        intervals = [(day(8), day(12), 1), (day(10), day(14), 2), (day(12), day(16), 1), (day(20), day(22), 5)]
+        self.assertEqual(peak_booked(intervals, day(0), day(23)), 5)
+        # Đơn kết thúc lúc 12h không chồng với đơn bắt đầu lúc 12h
+        self.assertEqual(peak_booked(intervals, day(0), day(18)), 3)
+        self.assertEqual(peak_booked(intervals, day(14), day(18)), 1)
+        self.assertEqual(peak_booked(intervals, day(16), day(20)), 0)
+
+
+class CapacityTest(TestCase):
+    """Xe nhiều chiếc vẫn nhận đơn trùng lịch khi còn chiếc trống"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.client.force_authenticate(user=self.user)
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.xe = Xe.objects.create(
+            ma_xe="X001", ten_xe="Vision", slug="vision", gia=30000000, gia_thue=150000,
+            so_luong=3, mau_sac="Đỏ", loai_xe=loai,
+        )
+
+    def book(self, start, end, quantity=1, **fields):
+        order = Order.objects.create(user=self.user, start_date=start, end_date=end, **fields)
+        OrderItem.objects.create(order=order, xe=self.xe, quantity=quantity)
+        return order
+
+    def test_check_capacity(self):
+        self.book(date(2025, 1, 1), date(2025, 1, 5), quantity=2)
+        self.book(date(2025, 1, 4), date(2025, 1, 8))
+        self.book(date(2025, 1, 6), date(2025, 1, 9))
+        self.book(date(2025, 1, 4), date(2025, 1, 8), quantity=3, status="cancelled")
+
+        window = (datetime(2025, 1, 1), datetime.combine(date(2025, 1, 10), time.max))
+        result = check_capacity(self.xe.pk, *window)
+        self.assertEqual((result.capacity, result.peak_booked, result.available), (3, 3, 0))
+        self.assertEqual(len(result.order_ids), 3)
+
+        window = (datetime(2025, 1, 6), datetime.combine(date(2025, 1, 10), time.max))
+        self.assertEqual(check_capacity(self.xe.pk, *window).available, 1)
+
+    def test_schedule_conflict_uses_capacity(self):
+        first = self.book(date(2025, 1, 1), date(2025, 1, 5), quantity=2)
+
+        has_conflict, conflicts = check_schedule_conflict(self.xe.pk, date(2025, 1, 3), date(2025, 1, 4))
+        self.assertFalse(has_conflict)
+        self.assertEqual(conflicts, [])
+        has_conflict, conflicts = check_schedule_conflict(
+            self.xe.pk, date(2025, 1, 3), date(2025, 1, 4), quantity=2
+        )
+        self.assertTrue(has_conflict)
+        self.assertEqual(conflicts, [first])
+        has_conflict, _ = check_schedule_conflict(
+            self.xe.pk, date(2025, 1, 3), date(2025, 1, 4), quantity=3, exclude_order_id=first.id
+        )
+        self.assertFalse(has_conflict)
+
+    def test_conflict_api_reports_units(self):
+        self.book(date(2025, 1, 1), date(2025, 1, 5), quantity=2)
+        payload = {"xe_id": "X001", "start_date": "2025-01-03", "end_date": "2025-01-07"}
+
+        response = self.client.post("/api/check-schedule-conflict/", payload)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(response.data["has_conflict"])
+        self.assertEqual(response.data["capacity"], 3)
+        self.assertEqual(response.data["peak_booked"], 2)
+        self.assertEqual(response.data["available_units"], 1)
+
+        response = self.client.post("/api/check-schedule-conflict/", {**payload, "quantity": 2})
+        self.assertTrue(response.data["has_conflict"])
+        self.assertEqual(len(response.data["conflicting_orders"]), 1)
+
+        response = self.client.post("/api/check-schedule-conflict/", {**payload, "quantity": "abc"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_orders_do_not_shrink_capacity(self):
+        # Tạo đơn trừ tồn kho (so_luong) nhưng sức chứa theo lịch (so_chiec) giữ nguyên
+        payload = {"items": [{"xe_id": "X001", "quantity": 1}], "start_date": "2030-01-01", "end_date": "2030-01-05"}
+        self.assertEqual(self.client.post("/api/order/", payload, format="json").status_code, status.HTTP_201_CREATED)
+        self.xe.refresh_from_db()
+        self.assertEqual((self.xe.so_luong, self.xe.so_chiec), (2, 3))
+
+        response = self.client.post("/api/check-schedule-conflict/", {
+            "xe_id": "X001", "start_date": "2030-01-01", "end_date": "2030-01-05", "quantity": 2,
+        })
+        self.assertEqual(
+            (response.data["capacity"], response.data["peak_booked"], response.data["available_units"]), (3, 1, 2),
+        )
+        self.assertFalse(response.data["has_conflict"])
+        has_conflict, _ = check_schedule_conflict(self.xe.pk, date(2030, 1, 1), date(2030, 1, 5), quantity=2)
+        self.assertFalse(has_conflict)
+
+    def test_order_create_checks_window(self):
+        self.book(date(2025, 1, 1), date(2025, 1, 5), quantity=2)
+        payload = {
+            "items": [{"xe_id": "X001", "quantity": 1}, {"xe_id": "X001", "quantity": 1}],
+            "start_date": "2025-01-04",
+            "end_date": "2025-01-06",
+        }
+        # 2 dòng cùng xe được cộng dồn: chỉ còn 1 chiếc trống
+        response = self.client.post("/api/order/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["available_units"], 1)
+
+        payload["items"] = payload["items"][:1]
+        response = self.client.post("/api/order/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        payload["start_date"] = "abc"
+        response = self.client.post("/api/order/", payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class BatchConflictAPITest(TestCase):
+    """/api/check-schedule-conflict/batch/: nhiều xe/khoảng trong 1 request"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.cars = [
+            Xe.objects.create(
+                ma_xe=f"X{index:03d}", ten_xe=f"Xe {index}", slug=f"xe-{index}", gia=30000000, gia_thue=150000,
+                so_luong=2, mau_sac="Đỏ", loai_xe=loai,
+            )
+            for index in range(1, 11)
+        ]
+        for xe in self.cars:
+            for start, end, quantity in ((1, 3, 1), (2, 5, 1), (10, 12, 2)):
+                order = Order.objects.create(user=self.user, start_date=date(2025, 1, start), end_date=date(2025, 1, end))
+                OrderItem.objects.create(order=order, xe=xe, quantity=quantity)
+
+    def post(self, checks):
+        return self.client.post("/api/check-schedule-conflict/batch/", {"checks": checks}, format="json")
+
+    def check(self, xe, start, end, **extra):
+        return {"xe_id": xe.ma_xe, "start_date": f"2025-01-{start:02d}", "end_date": f"2025-01-{end:02d}", **extra}
+
+    def test_matches_single_check(self):
+        xe = self.cars[0]
+        checks = [
+            self.check(xe, 2, 3),
+            self.check(xe, 4, 6),
+            self.check(xe, 4, 6, quantity=2),
+            self.check(xe, 7, 9),
+            self.check(xe, 11, 11),
+            self.check(xe, 12, 12, start_time="00:00:00", end_time="06:00:00"),
+        ]
+        response = self.post(checks)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for check, result in zip(checks, response.data["results"]):
+            single = self.client.post("/api/check-schedule-conflict/", check, format="json").data
+            self.assertEqual(result["has_conflict"], single["has_conflict"], check)
+            self.assertEqual(result["peak_booked"], single["peak_booked"], check)
+            self.assertEqual(
+                result["conflicting_order_ids"], [order["id"] for order in single["conflicting_orders"]], check
+            )
+        self.assertEqual(
+            [result["has_conflict"] for result in response.data["results"]], [True, False, True, False, True, True]
+        )
+
+    def test_partial_bookings_use_unit_capacity(self):
+        # Tồn kho đã bị trừ về 0, sức chứa theo lịch vẫn là 3 chiếc
+        xe = self.cars[0]
+        Xe.objects.filter(pk=xe.pk).update(so_chiec=3, so_luong=0)
+        checks = [self.check(xe, 2, 3), self.check(xe, 2, 3, quantity=2), self.check(xe, 10, 12, quantity=2)]
+        results = self.post(checks).data["results"]
+        self.assertEqual(
+            [(r["capacity"], r["peak_booked"], r["available_units"], r["has_conflict"]) for r in results],
+            [(3, 2, 1, False), (3, 2, 1, True), (3, 2, 1, True)],
+        )
+        for check, result in zip(checks, results):
+            single = self.client.post("/api/check-schedule-conflict/", check, format="json").data
+            self.assertEqual(
+                (result["capacity"], result["available_units"]), (single["capacity"], single["available_units"])
+            )
+
+    def test_query_count_is_flat(self):
+        small = [self.check(self.cars[0], 1, 5)]
+        large = [self.check(xe, start, start + 2) for xe in self.cars for start in (1, 4, 8, 11)]
+        for checks in (small, large):
+            with self.assertNumQueries(2):
+                response = self.post(checks)
+            self.assertEqual(len(response.data["results"]), len(checks))
+
+    def test_errors(self):
+        response = self.post([self.check(self.cars[0], 1, 2), {"xe_id": "X999", "start_date": "2025-01-01", "end_date": "2025-01-02"}])
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("detail", response.data["results"][1])
+        self.assertNotIn("has_conflict", response.data["results"][1])
+
+        response = self.post([self.check(self.cars[0], 1, 2), {"xe_id": "X001", "start_date": "01/01/2025", "end_date": "2025-01-02"}])
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertTrue(response.data["detail"].startswith("checks[1]"))
+
+        self.assertEqual(self.post([]).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.post([self.check(self.cars[0], 1, 2)] * 201).status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,150 @@
+"""
+Test circuit breaker provider bản đồ và ước tính Haversine (orders.providers, orders.geo)
+
+Provider thật được thay bằng 1 HTTP server chạy local (OSRM_URL/NOMINATIM_URL trong settings).
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders import providers
+from orders.geo import estimate_route, haversine_km
+from orders.geocoding import geocode_cache
+
+HANOI = (21.0285, 105.8542)
+SAIGON = (10.8231, 106.6297)
+ROUTE = {"code": "Ok", "routes": [{"distance": 12345, "duration": 900, "geometry": {"type": "LineString"}}]}
+PLACES = [{"lat": "21.0285", "lon": "105.8542", "display_name": "Hà Nội, Việt Nam"}]
+
+
+class StubProvider(BaseHTTPRequestHandler):
+    """Trả ROUTE cho /route/..., PLACES cho /search; status/delay chỉnh được theo test"""
+
+    status = 200
+    delay = 0
+    hits = []
+
+    def do_GET(self):
+        StubProvider.hits.append(self.path)
+        time.sleep(StubProvider.delay)
+        body = json.dumps(PLACES if self.path.startswith("/search") else ROUTE).encode()
+        self.send_response(StubProvider.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class CircuitBreakerTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), StubProvider)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = f"http://127.0.0.1:{cls.server.server_address[1]}"
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        super().tearDownClass()
+
+    def setUp(self):
+        StubProvider.status, StubProvider.delay, StubProvider.hits = 200, 0, []
+        providers.reset_breakers()
+        self.addCleanup(providers.reset_breakers)
+        geocode_cache.clear()
+        self.addCleanup(geocode_cache.clear)
+        # Route đã tính được cache (orders.routing): test cần gọi tới server giả
+        cache.clear()
+        settings = override_settings(
+            OSRM_URL=self.url, NOMINATIM_URL=f"{self.url}/search",
+            MAPS_BREAKER_MIN_CALLS=3, MAPS_BREAKER_SLOW_CALL=1, MAPS_BREAKER_COOLDOWN=60,
+        )
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.client = APIClient()
+
+    def distance(self):
+        data = {"lat1": HANOI[0], "lng1": HANOI[1], "lat2": SAIGON[0], "lng2": SAIGON[1]}
+        response = self.client.post("/api/maps/distance/", data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_route_and_geocode_through_stub(self):
+        self.assertEqual(self.distance()["distance"], 12.35)
+        response = self.client.post("/api/maps/geocode/", {"address": "Hà Nội"}, format="json")
+        self.assertEqual(response.data["formatted"], "Hà Nội, Việt Nam")
+        self.assertEqual(providers.get_breaker("osrm").snapshot()["state"], "closed")
+
+    def test_opens_after_errors(self):
+        StubProvider.status = 500
+        estimate = estimate_route(*HANOI, *SAIGON)[0]
+        for _ in range(3):
+            self.assertEqual(self.distance()["distance"], estimate)
+        self.assertEqual(len(StubProvider.hits), 3)
+        self.assertEqual(providers.get_breaker("osrm").snapshot()["state"], "open")
+
+        # Mạch mở: ước tính ngay, không gọi provider
+        data = self.distance()
+        self.assertEqual((data["distance"], data["geometry"]), (estimate, None))
+        self.assertEqual(len(StubProvider.hits), 3)
+        # Provider khác không bị ảnh hưởng
+        StubProvider.status = 200
+        response = self.client.post("/api/maps/geocode/", {"address": "Hà Nội"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_half_open_probe(self):
+        StubProvider.status = 500
+        for _ in range(3):
+            self.distance()
+        breaker = providers.get_breaker("osrm")
+        with override_settings(MAPS_BREAKER_COOLDOWN=0.05):
+            time.sleep(0.1)
+            # Lần thử vẫn lỗi: mở lại
+            self.distance()
+            self.assertEqual(breaker.snapshot()["state"], "open")
+            self.assertEqual(len(StubProvider.hits), 4)
+
+            time.sleep(0.1)
+            StubProvider.status = 200
+            self.assertEqual(self.distance()["distance"], 12.35)
+            self.assertEqual(breaker.snapshot()["state"], "closed")
+
+    def test_slow_calls_open_circuit(self):
+        StubProvider.delay = 0.2
+        with override_settings(MAPS_BREAKER_SLOW_CALL=0.1):
+            for _ in range(3):
+                cache.clear()  # route thành công được cache, mỗi lần phải gọi lại OSRM
+                self.assertEqual(self.distance()["distance"], 12.35)
+            cache.clear()
+            started = time.monotonic()
+            self.assertIsNone(self.distance()["geometry"])
+            self.assertLess(time.monotonic() - started, 0.1)
+        snapshot = providers.get_breaker("osrm").snapshot()
+        self.assertEqual((snapshot["state"], snapshot["error_rate"]), ("open", 1.0))
+        self.assertGreaterEqual(snapshot["p95_latency"], 0.2)
+
+
+class HaversineTest(SimpleTestCase):
+    def test_scalar_and_vectorized(self):
+        distance = haversine_km(*HANOI, *SAIGON)
+        self.assertIsInstance(distance, float)
+        self.assertAlmostEqual(distance, 1137, delta=5)
+        self.assertEqual(haversine_km(*HANOI, *HANOI), 0)
+
+        # 1 điểm tới nhiều điểm trong 1 lần gọi
+        lats, lngs = np.array([HANOI[0], SAIGON[0]]), np.array([HANOI[1], SAIGON[1]])
+        distances = haversine_km(HANOI[0], HANOI[1], lats, lngs)
+        np.testing.assert_allclose(distances, [0, distance])
+        self.assertEqual(estimate_route(*HANOI, *SAIGON), (round(distance, 2), int(round(distance, 2) / 60 * 3600)))
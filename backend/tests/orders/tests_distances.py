@@ -0,0 +1,119 @@
+"""
+Test ma trận khoảng cách giữa các Location (orders.distances)
+"""
+from datetime import date
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+import numpy as np
+from django.core.management import call_command
+from django.test import TestCase
+
+from orders.distances import location_distances
+from orders.geocoding import GeocodeResult, geocode_cache, normalize_address
+from orders.models import LocationDistanceRow
+from orders.utils import calculate_rental_price
+from products.models import LoaiXe, Location, Xe
+
+# Địa chỉ -> vĩ độ: khoảng cách giả = 100 km mỗi độ vĩ
+LATITUDES = {"số 1 tràng tiền": 21.00, "số 9 cầu giấy": 21.05, "số 5 long biên": 21.10, "số 7 hà đông": 20.98}
+
+
+def fake_lookup(address, deadline=None):
+    lat = LATITUDES.get(normalize_address(address))
+    return None if lat is None else GeocodeResult(lat, 105.8, address)
+
+
+def fake_table(points, sources=None, destinations=None):
+    lats = np.array([lat for lat, lng in points])
+    rows = lats if sources is None else lats[sources]
+    columns = lats if destinations is None else lats[destinations]
+    return (np.abs(rows[:, None] - columns[None, :]) * 100).astype(np.float32)
+
+
+class DistanceMatrixTest(TestCase):
+    """Tính hàng/cột theo Location thay đổi, tra khoảng cách không gọi mạng"""
+
+    def setUp(self):
+        for cache in (geocode_cache, location_distances):
+            cache.clear()
+            self.addCleanup(cache.clear)
+        for target, side_effect in (
+            ("orders.geocoding.lookup_nominatim", fake_lookup),
+            ("orders.distances.osrm_table", fake_table),
+        ):
+            patcher = mock.patch(target, side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        from orders import distances
+        self.table = distances.osrm_table
+        self.a = Location.objects.create(ten_dia_diem="Chi nhánh A", dia_chi_chi_tiet="Số 1 Tràng Tiền")
+        self.b = Location.objects.create(ten_dia_diem="Chi nhánh B", dia_chi_chi_tiet="Số 9 Cầu Giấy")
+        self.c = Location.objects.create(ten_dia_diem="Chi nhánh C", dia_chi_chi_tiet="Số 5 Long Biên")
+
+    def update(self, *args):
+        out = StringIO()
+        call_command("update_distance_matrix", *args, stdout=out)
+        return out.getvalue()
+
+    def test_build_and_lookup(self):
+        self.assertIn("Đã tính lại 3", self.update())
+        self.assertEqual(self.table.call_count, 1)
+        self.assertAlmostEqual(location_distances.distance("Chi nhánh A", "chi nhánh c"), 10, places=3)
+        # Tra bằng địa chỉ chi tiết, nạp ma trận rồi thì không query
+        with self.assertNumQueries(0):
+            self.assertAlmostEqual(location_distances.distance("số 9  cầu giấy", "Chi nhánh A"), 5, places=3)
+        self.assertEqual(location_distances.distance("Chi nhánh A", "Hồ Gươm"), None)
+
+        # Không có gì thay đổi: không gọi OSRM
+        self.assertIn("Đã tính lại 0", self.update())
+        self.assertEqual(self.table.call_count, 1)
+
+    def test_only_changed_row_and_column(self):
+        self.update()
+        d = Location.objects.create(ten_dia_diem="Chi nhánh D", dia_chi_chi_tiet="Số 7 Hà Đông")
+        self.update()
+        self.assertEqual(self.table.call_count, 3)
+        position = [self.a.pk, self.b.pk, self.c.pk, d.pk].index(d.pk)
+        self.assertEqual(self.table.call_args_list[1].kwargs, {"sources": [position]})
+        self.assertEqual(self.table.call_args_list[2].kwargs, {"destinations": [position]})
+        self.assertAlmostEqual(location_distances.distance("Chi nhánh D", "Chi nhánh C"), 12, places=3)
+        self.assertAlmostEqual(location_distances.distance("Chi nhánh B", "Chi nhánh D"), 7, places=3)
+
+        # Dời chi nhánh A: chỉ tính lại hàng/cột của A
+        self.a.dia_chi_chi_tiet = "Số 5 Long Biên"
+        self.a.save()
+        self.assertIn(f"[{self.a.pk}]", self.update())
+        self.assertEqual(LocationDistanceRow.objects.get(location=self.a).distances[str(self.c.pk)], 0)
+        self.assertAlmostEqual(location_distances.distance("Chi nhánh B", "Chi nhánh A"), 5, places=3)
+
+        # Location ngừng hoạt động không còn trong ma trận
+        Location.objects.filter(pk=d.pk).update(trang_thai=False)
+        d.refresh_from_db()
+        d.save()
+        self.assertIsNone(location_distances.distance("Chi nhánh D", "Chi nhánh C"))
+
+        # Bật lại sau khi có Location mới: chỉ tính thêm cột/hàng của D
+        e = Location.objects.create(ten_dia_diem="Chi nhánh E", dia_chi_chi_tiet="Số 9 Cầu Giấy")
+        self.assertIn(f"[{e.pk}]", self.update())
+        d.trang_thai = True
+        d.save()
+        self.assertIn(f"[{d.pk}]", self.update())
+        self.assertAlmostEqual(location_distances.distance("Chi nhánh E", "Chi nhánh D"), 7, places=3)
+
+    def test_rental_price_uses_matrix(self):
+        self.update()
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        xe = Xe.objects.create(
+            ma_xe="X001", ten_xe="Vision", slug="vision", gia=30000000, gia_thue=150000,
+            so_luong=5, mau_sac="Đỏ", loai_xe=loai,
+        )
+        with mock.patch("orders.providers.get") as get:
+            price = calculate_rental_price(
+                xe, date(2026, 3, 1), date(2026, 3, 2),
+                pickup_location="Chi nhánh A", return_location="Chi nhánh B",
+            )
+        get.assert_not_called()
+        # 5 km x 30.000 VNĐ/km
+        self.assertEqual(price["pickup_fee"], Decimal("150000"))
@@ -0,0 +1,92 @@
+"""
+Test cache geocode dùng chung (orders.geocoding)
+"""
+from datetime import timedelta
+from unittest import mock
+
+import requests
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.geocoding import GeocodeResult, GeocodingError, geocode, geocode_cache, normalize_address
+from orders.models import GeocodedAddress
+
+HANOI = GeocodeResult(21.0285, 105.8542, "Hà Nội, Việt Nam")
+SAIGON = GeocodeResult(10.8231, 106.6297, "Thành phố Hồ Chí Minh, Việt Nam")
+
+
+def fake_lookup(address, deadline=None):
+    return {"hà nội": HANOI, "hồ chí minh": SAIGON}.get(normalize_address(address))
+
+
+class GeocodeCacheTest(TestCase):
+    """Địa chỉ lặp lại không gọi provider: LRU trong bộ nhớ, rồi bảng GeocodedAddress"""
+
+    def setUp(self):
+        geocode_cache.clear()
+        self.addCleanup(geocode_cache.clear)
+        patcher = mock.patch("orders.geocoding.lookup_nominatim", side_effect=fake_lookup)
+        self.lookup = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_normalize(self):
+        self.assertEqual(normalize_address("  Hà   Nội ,Việt Nam. "), "hà nội, việt nam")
+        # NFC: chữ có dấu gõ kiểu tổ hợp vẫn cùng khóa
+        self.assertEqual(normalize_address("Hà Nội"), normalize_address("Hà Nội"))
+
+    def test_layers(self):
+        self.assertEqual(geocode("Hà Nội"), HANOI)
+        with self.assertNumQueries(0):
+            self.assertEqual(geocode(" hà  NỘI "), HANOI)
+        self.assertEqual(self.lookup.call_count, 1)
+
+        # Process khác (LRU trống) đọc từ database
+        geocode_cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(geocode("Hà Nội"), HANOI)
+        self.assertEqual(self.lookup.call_count, 1)
+
+        # Hết hạn thì hỏi lại provider
+        geocode_cache.clear()
+        GeocodedAddress.objects.update(expires_at=timezone.now() - timedelta(seconds=1))
+        geocode("Hà Nội")
+        self.assertEqual(self.lookup.call_count, 2)
+        self.assertEqual(GeocodedAddress.objects.count(), 1)
+
+    def test_not_found_and_errors(self):
+        self.assertIsNone(geocode("Không có thật"))
+        self.assertIsNone(geocode("không có thật"))
+        self.assertEqual(self.lookup.call_count, 1)
+        self.assertIsNone(GeocodedAddress.objects.get().lat)
+
+        self.lookup.side_effect = GeocodingError("timeout")
+        with self.assertRaises(GeocodingError):
+            geocode("Đà Nẵng")
+        self.assertEqual(GeocodedAddress.objects.count(), 1)
+
+    @override_settings(GEOCODE_CACHE_SIZE=2)
+    def test_lru_is_bounded(self):
+        for address in ("Hà Nội", "Hồ Chí Minh", "Huế"):
+            geocode(address)
+        self.assertEqual(len(geocode_cache.entries), 2)
+
+    def test_map_endpoints_share_cache(self):
+        cache.clear()  # không lấy route đã cache từ test khác
+        client = APIClient()
+        response = client.post("/api/maps/geocode/", {"address": "Hà Nội"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data["lat"], response.data["lng"]), (HANOI.lat, HANOI.lng))
+
+        with mock.patch("orders.providers.get", side_effect=requests.exceptions.ConnectionError):
+            response = client.post(
+                "/api/maps/distance-from-addresses/",
+                {"address1": "hà nội", "address2": "Hồ Chí Minh"}, format="json",
+            )
+        self.assertEqual(self.lookup.call_count, 2)
+        self.assertEqual(response.data["coords2"], {"lat": SAIGON.lat, "lng": SAIGON.lng})
+
+        response = client.post("/api/maps/geocode/", {"address": "Không có thật"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
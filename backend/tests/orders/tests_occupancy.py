@@ -0,0 +1,105 @@
+"""
+Test lịch chiếm dụng theo ngày (orders.occupancy) và /api/xe/calendar/
+"""
+from datetime import date
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderItem
+from orders.occupancy import occupancy_calendar
+from products.models import LoaiXe, Xe
+
+
+class OccupancyCalendarTest(TestCase):
+    """Build tháng từ đơn đặt, cập nhật tăng dần khi đơn thay đổi"""
+
+    def setUp(self):
+        occupancy_calendar.clear()
+        self.addCleanup(occupancy_calendar.clear)
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.admin = User.objects.create_superuser(username="admin", password="pass12345")
+        self.client.force_authenticate(user=self.admin)
+        self.loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.cars = [
+            Xe.objects.create(
+                ma_xe=f"X00{index}", ten_xe=f"Xe {index}", slug=f"xe-{index}", gia=30000000, gia_thue=150000,
+                so_luong=2, mau_sac="Đỏ", loai_xe=self.loai,
+            )
+            for index in (1, 2, 3)
+        ]
+
+    def book(self, xe, start, end, quantity=1, **fields):
+        order = Order.objects.create(user=self.user, start_date=start, end_date=end, **fields)
+        OrderItem.objects.create(order=order, xe=xe, quantity=quantity)
+        return order
+
+    def calendar(self, month="2025-01", **params):
+        response = self.client.get("/api/xe/calendar/", {"month": month, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {car["ma_xe"]: car for car in response.data["cars"]}
+
+    def test_month_view(self):
+        self.book(self.cars[0], date(2024, 12, 30), date(2025, 1, 2))
+        self.book(self.cars[0], date(2025, 1, 2), date(2025, 1, 3))
+        self.book(self.cars[1], date(2025, 1, 31), date(2025, 2, 3), quantity=2)
+        self.book(self.cars[1], date(2025, 1, 10), date(2025, 1, 12), status="cancelled")
+
+        cars = self.calendar()
+        self.assertEqual(cars["X001"]["occupancy"][:4], [1, 2, 1, 0])
+        self.assertEqual(cars["X001"]["fully_booked_days"], 1)
+        self.assertEqual(cars["X002"]["occupancy"][9:12], [0, 0, 0])
+        self.assertEqual(cars["X002"]["occupancy"][30], 2)
+        self.assertEqual(sum(cars["X003"]["occupancy"]), 0)
+        self.assertEqual(len(cars["X003"]["occupancy"]), 31)
+        self.assertEqual(self.calendar("2025-02")["X002"]["occupancy"][:4], [2, 2, 2, 0])
+
+    def test_fully_booked_against_unit_capacity(self):
+        # 3 chiếc, tồn kho đã bị trừ còn 1: ngày có 2 chiếc bị đặt vẫn còn chỗ
+        Xe.objects.filter(pk="X001").update(so_chiec=3, so_luong=1)
+        self.book(self.cars[0], date(2025, 1, 1), date(2025, 1, 2), quantity=2)
+        self.book(self.cars[0], date(2025, 1, 2), date(2025, 1, 2))
+        car = self.calendar()["X001"]
+        self.assertEqual((car["so_luong"], car["capacity"]), (1, 3))
+        self.assertEqual(car["occupancy"][:3], [2, 3, 0])
+        self.assertEqual(car["fully_booked_days"], 1)
+
+    def test_incremental_updates(self):
+        order = self.book(self.cars[0], date(2025, 1, 5), date(2025, 1, 6))
+        self.calendar()
+
+        # Tháng đã build: request sau chỉ query danh sách xe
+        with self.assertNumQueries(1):
+            self.calendar()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other = self.book(self.cars[2], date(2025, 1, 6), date(2025, 1, 7))
+        self.assertEqual(self.calendar()["X003"]["occupancy"][5:7], [1, 1])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            order.status = "cancelled"
+            order.save()
+            other.items.update(quantity=2)
+            OrderItem.objects.get(order=other).save()
+        cars = self.calendar()
+        self.assertEqual(sum(cars["X001"]["occupancy"]), 0)
+        self.assertEqual(cars["X003"]["occupancy"][5:7], [2, 2])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            other.delete()
+        self.assertEqual(sum(self.calendar()["X003"]["occupancy"]), 0)
+
+    def test_filters_and_validation(self):
+        other = LoaiXe.objects.create(ma_loai="LX02", ten_loai="Xe số")
+        Xe.objects.filter(pk="X003").update(loai_xe=other)
+        self.assertEqual(list(self.calendar(loai="LX02")), ["X003"])
+
+        response = self.client.get("/api/xe/calendar/", {"month": "2025-13"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/xe/calendar/", {"month": "2025-01"})
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,92 @@
+"""
+Test danh sách đơn gọn cho admin (/api/order/summary/)
+"""
+from datetime import timedelta
+
+from django.contrib.auth.models import User
+from django.test import TestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.models import Order, OrderItem
+from products.models import LoaiXe, Xe
+
+
+class OrderSummaryTest(TestCase):
+    """values() + keyset theo -created_at, số query không đổi theo số đơn/xe"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.admin = User.objects.create_superuser(username="admin", password="pass12345")
+        self.client.force_authenticate(user=self.admin)
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.cars = [
+            Xe.objects.create(
+                ma_xe=f"X00{index}", ten_xe=f"Xe {index}", slug=f"xe-{index}", gia=30000000, gia_thue=150000,
+                so_luong=5, mau_sac="Đỏ", loai_xe=loai,
+            )
+            for index in (1, 2, 3)
+        ]
+        now = timezone.now()
+        self.orders = []
+        for index in range(25):
+            order = Order.objects.create(
+                user=self.user, total_price=100000 * (index + 1),
+                status="paid" if index % 5 == 0 else "pending",
+                payment_status="paid" if index % 5 == 0 else "unpaid",
+            )
+            # Nhiều đơn cùng created_at để kiểm tra keyset dùng id làm tie-breaker
+            Order.objects.filter(pk=order.pk).update(created_at=now - timedelta(days=index // 2))
+            for xe in self.cars[:index % 3 + 1]:
+                OrderItem.objects.create(order=order, xe=xe, quantity=2, price_at_purchase=150000)
+            self.orders.append(order)
+
+    def get(self, url="/api/order/summary/", **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_pages_cover_all_orders(self):
+        seen = []
+        data = self.get()
+        while True:
+            seen.extend(row["id"] for row in data["results"])
+            if not data["next"]:
+                break
+            data = self.get(data["next"])
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(set(seen), {order.pk for order in self.orders})
+        expected = list(Order.objects.order_by("-created_at", "-id").values_list("pk", flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_row_shape_and_query_count(self):
+        with self.assertNumQueries(2):
+            data = self.get()
+        row = next(row for row in data["results"] if row["id"] == self.orders[2].pk)
+        self.assertEqual(row["username"], "renter")
+        self.assertEqual(row["cars"], ["Xe 1", "Xe 2", "Xe 3"])
+        self.assertEqual(row["item_count"], 6)
+        self.assertEqual(row["total_price"], "300000.00")
+        self.assertNotIn("count", data)
+
+    def test_filters(self):
+        data = self.get(status="paid")
+        self.assertEqual({row["status"] for row in data["results"]}, {"paid"})
+        self.assertEqual(len(data["results"]), 5)
+
+        data = self.get(payment_status="unpaid,failed")
+        self.assertEqual({row["payment_status"] for row in data["results"]}, {"unpaid"})
+
+        today = timezone.localdate()
+        data = self.get(created_from=str(today - timedelta(days=1)), created_to=str(today))
+        self.assertEqual(len(data["results"]), 4)
+
+        response = self.client.get("/api/order/summary/", {"created_from": "hôm qua"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_admin_only(self):
+        self.client.force_authenticate(user=self.user)
+        response = self.client.get("/api/order/summary/")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,144 @@
+"""
+Test báo giá có chữ ký: calculate_price_api -> tạo đơn bằng quote_token (orders.quotes)
+"""
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
+
+import requests
+from django.contrib.auth.models import User
+from django.core import signing
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders import providers
+from orders.bookings import order_period
+from orders.geocoding import geocode_cache
+from orders.models import Coupon, Order, UnitBooking
+from products.models import LoaiXe, Xe
+
+QUOTE = {
+    "xe_id": "X001",
+    "start_date": "2026-03-01",
+    "end_date": "2026-03-04",
+    "pickup_location": "Hà Nội",
+    "return_location": "Hải Phòng",
+}
+
+
+class PriceQuoteTest(TestCase):
+    def setUp(self):
+        providers.reset_breakers()
+        geocode_cache.clear()
+        self.addCleanup(geocode_cache.clear)
+        # Provider bản đồ lỗi: phí đón/trả xe tính theo mức cố định
+        patcher = mock.patch("orders.providers.get", side_effect=requests.exceptions.ConnectionError)
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.user = User.objects.create_user(username="khach", password="pass123")
+        loai = LoaiXe.objects.create(ma_loai="SUV", ten_loai="SUV")
+        Xe.objects.create(
+            ma_xe="X001", ten_xe="Fortuner", slug="fortuner", gia=1000000000, gia_thue=500000,
+            so_luong=5, mau_sac="Trắng", loai_xe=loai,
+        )
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def quote(self, **extra):
+        response = self.client.post("/api/calculate-price/", {**QUOTE, **extra}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def order(self, token, items=None, **extra):
+        body = {"items": items or [{"xe_id": "X001", "quantity": 1}], "quote_token": token, **extra}
+        return self.client.post("/api/order/", body, format="json")
+
+    def test_order_reuses_quote(self):
+        quote = self.quote()
+        self.assertGreater(quote["pickup_fee"], 0)
+        calls = self.get.call_count
+
+        response = self.order(quote["quote_token"], start_date=QUOTE["start_date"], delivery_fee=0, total_price=1)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        # Không tính lại giá (không geocode), phí client gửi bị bỏ qua
+        self.assertEqual(self.get.call_count, calls)
+        order = Order.objects.get(pk=response.data["id"])
+        for field in ("base_price", "delivery_fee", "pickup_fee", "additional_fee", "discount_amount", "total_price"):
+            self.assertEqual(order.__dict__[field], Decimal(str(quote[field])), field)
+        self.assertEqual(order.rental_days, quote["rental_days"])
+        self.assertEqual((str(order.start_date), str(order.end_date)), (QUOTE["start_date"], QUOTE["end_date"]))
+        self.assertEqual(order.pickup_location, QUOTE["pickup_location"])
+
+    def test_quote_coupon_used_once_per_order(self):
+        coupon = Coupon.objects.create(
+            code="GIAM10", discount_type="percentage", discount_value=Decimal("10"),
+            valid_from=timezone.now() - timedelta(days=1), valid_to=timezone.now() + timedelta(days=1),
+            usage_limit=1,
+        )
+        token = self.quote(coupon_code="giam10")["quote_token"]
+        response = self.order(token)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(pk=response.data["id"])
+        self.assertEqual((order.coupon_id, order.coupon_code), (coupon.pk, "GIAM10"))
+        self.assertGreater(order.discount_amount, 0)
+        coupon.refresh_from_db()
+        self.assertEqual(coupon.used_count, 1)
+
+        # Hết lượt dùng: báo giá cũ không tạo thêm đơn được
+        response = self.order(token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 1)
+
+    def test_rejects_invalid_or_expired_token(self):
+        token = self.quote()["quote_token"]
+        payload = signing.loads(token, salt="orders.quote")
+        payload["total_price"] = "1"
+        forged = signing.dumps(payload, salt="orders.quote", key="khong-phai-secret-key", compress=True)
+        for bad in (token[:-2] + "xx", forged):
+            self.assertEqual(self.order(bad).status_code, status.HTTP_400_BAD_REQUEST)
+        with override_settings(PRICE_QUOTE_TTL=-1):
+            response = self.order(token)
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("hết hạn", response.data["detail"])
+        self.assertFalse(Order.objects.exists())
+
+    def test_rejects_order_not_matching_quote(self):
+        token = self.quote()["quote_token"]
+        for items, extra in (
+            ([{"xe_id": "X001", "quantity": 2}], {}),
+            ([{"xe_id": "X001", "quantity": 1}, {"xe_id": "X001", "quantity": 1}], {}),
+            (None, {"end_date": "2026-03-10"}),
+        ):
+            self.assertEqual(self.order(token, items, **extra).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(Order.objects.exists())
+
+    def test_hourly_quotes_book_quoted_hours(self):
+        Xe.objects.filter(pk="X001").update(so_chiec=1)
+        day = {"start_date": "2026-03-01", "end_date": "2026-03-01"}
+        morning = self.quote(**day, start_time="08:00:00", end_time="12:00:00")["quote_token"]
+        afternoon = self.quote(**day, start_time="12:00:00", end_time="18:00:00")["quote_token"]
+
+        # Giờ gửi kèm phải trùng báo giá
+        response = self.order(morning, start_time="09:00:00")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+        # 2 khoảng nối tiếp trong ngày không trùng nhau dù xe chỉ có 1 chiếc
+        for token in (morning, afternoon):
+            response = self.order(token)
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED, response.data)
+            order = Order.objects.get(pk=response.data["id"])
+            booking = UnitBooking.objects.get(order=order)
+            self.assertEqual((booking.starts_at, booking.ends_at), order_period(order))
+        self.assertEqual(self.order(morning).status_code, status.HTTP_409_CONFLICT)
+
+    def test_client_fees_ignored_without_quote(self):
+        response = self.client.post("/api/order/", {
+            "items": [{"xe_id": "X001", "quantity": 1}], "delivery_fee": 999, "discount_amount": 500000,
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        order = Order.objects.get(pk=response.data["id"])
+        self.assertEqual((order.delivery_fee, order.discount_amount), (0, 0))
+        self.assertEqual(order.total_price, 500000)
@@ -0,0 +1,63 @@
+"""
+Test client HTTP dùng chung cho provider bản đồ (orders.providers)
+"""
+import time
+from unittest import mock
+
+import requests
+from django.test import SimpleTestCase, TestCase
+
+from orders import providers
+from orders.geocoding import GeocodeResult, GeocodingError, geocode_cache, geocode_many
+from orders.models import GeocodedAddress
+
+DELAY = 0.3
+
+
+def slow_lookup(address, deadline=None):
+    time.sleep(DELAY)
+    if address == "Lỗi":
+        raise GeocodingError("503")
+    return GeocodeResult(21.0, 105.8, address)
+
+
+class DeadlineTest(SimpleTestCase):
+    def test_timeout_is_capped(self):
+        self.assertLessEqual(providers.Deadline(1).timeout(15), 1)
+        self.assertEqual(providers.Deadline(60).timeout(15), 15)
+        with self.assertRaises(requests.exceptions.RequestException):
+            providers.Deadline(0).timeout(15)
+
+    def test_shared_session_per_provider(self):
+        self.assertIs(providers.get_session("osrm"), providers.get_session("osrm"))
+        self.assertIsNot(providers.get_session("osrm"), providers.get_session("nominatim"))
+
+
+class ParallelGeocodeTest(TestCase):
+    """Địa chỉ chưa có cache được hỏi provider song song, tổng thời gian bị giới hạn"""
+
+    def setUp(self):
+        geocode_cache.clear()
+        self.addCleanup(geocode_cache.clear)
+        patcher = mock.patch("orders.geocoding.lookup_nominatim", side_effect=slow_lookup)
+        self.lookup = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_misses_run_in_parallel(self):
+        started = time.monotonic()
+        results = geocode_many(["Hà Nội", "Huế", "Đà Nẵng", "hà nội"])
+        self.assertLess(time.monotonic() - started, DELAY * 2)
+        self.assertEqual([result.formatted for result in results], ["Hà Nội", "Huế", "Đà Nẵng", "Hà Nội"])
+        self.assertEqual(self.lookup.call_count, 3)
+        self.assertEqual(GeocodedAddress.objects.count(), 3)
+
+    def test_deadline(self):
+        started = time.monotonic()
+        with self.assertRaises(GeocodingError):
+            geocode_many(["Hà Nội", "Huế"], deadline=providers.Deadline(DELAY / 3))
+        self.assertLess(time.monotonic() - started, DELAY)
+
+    def test_partial_failure_keeps_successes(self):
+        with self.assertRaises(GeocodingError):
+            geocode_many(["Hà Nội", "Lỗi"])
+        self.assertEqual(list(GeocodedAddress.objects.values_list("address", flat=True)), ["hà nội"])
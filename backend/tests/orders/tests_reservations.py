@@ -0,0 +1,109 @@
+"""
+Test hết hạn giữ chỗ hàng loạt (orders.reservations, command expire_reservations)
+"""
+from datetime import date, timedelta
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from core.models import Notification
+from orders.models import Order, OrderItem, UnitBooking
+from orders.occupancy import occupancy_calendar
+from orders.reservations import ReservationDeadlines, expire_reservations
+from products.models import LoaiXe, Xe
+
+
+class ExpireReservationsTest(TestCase):
+    """1 UPDATE cho mọi đơn quá hạn, hoàn xe và thông báo theo lô"""
+
+    def setUp(self):
+        occupancy_calendar.clear()
+        self.addCleanup(occupancy_calendar.clear)
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.cars = [
+            Xe.objects.create(
+                ma_xe=f"X00{index}", ten_xe=f"Xe {index}", slug=f"xe-{index}", gia=30000000, gia_thue=150000,
+                so_luong=5, mau_sac="Đỏ", loai_xe=loai,
+            )
+            for index in (1, 2)
+        ]
+
+    def reserve(self, minutes, items, status="reserved"):
+        order = Order.objects.create(
+            user=self.user, status=status, start_date=date(2025, 1, 1), end_date=date(2025, 1, 3),
+            reserved_until=timezone.now() + timedelta(minutes=minutes),
+        )
+        for xe, quantity in items:
+            OrderItem.objects.create(order=order, xe=xe, quantity=quantity)
+        return order
+
+    def test_expire_in_bulk(self):
+        first = self.reserve(-5, [(self.cars[0], 1), (self.cars[1], 2)])
+        second = self.reserve(-1, [(self.cars[0], 2)])
+        pending = self.reserve(10, [(self.cars[0], 1)])
+        paid = self.reserve(-5, [(self.cars[1], 1)], status="paid")
+        UnitBooking.objects.create(
+            order=first, xe=self.cars[0], unit=1,
+            starts_at=timezone.now(), ends_at=timezone.now() + timedelta(days=1),
+        )
+        occupancy_calendar.month(date(2025, 1, 1))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            expired = expire_reservations()
+
+        self.assertCountEqual(expired, [first.pk, second.pk])
+        statuses = dict(Order.objects.values_list("pk", "status"))
+        self.assertEqual(statuses, {first.pk: "expired", second.pk: "expired", pending.pk: "reserved", paid.pk: "paid"})
+        self.assertEqual(
+            dict(Xe.objects.values_list("pk", "so_luong")), {"X001": 5 + 3, "X002": 5 + 2},
+        )
+        self.assertFalse(UnitBooking.objects.exists())
+        notifications = Notification.objects.filter(type="order_status")
+        self.assertCountEqual(notifications.values_list("order_id", flat=True), [first.pk, second.pk])
+        self.assertIn("Hết hạn giữ chỗ", notifications[0].message)
+        self.assertEqual(list(occupancy_calendar.occupancy(date(2025, 1, 1), ["X001"])["X001"][:3]), [1, 1, 1])
+
+        # Chạy lại không expire trùng
+        self.assertEqual(expire_reservations(), [])
+        self.assertEqual(Xe.objects.get(pk="X001").so_luong, 8)
+
+    def test_query_count_is_flat(self):
+        for _ in range(20):
+            self.reserve(-1, [(self.cars[0], 1), (self.cars[1], 1)])
+        # UPDATE RETURNING, SUM OrderItem, UPDATE Xe, DELETE UnitBooking, INSERT Notification
+        # (+ savepoint của transaction.atomic)
+        with self.assertNumQueries(5 + 2):
+            self.assertEqual(len(expire_reservations()), 20)
+
+    def test_order_ids_and_check_reservation_expired(self):
+        first = self.reserve(-1, [(self.cars[0], 1)])
+        second = self.reserve(-1, [(self.cars[0], 1)])
+        self.assertEqual(expire_reservations(order_ids=[first.pk]), [first.pk])
+        self.assertEqual(Order.objects.get(pk=second.pk).status, "reserved")
+
+        self.assertTrue(second.check_reservation_expired())
+        self.assertEqual(second.status, "expired")
+        self.assertFalse(self.reserve(10, [(self.cars[0], 1)]).check_reservation_expired())
+
+    def test_deadline_heap(self):
+        orders = [self.reserve(minutes, [(self.cars[0], 1)]) for minutes in (30, -1, 10)]
+        self.reserve(5, [(self.cars[0], 1)], status="paid")
+
+        deadlines = ReservationDeadlines(lookahead=2)
+        self.assertEqual(deadlines.load(), 2)
+        self.assertTrue(deadlines.truncated)
+        self.assertEqual(deadlines.next_deadline(), orders[1].reserved_until)
+        self.assertEqual(deadlines.pop_due(timezone.now()), [orders[1].pk])
+        self.assertEqual(deadlines.pop_due(timezone.now() + timedelta(minutes=20)), [orders[2].pk])
+        self.assertIsNone(deadlines.next_deadline())
+
+    def test_command_once(self):
+        self.reserve(-1, [(self.cars[0], 1)])
+        out = StringIO()
+        call_command("expire_reservations", "--once", stdout=out)
+        self.assertIn("Đã hết hạn 1 đơn", out.getvalue())
+        self.assertFalse(Order.objects.filter(status="reserved").exists())
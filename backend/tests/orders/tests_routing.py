@@ -0,0 +1,95 @@
+"""
+Test rút gọn geometry, encoded polyline và cache route (orders.geo, orders.routing)
+"""
+from unittest import mock
+
+import numpy as np
+from django.core.cache import cache
+from django.test import SimpleTestCase, TestCase
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders import providers
+from orders.geo import encode_polyline, simplify, zoom_tolerance
+
+# Đường dài ~1000 điểm lượn nhẹ quanh đường thẳng Hà Nội -> Thanh Hóa
+LNGS = np.linspace(105.8542, 105.7850, 1000)
+LATS = np.linspace(21.0285, 19.8067, 1000) + 0.002 * np.sin(np.linspace(0, 40, 1000))
+COORDINATES = np.column_stack([LNGS, LATS]).tolist()
+BODY = {"lat1": 21.0285, "lng1": 105.8542, "lat2": 19.8067, "lng2": 105.7850}
+
+
+def osrm_response(*args, **kwargs):
+    response = mock.Mock(status_code=200)
+    geometry = {"type": "LineString", "coordinates": COORDINATES}
+    response.json.return_value = {
+        "code": "Ok", "routes": [{"distance": 152350, "duration": 7300, "geometry": geometry}],
+    }
+    return response
+
+
+class GeometryTest(SimpleTestCase):
+    def test_encode_polyline(self):
+        # Ví dụ chuẩn của Google Polyline Algorithm ([lng, lat])
+        coordinates = [[-120.2, 38.5], [-120.95, 40.7], [-126.453, 43.252]]
+        self.assertEqual(encode_polyline(coordinates), "_p~iF~ps|U_ulLnnqC_mqNvxq`@")
+
+    def test_simplify_keeps_shape(self):
+        tolerance = zoom_tolerance(12)
+        points = simplify(COORDINATES, tolerance)
+        self.assertLess(len(points), len(COORDINATES) / 10)
+        np.testing.assert_array_equal(points[[0, -1]], np.array(COORDINATES)[[0, -1]])
+        # Mọi điểm gốc nằm cách đường đã rút gọn không quá tolerance
+        scale = np.array([np.cos(np.radians(LATS.mean())), 1])
+        original, kept = np.array(COORDINATES) * scale, points * scale
+        starts, ends = kept[:-1], kept[1:]
+        segments = ends - starts
+        t = np.clip(
+            np.einsum("psk,sk->ps", original[:, None] - starts, segments) / (segments ** 2).sum(axis=1), 0, 1,
+        )
+        nearest = starts + t[..., None] * segments
+        distances = np.linalg.norm(original[:, None] - nearest, axis=2).min(axis=1)
+        self.assertLessEqual(distances.max(), tolerance * 1.01)
+        # Zoom lớn giữ nhiều điểm hơn
+        self.assertGreater(len(simplify(COORDINATES, zoom_tolerance(16))), len(points))
+
+
+class RouteCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.addCleanup(cache.clear)
+        providers.reset_breakers()
+        patcher = mock.patch("orders.providers.get", side_effect=osrm_response)
+        self.get = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.client = APIClient()
+
+    def post(self, **extra):
+        response = self.client.post("/api/maps/distance/", {**BODY, **extra}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_simplified_geojson_and_polyline(self):
+        data = self.post(zoom=10)
+        self.assertEqual(data["distance"], 152.35)
+        coordinates = data["geometry"]["coordinates"]
+        self.assertLess(len(coordinates), 50)
+        self.assertEqual((coordinates[0], coordinates[-1]), (COORDINATES[0], COORDINATES[-1]))
+
+        data = self.post(zoom=10, geometry_format="polyline")
+        self.assertIsNone(data["geometry"])
+        self.assertEqual(data["polyline"], encode_polyline(coordinates))
+
+    def test_repeated_lookup_skips_osrm(self):
+        self.post()
+        # Lệch vài mét vẫn cùng khóa cache (làm tròn 4 chữ số thập phân)
+        self.post(lat1=BODY["lat1"] + 0.00001, zoom=8)
+        self.assertEqual(self.get.call_count, 1)
+        self.post(lat1=BODY["lat1"] + 0.01)
+        self.assertEqual(self.get.call_count, 2)
+
+    def test_invalid_options(self):
+        for extra in ({"zoom": 30}, {"zoom": "xa"}, {"geometry_format": "kml"}):
+            response = self.client.post("/api/maps/distance/", {**BODY, **extra}, format="json")
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.get.assert_not_called()
@@ -0,0 +1,125 @@
+"""
+Test sparse fieldsets (?fields= / ?omit= / ?expand=) và cắt queryset theo field (core.fieldsets)
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from core.fieldsets import parse_field_tree
+from orders.models import Order, OrderItem
+from products.models import CarImage, LoaiXe, Review, Xe
+
+
+class ParseFieldTreeTest(TestCase):
+    def test_nested_paths(self):
+        self.assertEqual(
+            parse_field_tree("id, items.quantity,items.xe.ten_xe,,"),
+            {"id": {}, "items": {"quantity": {}, "xe": {"ten_xe": {}}}},
+        )
+        self.assertEqual(parse_field_tree(""), {})
+
+
+class OrderSparseFieldsetsTest(TestCase):
+    """Đơn hàng có items lồng XeSerializer: quan hệ không lấy thì không query"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="user1", password="pass12345")
+        self.client.force_authenticate(user=self.user)
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        for index in range(3):
+            xe = Xe.objects.create(
+                ma_xe=f"X{index:03d}", ten_xe=f"Xe {index}", slug=f"xe-{index}",
+                gia=30000000, gia_thue=150000, so_luong=2, mau_sac="Đỏ", loai_xe=loai,
+            )
+            CarImage.objects.create(xe=xe, image=f"cars/{xe.ma_xe}.jpg")
+            order = Order.objects.create(user=self.user, total_price=150000, note="Giao buổi sáng")
+            OrderItem.objects.create(order=order, xe=xe, quantity=1, price_at_purchase=150000)
+
+    def test_default_response_unchanged(self):
+        response = self.client.get("/api/order/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        item = response.data["results"][0]["items"][0]
+        self.assertEqual(item["xe"]["loai_xe"]["ten_loai"], "Xe tay ga")
+        self.assertEqual(len(item["xe"]["car_images"]), 1)
+
+    def test_fields_drop_nested_relations(self):
+        # COUNT + SELECT đơn hàng, không prefetch items/xe
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/order/", {"fields": "id,status,total_price"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["results"][0]), {"id", "status", "total_price"})
+
+    def test_nested_fields_skip_xe_prefetch(self):
+        # COUNT + SELECT đơn hàng + 1 prefetch items (không load xe)
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/order/", {"fields": "id,items.quantity,items.price_at_purchase"})
+        self.assertEqual(
+            response.data["results"][0]["items"][0],
+            {"quantity": 1, "price_at_purchase": "150000.00"},
+        )
+
+    def test_omit_nested_field(self):
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/order/", {"omit": "items.xe,note"})
+        order = response.data["results"][0]
+        self.assertNotIn("note", order)
+        self.assertEqual(set(order["items"][0]), {"id", "quantity", "price_at_purchase"})
+
+    def test_expand_keeps_nested_relation(self):
+        response = self.client.get("/api/order/", {"fields": "id", "expand": "items.xe"})
+        order = response.data["results"][0]
+        self.assertEqual(set(order), {"id", "items"})
+        self.assertEqual(set(order["items"][0]), {"xe"})
+        self.assertTrue(order["items"][0]["xe"]["ma_xe"].startswith("X"))
+
+    def test_nested_xe_fields(self):
+        response = self.client.get("/api/order/", {"fields": "id,items.xe.ten_xe,items.xe.image_url"})
+        xe = response.data["results"][0]["items"][0]["xe"]
+        self.assertEqual(set(xe), {"ten_xe", "image_url"})
+
+    def test_write_ignores_fields_param(self):
+        xe = Xe.objects.get(pk="X000")
+        response = self.client.post(
+            "/api/cart-item/?fields=id", {"xe_id": xe.pk, "cart_id": self._cart().pk, "quantity": 1}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertIn("quantity", response.data)
+
+    def _cart(self):
+        from orders.models import Cart
+        return Cart.objects.create(user=self.user)
+
+
+class CatalogSparseFieldsetsTest(TestCase):
+    """Field alias/tính toán trên xe và review"""
+
+    def setUp(self):
+        self.client = APIClient()
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.xe = Xe.objects.create(
+            ma_xe="X001", ten_xe="Yamaha Grande", slug="yamaha-grande",
+            gia=45000000, gia_thue=200000, so_luong=3, mau_sac="Đỏ", loai_xe=loai,
+            image_url="https://cdn.example.com/x001.jpg", mo_ta="Mô tả dài",
+        )
+        user = User.objects.create_user(username="user1", password="pass12345", first_name="An")
+        Review.objects.create(xe=self.xe, user=user, rating=5, comment="Tốt")
+
+    def test_detail_fields(self):
+        response = self.client.get("/api/xe/X001/", {"fields": "ma_xe,image_url"})
+        self.assertEqual(response.data, {"ma_xe": "X001", "image_url": "https://cdn.example.com/x001.jpg"})
+
+    def test_detail_omit_gallery(self):
+        response = self.client.get("/api/xe/X001/", {"omit": "car_images,mo_ta"})
+        self.assertNotIn("car_images", response.data)
+        self.assertNotIn("mo_ta", response.data)
+        self.assertEqual(response.data["loai_xe"]["ma_loai"], "LX01")
+
+    def test_list_fields(self):
+        response = self.client.get("/api/xe/", {"fields": "ma_xe,primary_image"})
+        self.assertEqual(response.data["results"], [{"ma_xe": "X001", "primary_image": "https://cdn.example.com/x001.jpg"}])
+
+    def test_review_method_field(self):
+        response = self.client.get("/api/review/", {"fields": "rating,user_name"})
+        self.assertEqual(response.data["results"], [{"rating": 5, "user_name": "An"}])
@@ -0,0 +1,155 @@
+"""
+Test trừ kho theo lô khi tạo đơn/checkout (orders.stock)
+"""
+import threading
+import unittest
+
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.models import Cart, CartItem, Order, OrderItem
+from orders.stock import InsufficientStock, decrement_stock, increment_stock
+from products.models import LoaiXe, Xe
+
+
+def create_cars(count, so_luong):
+    loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+    return [
+        Xe.objects.create(
+            ma_xe=f"X{index:03d}", ten_xe=f"Xe {index}", slug=f"xe-{index}", gia=30000000, gia_thue=150000,
+            so_luong=so_luong, mau_sac="Đỏ", loai_xe=loai,
+        )
+        for index in range(1, count + 1)
+    ]
+
+
+def stock():
+    return dict(Xe.objects.values_list("pk", "so_luong"))
+
+
+class StockTest(TestCase):
+    """Trừ kho nhiều xe trong 1 UPDATE, thiếu hàng thì không xe nào bị trừ"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.client.force_authenticate(user=self.user)
+        self.cars = create_cars(3, so_luong=2)
+
+    def test_decrement_is_atomic(self):
+        decrement_stock({"X001": 1, "X002": 2})
+        self.assertEqual(stock(), {"X001": 1, "X002": 0, "X003": 2})
+
+        with self.assertRaises(InsufficientStock) as raised:
+            decrement_stock({"X001": 1, "X002": 1, "X003": 1})
+        self.assertEqual(raised.exception.xe.pk, "X002")
+        self.assertEqual(raised.exception.available, 0)
+        self.assertEqual(stock(), {"X001": 1, "X002": 0, "X003": 2})
+
+        increment_stock({"X002": 3})
+        self.assertEqual(stock()["X002"], 3)
+
+    def test_order_create_query_count_is_flat(self):
+        counts = []
+        for count in (1, 3):
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.post("/api/order/", {
+                    "items": [{"xe_id": xe.ma_xe, "quantity": 1} for xe in self.cars[:count]],
+                }, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            counts.append(sum(1 for query in queries if not query["sql"].startswith("SELECT")))
+        # Thêm xe vào đơn không thêm câu ghi nào (bulk INSERT dòng đơn, 1 UPDATE trừ kho);
+        # SELECT còn lại là của serializer response
+        self.assertEqual(counts[0], counts[1])
+        self.assertEqual(stock(), {"X001": 0, "X002": 1, "X003": 1})
+
+    def test_order_create_sums_lines(self):
+        response = self.client.post("/api/order/", {
+            "items": [{"xe_id": "X001", "quantity": 2}, {"xe_id": "X001", "quantity": 1}],
+        }, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(stock()["X001"], 2)
+        self.assertFalse(Order.objects.exists())
+
+        response = self.client.post("/api/order/", {"items": [{"xe_id": "X999", "quantity": 1}]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_checkout(self):
+        cart = Cart.objects.create(user=self.user)
+        CartItem.objects.create(cart=cart, xe=self.cars[0], quantity=2)
+        CartItem.objects.create(cart=cart, xe=self.cars[2], quantity=1)
+
+        response = self.client.post("/api/checkout/")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(stock(), {"X001": 0, "X002": 2, "X003": 1})
+        self.assertEqual(OrderItem.objects.filter(order_id=response.data["id"]).count(), 2)
+        self.assertFalse(cart.items.exists())
+
+        CartItem.objects.create(cart=cart, xe=self.cars[0], quantity=1)
+        response = self.client.post("/api/checkout/")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(Order.objects.count(), 1)
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Cần PostgreSQL để ghi đồng thời từ nhiều thread")
+class ConcurrentStockTest(TransactionTestCase):
+    """Nhiều đơn đồng thời tranh nhau ít hàng: không bao giờ bán quá so_luong"""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.cars = create_cars(3, so_luong=3)
+
+    def run_parallel(self, target):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def worker(index):
+            try:
+                barrier.wait()
+                results.append(target(index))
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker, args=(index,)) for index in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def test_parallel_orders_do_not_oversell(self):
+        def post(index):
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            # Thứ tự xe trong đơn khác nhau giữa các thread: khóa theo ma_xe nên không deadlock
+            items = [{"xe_id": xe.ma_xe, "quantity": 1} for xe in self.cars]
+            if index % 2:
+                items.reverse()
+            return client.post("/api/order/", {"items": items}, format="json").status_code
+
+        codes = self.run_parallel(post)
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 3, codes)
+        self.assertTrue(all(code in (201, 400) for code in codes), codes)
+        self.assertEqual(set(stock().values()), {0})
+        self.assertEqual(OrderItem.objects.count(), 9)
+
+    def test_parallel_checkout_do_not_oversell(self):
+        users = [User.objects.create_user(username=f"buyer{index}", password="pass12345") for index in range(self.THREADS)]
+        for user in users:
+            cart = Cart.objects.create(user=user)
+            CartItem.objects.create(cart=cart, xe=self.cars[0], quantity=1)
+
+        def checkout(index):
+            client = APIClient()
+            client.force_authenticate(user=users[index])
+            return client.post("/api/checkout/").status_code
+
+        codes = self.run_parallel(checkout)
+        self.assertEqual(codes.count(status.HTTP_201_CREATED), 3, codes)
+        self.assertEqual(stock()["X001"], 0)
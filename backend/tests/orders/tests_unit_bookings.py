@@ -0,0 +1,164 @@
+"""
+Test giữ từng chiếc xe cho đơn thuê (orders.bookings, bảng UnitBooking)
+"""
+import threading
+import unittest
+from datetime import datetime
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, connection, transaction
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APIClient
+
+from orders.bookings import UnitsUnavailable, book_units
+from orders.models import Order, UnitBooking
+from products.models import LoaiXe, Xe
+
+
+def aware(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+def create_xe(so_luong):
+    loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+    return Xe.objects.create(
+        ma_xe="X001", ten_xe="Vision", slug="vision", gia=30000000, gia_thue=150000,
+        so_luong=so_luong, mau_sac="Đỏ", loai_xe=loai,
+    )
+
+
+class UnitBookingTest(TestCase):
+    """Đơn thuê giữ chiếc xe, đơn hủy trả lại chiếc"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.admin = User.objects.create_superuser(username="admin", password="pass12345")
+        self.client.force_authenticate(user=self.user)
+        self.xe = create_xe(so_luong=3)
+
+    def create_order(self, quantity=1, start="2025-01-01", end="2025-01-05"):
+        return self.client.post("/api/order/", {
+            "items": [{"xe_id": "X001", "quantity": quantity}], "start_date": start, "end_date": end,
+        }, format="json")
+
+    def test_order_books_distinct_units(self):
+        response = self.create_order(quantity=2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        bookings = UnitBooking.objects.filter(order_id=response.data["id"])
+        self.assertEqual(sorted(bookings.values_list("unit", flat=True)), [1, 2])
+        self.assertEqual(bookings[0].starts_at, aware(2025, 1, 1))
+
+        # Đơn không có lịch (mua/giỏ hàng) không giữ chiếc nào
+        response = self.client.post("/api/order/", {"items": [{"xe_id": "X001", "quantity": 1}]}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertFalse(UnitBooking.objects.filter(order_id=response.data["id"]).exists())
+
+    def test_same_window_booked_twice(self):
+        # Đơn đầu trừ tồn kho còn 2 nhưng vẫn đánh số chiếc theo sức chứa 3
+        self.assertEqual(self.create_order(quantity=1).status_code, status.HTTP_201_CREATED)
+        response = self.create_order(quantity=2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(sorted(UnitBooking.objects.values_list("unit", flat=True)), [1, 2, 3])
+        self.xe.refresh_from_db()
+        self.assertEqual((self.xe.so_luong, self.xe.so_chiec), (0, 3))
+
+        # Khoảng không trùng vẫn còn đủ chiếc để chọn
+        order = Order.objects.create(user=self.user)
+        book_units(order, self.xe, 3, aware(2025, 2, 1), aware(2025, 2, 3))
+        self.assertEqual(UnitBooking.objects.filter(order=order).count(), 3)
+
+    def test_cancelled_order_releases_units(self):
+        order_id = self.create_order(quantity=1).data["id"]
+        self.client.force_authenticate(user=self.admin)
+        response = self.client.patch(f"/api/order/{order_id}/", {"status": "cancelled"}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertFalse(UnitBooking.objects.filter(order_id=order_id).exists())
+
+    def test_book_units_when_full(self):
+        order = Order.objects.create(user=self.user)
+        starts_at, ends_at = aware(2025, 1, 1), aware(2025, 1, 3)
+        book_units(order, self.xe, 2, starts_at, ends_at)
+        with self.assertRaises(UnitsUnavailable) as raised:
+            book_units(order, self.xe, 2, aware(2025, 1, 2), aware(2025, 1, 4))
+        self.assertEqual(raised.exception.available, 1)
+        # Nối tiếp ngay sau khi trả xe không bị tính là trùng
+        book_units(order, self.xe, 3, ends_at, aware(2025, 1, 4))
+        self.assertEqual(UnitBooking.objects.count(), 5)
+
+    @unittest.skipUnless(connection.vendor == "postgresql", "Exclusion constraint chỉ có trên PostgreSQL")
+    def test_exclusion_constraint(self):
+        order = Order.objects.create(user=self.user)
+        UnitBooking.objects.create(order=order, xe=self.xe, unit=1, starts_at=aware(2025, 1, 1), ends_at=aware(2025, 1, 3))
+        UnitBooking.objects.create(order=order, xe=self.xe, unit=1, starts_at=aware(2025, 1, 3), ends_at=aware(2025, 1, 4))
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            UnitBooking.objects.create(
+                order=order, xe=self.xe, unit=1, starts_at=aware(2025, 1, 2), ends_at=aware(2025, 1, 5),
+            )
+
+
+@unittest.skipUnless(connection.vendor == "postgresql", "Cần PostgreSQL để ghi đồng thời từ nhiều thread")
+class ConcurrentBookingTest(TransactionTestCase):
+    """Nhiều đơn đặt cùng lúc 1 xe: không bao giờ có 2 đơn cùng giữ 1 chiếc"""
+
+    THREADS = 8
+
+    def setUp(self):
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.xe = create_xe(so_luong=2)
+
+    def run_parallel(self, target):
+        barrier = threading.Barrier(self.THREADS)
+        results = []
+
+        def worker():
+            try:
+                barrier.wait()
+                results.append(target())
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return results
+
+    def assertNoOverlap(self):
+        bookings = list(UnitBooking.objects.filter(xe=self.xe).order_by("unit", "starts_at"))
+        for previous, current in zip(bookings, bookings[1:]):
+            if previous.unit == current.unit:
+                self.assertLessEqual(previous.ends_at, current.starts_at)
+        return bookings
+
+    def test_parallel_book_units(self):
+        def book():
+            with transaction.atomic():
+                order = Order.objects.create(user=self.user)
+                try:
+                    book_units(order, self.xe, 1, aware(2025, 1, 1), aware(2025, 1, 5))
+                except UnitsUnavailable:
+                    transaction.set_rollback(True)
+                    return False
+                return True
+
+        results = self.run_parallel(book)
+        self.assertEqual(results.count(True), 2)
+        self.assertEqual(len(self.assertNoOverlap()), 2)
+
+    def test_parallel_order_api(self):
+        def post():
+            client = APIClient()
+            client.force_authenticate(user=self.user)
+            return client.post("/api/order/", {
+                "items": [{"xe_id": "X001", "quantity": 1}], "start_date": "2025-01-01", "end_date": "2025-01-05",
+            }, format="json").status_code
+
+        codes = self.run_parallel(post)
+        created = codes.count(status.HTTP_201_CREATED)
+        self.assertGreaterEqual(created, 1)
+        self.assertTrue(all(code in (201, 400, 409) for code in codes), codes)
+        self.assertEqual(len(self.assertNoOverlap()), created)
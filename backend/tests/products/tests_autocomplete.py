@@ -0,0 +1,135 @@
+"""
+Test autocomplete index trong bộ nhớ cho /api/xe/search-suggestions/
+"""
+import threading
+import time
+from unittest import mock
+
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from products.autocomplete import AutocompleteIndex, Suggestion, autocomplete_index
+from products.models import LoaiXe, Xe
+
+
+class AutocompleteTest(TestCase):
+    """Test gợi ý tìm kiếm"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tay_ga = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.con_tay = LoaiXe.objects.create(ma_loai="LX03", ten_loai="Xe côn tay")
+        Xe.objects.create(
+            ma_xe="X001", ten_xe="Yamaha Grande", slug="yamaha-grande",
+            gia=45000000, so_luong=3, mau_sac="Đỏ", loai_xe=self.tay_ga,
+        )
+        Xe.objects.create(
+            ma_xe="X002", ten_xe="Honda Winner X", slug="honda-winner-x",
+            gia=46500000, so_luong=2, mau_sac="Xanh", loai_xe=self.con_tay,
+        )
+        autocomplete_index.build()
+
+    def suggest(self, query):
+        response = self.client.get("/api/xe/search-suggestions/", {"q": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [(s["type"], s["id"]) for s in response.data["suggestions"]]
+
+    def test_prefix_suggestions_without_db(self):
+        with self.assertNumQueries(0):
+            suggestions = self.suggest("yam gr")
+        self.assertEqual(suggestions, [("car", "X001")])
+
+    def test_diacritic_folded_category(self):
+        """'con tay' khớp loại 'Xe côn tay'"""
+        self.assertEqual(self.suggest("con tay"), [("category", "LX03")])
+
+    def test_repeated_query_is_cached(self):
+        first = self.suggest("honda")
+        self.assertIn((("honda",), 10), autocomplete_index.results)
+        self.assertEqual(self.suggest("honda"), first)
+
+    def test_typo_uses_trigrams(self):
+        self.assertEqual(self.suggest("yamha"), [("car", "X001")])
+
+    def test_short_query(self):
+        self.assertEqual(self.suggest("y"), [])
+
+    def test_incremental_update_on_save_and_delete(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            xe = Xe.objects.create(
+                ma_xe="X003", ten_xe="VinFast Klara", slug="vinfast-klara",
+                gia=39000000, so_luong=1, mau_sac="Trắng", loai_xe=self.tay_ga,
+            )
+        self.assertEqual(self.suggest("klara"), [("car", "X003")])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            xe.delete()
+        self.assertEqual(self.suggest("klara"), [])
+
+    def test_category_rename(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tay_ga.ten_loai = "Xe ga"
+            self.tay_ga.save()
+        self.assertEqual(self.suggest("xe ga"), [("category", "LX01")])
+
+
+class AutocompleteRebuildTest(TestCase):
+    """Build lại index: chỉ 1 thread build, request khác không bị chặn"""
+
+    def slow_rebuild(self, index, started, release):
+        calls = []
+
+        def rebuild():
+            calls.append(threading.current_thread().name)
+            started.set()
+            release.wait(5)
+            index.built_at = time.monotonic()
+
+        return calls, mock.patch.object(index, "_rebuild", side_effect=rebuild)
+
+    def test_cold_start_builds_once(self):
+        index = AutocompleteIndex()
+        started, release = threading.Event(), threading.Event()
+        calls, patcher = self.slow_rebuild(index, started, release)
+        with patcher:
+            threads = [threading.Thread(target=index.ensure_built) for _ in range(8)]
+            for thread in threads:
+                thread.start()
+            started.wait(5)
+            release.set()
+            for thread in threads:
+                thread.join()
+        self.assertEqual(len(calls), 1)
+
+    @override_settings(AUTOCOMPLETE_MAX_AGE=0)
+    def test_stale_index_served_during_rebuild(self):
+        index = AutocompleteIndex()
+        index._add(Suggestion("category", "LX01", "Xe tay ga"))
+        index.built_at = time.monotonic() - 1
+        started, release = threading.Event(), threading.Event()
+        calls, patcher = self.slow_rebuild(index, started, release)
+        with patcher:
+            builder = threading.Thread(target=index.ensure_built)
+            builder.start()
+            started.wait(5)
+            # Đang build: đọc bản cũ ngay, không build thêm
+            self.assertEqual([s["id"] for s in index.search("tay ga")], ["LX01"])
+            release.set()
+            builder.join()
+        self.assertEqual(len(calls), 1)
+
+    def test_updates_during_build_are_kept(self):
+        LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        index = AutocompleteIndex()
+        original = LoaiXe.objects.values_list
+
+        def values_list(*args, **kwargs):
+            # Xe mới được lưu sau khi build đã đọc database
+            index.update_car(Xe(ma_xe="X009", ten_xe="Vespa Sprint"))
+            return original(*args, **kwargs)
+
+        with mock.patch.object(LoaiXe.objects, "values_list", side_effect=values_list):
+            index.build()
+        self.assertEqual([s["id"] for s in index.search("vespa")], ["X009"])
+        self.assertIsNone(index._pending)
@@ -0,0 +1,151 @@
+"""
+Test filter xe trống theo khoảng thời gian (/api/xe/?available_from=&available_to=)
+"""
+from datetime import date, time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from orders.availability import fully_booked_cars, parse_window
+from orders.models import Order, OrderItem
+from orders.utils import check_schedule_conflict
+from products.models import LoaiXe, Xe
+
+
+class AvailabilityFilterTest(TestCase):
+    """Xe kín chiếc trong khoảng thời gian (theo đơn còn hiệu lực) bị loại khỏi danh sách"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="renter", password="pass12345")
+        self.loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.other_loai = LoaiXe.objects.create(ma_loai="LX02", ten_loai="Xe số")
+        self.cars = {
+            ma_xe: Xe.objects.create(
+                ma_xe=ma_xe, ten_xe=f"Xe {ma_xe}", slug=ma_xe.lower(), gia=30000000, gia_thue=150000,
+                so_luong=1, mau_sac="Đỏ", loai_xe=self.other_loai if ma_xe == "X004" else self.loai,
+            )
+            for ma_xe in ("X001", "X002", "X003", "X004")
+        }
+
+    def book(self, ma_xe, start, end, start_time=None, end_time=None, quantity=1, **fields):
+        order = Order.objects.create(
+            user=self.user, start_date=start, end_date=end, start_time=start_time, end_time=end_time, **fields
+        )
+        OrderItem.objects.create(order=order, xe=self.cars[ma_xe], quantity=quantity)
+        return order
+
+    def available(self, **params):
+        response = self.client.get("/api/xe/", params)
+        self.assertEqual(response.status_code, 200)
+        return [car["ma_xe"] for car in response.data["results"]]
+
+    def test_excludes_booked_cars(self):
+        self.book("X001", date(2025, 1, 10), date(2025, 1, 12))
+        self.book("X002", date(2025, 1, 1), date(2025, 1, 31))
+        self.book("X003", date(2025, 2, 1), date(2025, 2, 3))
+
+        available = self.available(available_from="2025-01-11", available_to="2025-01-15")
+        self.assertEqual(available, ["X003", "X004"])
+        # Chỉ truyền 1 ngày = cả ngày đó
+        self.assertEqual(self.available(available_from="2025-02-02"), ["X001", "X002", "X004"])
+
+    def test_inactive_orders_do_not_block(self):
+        self.book("X001", date(2025, 1, 10), date(2025, 1, 12), status="cancelled")
+        self.book("X002", date(2025, 1, 10), date(2025, 1, 12), status="expired")
+        self.book("X003", date(2025, 1, 10), date(2025, 1, 12), payment_status="failed")
+
+        available = self.available(available_from="2025-01-10", available_to="2025-01-12")
+        self.assertEqual(available, ["X001", "X002", "X003", "X004"])
+
+    def test_time_boundaries(self):
+        self.book("X001", date(2025, 1, 10), date(2025, 1, 10), time(8, 0), time(12, 0))
+
+        # Nhận xe đúng lúc đơn trước trả xe không bị tính là trùng
+        self.assertIn("X001", self.available(
+            available_from="2025-01-10T12:00:00", available_to="2025-01-10T18:00:00",
+        ))
+        self.assertIn("X001", self.available(
+            available_from="2025-01-09T18:00:00", available_to="2025-01-10T08:00:00",
+        ))
+        self.assertNotIn("X001", self.available(
+            available_from="2025-01-10T11:59:00", available_to="2025-01-10T18:00:00",
+        ))
+        self.assertNotIn("X001", self.available(available_from="2025-01-10"))
+
+    def test_multi_unit_car_hidden_only_when_full(self):
+        Xe.objects.filter(pk="X001").update(so_chiec=3, so_luong=0)
+        self.book("X001", date(2025, 1, 10), date(2025, 1, 12), quantity=2)
+        # Tồn kho (so_luong) đã bị trừ hết nhưng vẫn còn 1 chiếc trống theo lịch
+        self.assertIn("X001", self.available(available_from="2025-01-11"))
+
+        # 2 đơn không chồng nhau trong khoảng xem: lúc đông nhất vẫn chỉ 2 chiếc
+        self.book("X001", date(2025, 1, 13), date(2025, 1, 14))
+        self.assertIn("X001", self.available(available_from="2025-01-11", available_to="2025-01-14"))
+        self.book("X001", date(2025, 1, 12), date(2025, 1, 12))
+        self.assertNotIn("X001", self.available(available_from="2025-01-11", available_to="2025-01-14"))
+        self.assertIn("X001", self.available(available_from="2025-01-13"))
+
+    def test_composes_with_other_filters(self):
+        self.book("X001", date(2025, 1, 10), date(2025, 1, 12))
+
+        params = {"available_from": "2025-01-11", "available_to": "2025-01-11", "loai": "LX01"}
+        self.assertEqual(self.available(**params), ["X002", "X003"])
+
+        # Đơn trùng lịch của các xe đã lọc (1 query) + COUNT (validators/pagination) + trang kết quả,
+        # không query theo từng xe
+        with CaptureQueriesContext(connection) as queries:
+            self.available(**params)
+        self.assertEqual(len(queries), 3)
+
+        response = self.client.get("/api/xe/facets/", params)
+        self.assertEqual(response.data["total"], 2)
+
+    def test_sweeps_only_filtered_cars_over_capacity(self):
+        Xe.objects.filter(pk="X002").update(so_chiec=2)
+        self.book("X001", date(2025, 1, 10), date(2025, 1, 12))
+        self.book("X002", date(2025, 1, 11), date(2025, 1, 11))
+        self.book("X004", date(2025, 1, 11), date(2025, 1, 11))
+        window = parse_window("2025-01-11", "2025-01-11")
+
+        self.assertEqual(sorted(fully_booked_cars(*window)), ["X001", "X004"])
+        # X002 (1/2 chiếc) bị loại trong SQL, X004 nằm ngoài queryset: chỉ lấy đơn của X001
+        with CaptureQueriesContext(connection) as queries:
+            full = fully_booked_cars(*window, cars=Xe.objects.filter(loai_xe=self.loai))
+        self.assertEqual(full, ["X001"])
+        self.assertEqual(len(queries), 1)
+
+    def test_new_booking_is_visible_immediately(self):
+        params = {"available_from": "2025-01-11", "available_to": "2025-01-12"}
+        self.assertEqual(len(self.available(**params)), 4)
+        self.book("X001", date(2025, 1, 10), date(2025, 1, 12))
+        self.assertNotIn("X001", self.available(**params))
+        response = self.client.get("/api/xe/facets/", params)
+        self.assertEqual(response.data["total"], 3)
+
+    def test_invalid_window_is_ignored(self):
+        self.book("X001", date(2025, 1, 10), date(2025, 1, 12))
+        self.assertEqual(len(self.available(available_from="abc")), 4)
+        self.assertEqual(len(self.available(available_from="2025-13-01")), 4)
+        # Kết thúc trước khi bắt đầu
+        self.assertEqual(len(self.available(available_from="2025-01-12", available_to="2025-01-10")), 4)
+
+    def test_check_schedule_conflict_matches_filter(self):
+        order = self.book("X001", date(2025, 1, 10), date(2025, 1, 10), time(8, 0), time(12, 0))
+
+        has_conflict, conflicts = check_schedule_conflict("X001", date(2025, 1, 10), date(2025, 1, 10), time(11, 0))
+        self.assertTrue(has_conflict)
+        self.assertEqual(conflicts, [order])
+        has_conflict, _ = check_schedule_conflict(
+            "X001", date(2025, 1, 10), date(2025, 1, 10), time(12, 0), time(14, 0)
+        )
+        self.assertFalse(has_conflict)
+        has_conflict, _ = check_schedule_conflict(
+            "X001", date(2025, 1, 10), date(2025, 1, 10), exclude_order_id=order.id
+        )
+        self.assertFalse(has_conflict)
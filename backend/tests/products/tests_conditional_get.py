@@ -0,0 +1,105 @@
+"""
+Test ETag / Last-Modified + 304 cho xe, loại xe, địa điểm
+"""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from products.models import CarImage, LoaiXe, Location, Review, Xe
+
+
+class ConditionalGetTest(TestCase):
+    """Test conditional GET (không qua response cache vì chạy trong transaction)"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.xe = Xe.objects.create(
+            ma_xe="X001", ten_xe="Yamaha Grande", slug="yamaha-grande",
+            gia=45000000, gia_thue=200000, so_luong=3, mau_sac="Đỏ", loai_xe=self.loai,
+        )
+
+    def etag(self, url):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("Last-Modified", response)
+        return response["ETag"]
+
+    def test_detail_not_modified_without_serializing(self):
+        etag = self.etag("/api/xe/X001/")
+        self.assertTrue(etag.startswith('"'))
+        # Chỉ 1 query aggregate tính validators, không load/serialize xe
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/xe/X001/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["ETag"], etag)
+
+    def test_if_modified_since(self):
+        response = self.client.get("/api/xe/X001/")
+        response = self.client.get("/api/xe/X001/", HTTP_IF_MODIFIED_SINCE=response["Last-Modified"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_car_image_and_review_change_etag(self):
+        etag = self.etag("/api/xe/X001/")
+        CarImage.objects.create(xe=self.xe, image="cars/x001.jpg")
+        etag_after_image = self.etag("/api/xe/X001/")
+        self.assertNotEqual(etag, etag_after_image)
+
+        user = User.objects.create_user(username="user1", password="pass12345")
+        Review.objects.create(xe=self.xe, user=user, rating=5, comment="Tốt")
+        self.assertNotEqual(etag_after_image, self.etag("/api/xe/X001/"))
+
+    def test_list_etag_follows_filters_and_category(self):
+        etag = self.etag("/api/xe/")
+        self.assertNotEqual(etag, self.etag("/api/xe/?loai=LX01"))
+
+        with self.assertNumQueries(1):
+            response = self.client.get("/api/xe/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+        self.loai.ten_loai = "Xe ga"
+        self.loai.save()
+        self.assertNotEqual(etag, self.etag("/api/xe/"))
+
+    def test_list_deletion_changes_etag(self):
+        Xe.objects.create(
+            ma_xe="X002", ten_xe="Honda Vision", slug="honda-vision",
+            gia=30000000, so_luong=1, mau_sac="Trắng", loai_xe=self.loai,
+        )
+        etag = self.etag("/api/xe/")
+        Xe.objects.get(pk="X002").delete()
+        response = self.client.get("/api/xe/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_category_and_location_endpoints(self):
+        Location.objects.create(ten_dia_diem="Quận 1")
+        for url in ["/api/loaixe/", "/api/loaixe/LX01/", "/api/location/"]:
+            etag = self.etag(url)
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED, url)
+
+    def test_missing_car_still_404(self):
+        response = self.client.get("/api/xe/NOPE/", HTTP_IF_NONE_MATCH='"abc"')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class CachedConditionalGetTest(TransactionTestCase):
+    """304 trả thẳng từ response cache, không chạm database"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        Xe.objects.create(
+            ma_xe="X001", ten_xe="Yamaha Grande", slug="yamaha-grande",
+            gia=45000000, so_luong=3, mau_sac="Đỏ", loai_xe=loai,
+        )
+
+    def test_not_modified_from_cache(self):
+        etag = self.client.get("/api/xe/X001/")["ETag"]
+        with self.assertNumQueries(0):
+            response = self.client.get("/api/xe/X001/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response["X-Cache"], "HIT")
@@ -0,0 +1,85 @@
+"""
+Test facet counts cho /api/xe/facets/
+"""
+from django.core.cache import cache
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from products.models import LoaiXe, Xe
+
+
+class XeFacetsAPITest(TestCase):
+    """Test facet counts + histogram giá thuê"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.tay_ga = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.sedan = LoaiXe.objects.create(ma_loai="LX04", ten_loai="Sedan")
+        cars = [
+            ("X001", self.tay_ga, "gasoline", "automatic", 2, "Đỏ", 150000, 3, "in_stock"),
+            ("X002", self.tay_ga, "electric", "automatic", 2, "Trắng", 200000, 0, "in_stock"),
+            ("X003", self.sedan, "hybrid", "automatic", 5, "Đỏ", 900000, 1, "in_stock"),
+            ("X004", self.sedan, "gasoline", "manual", 5, "Đen", 800000, 2, "out_of_stock"),
+        ]
+        for ma_xe, loai, fuel, hop_so, so_cho, mau, gia_thue, so_luong, trang_thai in cars:
+            Xe.objects.create(
+                ma_xe=ma_xe, ten_xe=f"Xe {ma_xe}", slug=ma_xe.lower(), gia=gia_thue * 300,
+                gia_thue=gia_thue, so_luong=so_luong, mau_sac=mau, loai_xe=loai,
+                loai_nhien_lieu=fuel, hop_so=hop_so, so_cho=so_cho, trang_thai=trang_thai,
+            )
+
+    def facets(self, **params):
+        response = self.client.get("/api/xe/facets/", params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    @staticmethod
+    def counts(items):
+        return {item["value"]: item["count"] for item in items}
+
+    def test_counts_without_filters(self):
+        data = self.facets()
+        self.assertEqual(data["total"], 4)
+        self.assertEqual(self.counts(data["facets"]["loai"]), {"LX01": 2, "LX04": 2})
+        self.assertEqual(
+            self.counts(data["facets"]["fuel_type"]),
+            {"gasoline": 2, "electric": 1, "hybrid": 1},
+        )
+        self.assertEqual(self.counts(data["facets"]["seats"]), {2: 2, 5: 2})
+        self.assertEqual(self.counts(data["facets"]["color"]), {"Đỏ": 2, "Trắng": 1, "Đen": 1})
+        self.assertEqual(self.counts(data["facets"]["in_stock"]), {True: 2})
+
+    def test_selected_facet_keeps_sibling_counts(self):
+        """Đã chọn fuel_type vẫn thấy count các nhiên liệu khác, facet khác bị thu hẹp"""
+        data = self.facets(fuel_type="hybrid")
+        self.assertEqual(data["total"], 1)
+        self.assertEqual(
+            self.counts(data["facets"]["fuel_type"]),
+            {"gasoline": 2, "electric": 1, "hybrid": 1},
+        )
+        self.assertEqual(self.counts(data["facets"]["loai"]), {"LX04": 1})
+
+    def test_counts_match_list_endpoint(self):
+        params = {"loai": "LX04", "color": "Đỏ", "min_seats": "4"}
+        data = self.facets(**params)
+        response = self.client.get("/api/xe/", params)
+        self.assertEqual(data["total"], response.data["count"])
+
+    def test_price_filter_and_histogram(self):
+        data = self.facets(gia_thue_max="850000", bucket_size="500000")
+        self.assertEqual(data["total"], 3)
+        self.assertEqual(
+            [(b["min"], b["max"], b["count"]) for b in data["price_histogram"]["buckets"]],
+            [(0, 499999, 2), (500000, 999999, 1)],
+        )
+
+    def test_single_grouped_query_and_cache(self):
+        # 1 query GROUP BY + 1 query lấy tên loại xe
+        with self.assertNumQueries(2):
+            first = self.facets(color="Đỏ", in_stock="true")
+        # Filter tương đương (khác hoa/thường, khoảng trắng, param lạ) dùng lại cache
+        with self.assertNumQueries(0):
+            second = self.facets(color=" đỏ ", in_stock="TRUE", page="2")
+        self.assertEqual(first, second)
@@ -0,0 +1,63 @@
+"""
+Test danh sách xe dạng card gọn (XeListSerializer) và số query của list endpoint
+"""
+from django.contrib.auth.models import User
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from products.models import CarImage, LoaiXe, Xe
+
+
+class XeListQueryCountTest(TestCase):
+    """List xe không bị N+1 theo số xe/số ảnh"""
+
+    def setUp(self):
+        self.client = APIClient()
+        loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        for index in range(12):
+            xe = Xe.objects.create(
+                ma_xe=f"X{index:03d}", ten_xe=f"Xe {index}", slug=f"xe-{index}",
+                gia=30000000, gia_thue=150000, so_luong=1, mau_sac="Đỏ", loai_xe=loai,
+                mo_ta="Mô tả rất dài. " * 200,
+            )
+            for order in range(3):
+                CarImage.objects.create(
+                    xe=xe, image=f"cars/{xe.ma_xe}-{order}.jpg",
+                    is_primary=(order == 1), order=order,
+                )
+
+    def test_list_is_compact(self):
+        response = self.client.get("/api/xe/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        car = response.data["results"][0]
+        self.assertNotIn("mo_ta", car)
+        self.assertNotIn("car_images", car)
+        self.assertEqual(car["loai_xe"]["ten_loai"], "Xe tay ga")
+        self.assertTrue(car["primary_image"].endswith("/media/cars/X000-1.jpg"))
+        self.assertLessEqual(len(car["summary"]), 160)
+
+    def test_list_query_count(self):
+        # COUNT cho pagination + 1 SELECT (ảnh chính, loại xe được join/annotate)
+        with self.assertNumQueries(2):
+            response = self.client.get("/api/xe/")
+        self.assertEqual(len(response.data["results"]), 10)
+
+        with self.assertNumQueries(1):
+            self.client.get("/api/xe/", {"cursor": ""})
+
+    def test_admin_list_keeps_full_serializer(self):
+        admin = User.objects.create_user(username="admin", password="pass12345", is_staff=True)
+        self.client.force_authenticate(user=admin)
+        # COUNT + SELECT + 1 prefetch car_images cho cả trang
+        with self.assertNumQueries(3):
+            response = self.client.get("/api/xe/")
+        car = response.data["results"][0]
+        self.assertIn("mo_ta", car)
+        self.assertEqual(len(car["car_images"]), 3)
+
+    def test_detail_keeps_gallery(self):
+        response = self.client.get("/api/xe/X000/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["car_images"]), 3)
+        self.assertIn("mo_ta", response.data)
@@ -0,0 +1,136 @@
+"""
+Test điểm đánh giá tổng hợp lưu trên Xe (products.ratings)
+"""
+from decimal import Decimal
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from products.models import LoaiXe, Review, Xe
+from products.ratings import rebuild_ratings
+
+
+class RatingAggregateTest(TestCase):
+    """Review qua API cập nhật avg_rating/review_count/histogram của xe"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.xe = self.create_xe("X001")
+        self.users = [
+            User.objects.create_user(username=f"user{index}", password="pass12345")
+            for index in range(3)
+        ]
+
+    def create_xe(self, ma_xe):
+        return Xe.objects.create(
+            ma_xe=ma_xe, ten_xe=f"Xe {ma_xe}", slug=ma_xe.lower(),
+            gia=30000000, gia_thue=150000, so_luong=1, mau_sac="Đỏ", loai_xe=self.loai,
+        )
+
+    def review(self, user, rating, xe=None):
+        self.client.force_authenticate(user=user)
+        response = self.client.post(
+            "/api/review/", {"xe": (xe or self.xe).pk, "rating": rating, "comment": "Ok"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        return response.data["id"]
+
+    def assertStats(self, count, avg, histogram):
+        self.xe.refresh_from_db()
+        self.assertEqual(self.xe.review_count, count)
+        self.assertEqual(self.xe.avg_rating, Decimal(avg))
+        self.assertEqual(self.xe.rating_histogram, histogram)
+
+    def test_create_update_delete(self):
+        first = self.review(self.users[0], 5)
+        self.review(self.users[1], 4)
+        self.assertStats(2, "4.50", {"1": 0, "2": 0, "3": 0, "4": 1, "5": 1})
+
+        self.client.force_authenticate(user=self.users[0])
+        response = self.client.patch(f"/api/review/{first}/", {"rating": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertStats(2, "2.50", {"1": 1, "2": 0, "3": 0, "4": 1, "5": 0})
+
+        response = self.client.delete(f"/api/review/{first}/")
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertStats(1, "4.00", {"1": 0, "2": 0, "3": 0, "4": 1, "5": 0})
+
+    def test_delete_last_review_resets_average(self):
+        review_id = self.review(self.users[0], 3)
+        self.client.delete(f"/api/review/{review_id}/")
+        self.assertStats(0, "0", {"1": 0, "2": 0, "3": 0, "4": 0, "5": 0})
+
+    def test_rejected_update_keeps_stats(self):
+        review_id = self.review(self.users[0], 5)
+        self.client.force_authenticate(user=self.users[1])
+        response = self.client.patch(f"/api/review/{review_id}/", {"rating": 1}, format="json")
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertStats(1, "5.00", {"1": 0, "2": 0, "3": 0, "4": 0, "5": 1})
+
+    def test_rebuild_command_repairs_drift(self):
+        self.review(self.users[0], 5)
+        # Review tạo ngoài API (vd. admin) không cập nhật điểm tổng hợp
+        Review.objects.create(xe=self.xe, user=self.users[1], rating=2, comment="Tệ")
+        Xe.objects.filter(pk=self.xe.pk).update(rating_sum=99)
+        out = StringIO()
+        call_command("rebuild_ratings", stdout=out)
+        self.assertIn("1 xe", out.getvalue())
+        self.assertStats(2, "3.50", {"1": 0, "2": 1, "3": 0, "4": 0, "5": 1})
+
+        out = StringIO()
+        call_command("rebuild_ratings", stdout=out)
+        self.assertIn("0 xe", out.getvalue())
+
+    def test_incremental_and_rebuild_round_alike(self):
+        # Trung bình tuần hoàn (13/3, 10/3): API và rebuild_ratings làm tròn như nhau
+        self.review(self.users[0], 5)
+        self.review(self.users[1], 4)
+        third = self.review(self.users[2], 4)
+        self.assertStats(3, "4.33", {"1": 0, "2": 0, "3": 0, "4": 2, "5": 1})
+        self.assertEqual(rebuild_ratings(), 0)
+
+        self.client.force_authenticate(user=self.users[2])
+        self.client.patch(f"/api/review/{third}/", {"rating": 1}, format="json")
+        self.assertStats(3, "3.33", {"1": 1, "2": 0, "3": 0, "4": 1, "5": 1})
+        self.assertEqual(rebuild_ratings(), 0)
+
+        # 21/8 = 2.625 nằm đúng giữa: cả hai nhánh đều làm tròn lên 2.63
+        other = self.create_xe("X002")
+        for index, rating in enumerate((5, 5, 3, 2, 2, 2, 1, 1)):
+            user = User.objects.create_user(username=f"khach{index}", password="pass12345")
+            self.review(user, rating, xe=other)
+        other.refresh_from_db()
+        self.assertEqual(other.avg_rating, Decimal("2.63"))
+        self.assertEqual(rebuild_ratings(), 0)
+
+    def test_ordering_and_min_rating(self):
+        other = self.create_xe("X002")
+        self.create_xe("X003")
+        self.review(self.users[0], 3)
+        self.review(self.users[1], 5, xe=other)
+        self.client.force_authenticate(user=None)
+
+        response = self.client.get("/api/xe/", {"ordering": "-avg_rating"})
+        self.assertEqual([car["ma_xe"] for car in response.data["results"]], ["X002", "X001", "X003"])
+        self.assertEqual(response.data["results"][0]["avg_rating"], "5.00")
+
+        response = self.client.get("/api/xe/", {"min_rating": "4"})
+        self.assertEqual([car["ma_xe"] for car in response.data["results"]], ["X002"])
+        # Giá trị không hợp lệ bị bỏ qua như các filter khác
+        response = self.client.get("/api/xe/", {"min_rating": "abc"})
+        self.assertEqual(len(response.data["results"]), 3)
+
+        response = self.client.get("/api/xe/", {"ordering": "-avg_rating", "cursor": ""})
+        self.assertEqual(response.data["results"][0]["ma_xe"], "X002")
+
+    def test_detail_histogram(self):
+        self.review(self.users[0], 4)
+        response = self.client.get("/api/xe/X001/")
+        self.assertEqual(response.data["review_count"], 1)
+        self.assertEqual(response.data["rating_histogram"]["4"], 1)
+        self.assertNotIn("rating_4_count", response.data)
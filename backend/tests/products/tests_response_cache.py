@@ -0,0 +1,112 @@
+"""
+Test response cache có version cho catalog public (core.cache)
+
+Dùng TransactionTestCase: cache bị bỏ qua khi request chạy trong transaction.
+"""
+import threading
+import time
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TransactionTestCase
+from rest_framework.request import Request
+from rest_framework.test import APIClient, APIRequestFactory
+from rest_framework import status
+
+from core.cache import get_versions, response_cache_key
+from products.models import BlogPost, CarImage, LoaiXe, Location, Xe
+
+
+def cache_key_for(path):
+    return response_cache_key(Request(APIRequestFactory().get(path)))
+
+
+class CatalogResponseCacheTest(TransactionTestCase):
+    """Test HIT/MISS, invalidation theo version, stale-while-revalidate"""
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.loai = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.xe = Xe.objects.create(
+            ma_xe="X001", ten_xe="Yamaha Grande", slug="yamaha-grande",
+            gia=45000000, gia_thue=200000, so_luong=3, mau_sac="Đỏ", loai_xe=self.loai,
+        )
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params or {})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_second_request_is_served_from_cache(self):
+        self.assertEqual(self.get("/api/xe/")["X-Cache"], "MISS")
+        with self.assertNumQueries(0):
+            response = self.get("/api/xe/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.data["results"][0]["ma_xe"], "X001")
+
+    def test_normalized_params_share_entry(self):
+        self.get("/api/xe/", {"loai": "LX01", "ordering": "gia", "color": ""})
+        response = self.client.get("/api/xe/?ordering=gia&loai=LX01")
+        self.assertEqual(response["X-Cache"], "HIT")
+
+    def test_save_and_delete_invalidate(self):
+        self.get("/api/xe/X001/")
+        self.xe.ten_xe = "Yamaha Grande 2026"
+        self.xe.save()
+        response = self.get("/api/xe/X001/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["ten_xe"], "Yamaha Grande 2026")
+
+        self.get("/api/xe/")
+        CarImage.objects.create(xe=self.xe, image="cars/x001.jpg", is_primary=True)
+        self.assertEqual(self.get("/api/xe/")["X-Cache"], "MISS")
+
+        self.get("/api/location/")
+        location = Location.objects.create(ten_dia_diem="Quận 1")
+        self.assertEqual(len(self.get("/api/location/").data["results"]), 1)
+        location.delete()
+        self.assertEqual(len(self.get("/api/location/").data["results"]), 0)
+
+    def test_authenticated_requests_bypass_cache(self):
+        user = User.objects.create_user(username="user1", password="pass12345")
+        self.client.force_authenticate(user=user)
+        self.assertNotIn("X-Cache", self.get("/api/xe/"))
+
+    def test_stale_served_while_other_request_revalidates(self):
+        self.get("/api/loaixe/")
+        key = cache_key_for("/api/loaixe/")
+        cache.add(f"{key}:lock", 1)  # request khác đang tính lại
+        LoaiXe.objects.create(ma_loai="LX02", ten_loai="Xe số")
+
+        response = self.get("/api/loaixe/")
+        self.assertEqual(response["X-Cache"], "STALE")
+        self.assertEqual(len(response.data["results"]), 1)
+
+        cache.delete(f"{key}:lock")
+        response = self.get("/api/loaixe/")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(len(response.data["results"]), 2)
+
+    def test_cold_miss_waits_for_in_flight_request(self):
+        """Không có entry + lock đang bị giữ: đợi kết quả thay vì query lại"""
+        key = cache_key_for("/api/blog/")
+        cache.add(f"{key}:lock", 1)
+        versions = get_versions((BlogPost,))
+
+        def finish_other_request():
+            cache.set(key, {
+                "data": {"results": ["from-other-request"]},
+                "status": 200,
+                "versions": versions,
+                "fresh_until": time.time() + 60,
+            })
+
+        timer = threading.Timer(0.1, finish_other_request)
+        timer.start()
+        try:
+            with self.assertNumQueries(0):
+                response = self.get("/api/blog/")
+        finally:
+            timer.join()
+        self.assertEqual(response.data["results"], ["from-other-request"])
@@ -0,0 +1,95 @@
+"""
+Test full-text search không dấu cho danh mục xe
+"""
+from unittest import mock
+
+from django.test import TestCase
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from products.models import LoaiXe, Xe
+from products.search import fold_text, rebuild_search_index
+
+
+class FoldTextTest(TestCase):
+    """Test chuẩn hóa tiếng Việt không dấu"""
+
+    def test_fold_vietnamese(self):
+        self.assertEqual(fold_text("Xe Tay Ga Đời Mới"), "xe tay ga doi moi")
+        self.assertEqual(fold_text("  Côn   tay "), "con tay")
+        self.assertEqual(fold_text(None), "")
+
+
+class XeSearchAPITest(TestCase):
+    """Test ?search= trên /api/xe/"""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.tay_ga = LoaiXe.objects.create(ma_loai="LX01", ten_loai="Xe tay ga")
+        self.xe_so = LoaiXe.objects.create(ma_loai="LX02", ten_loai="Xe số")
+        Xe.objects.create(
+            ma_xe="X001", ten_xe="Yamaha Grande", slug="yamaha-grande",
+            gia=45000000, gia_thue=200000, so_luong=3, mau_sac="Đỏ",
+            loai_xe=self.tay_ga, mo_ta="Tiết kiệm xăng, phù hợp đô thị.",
+        )
+        Xe.objects.create(
+            ma_xe="X002", ten_xe="Honda Future", slug="honda-future",
+            gia=32000000, gia_thue=150000, so_luong=2, mau_sac="Xanh",
+            loai_xe=self.xe_so, mo_ta="Xe số bền bỉ, dành cho người yêu Yamaha.",
+        )
+
+    def search(self, query):
+        response = self.client.get("/api/xe/", {"search": query})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [car["ma_xe"] for car in response.data.get("results", response.data)]
+
+    def test_search_without_diacritics(self):
+        """Gõ không dấu vẫn tìm được loại xe có dấu"""
+        self.assertEqual(self.search("xe so"), ["X002"])
+        self.assertEqual(self.search("tiet kiem xang"), ["X001"])
+
+    def test_search_with_diacritics(self):
+        self.assertEqual(self.search("Xe Tay Ga"), ["X001"])
+
+    def test_search_ranks_name_match_first(self):
+        """Match ở tên xe xếp trước match ở mô tả"""
+        self.assertEqual(self.search("yamaha"), ["X001", "X002"])
+
+    def test_search_hides_internal_fields(self):
+        response = self.client.get("/api/xe/", {"search": "yamaha"})
+        car = response.data.get("results", response.data)[0]
+        self.assertNotIn("search_document", car)
+        self.assertNotIn("search_vector", car)
+
+    def test_category_rename_updates_index(self):
+        self.tay_ga.ten_loai = "Xe ga cao cấp"
+        self.tay_ga.save()
+        self.assertEqual(self.search("cao cap"), ["X001"])
+
+    def test_category_save_without_rename_skips_index(self):
+        with mock.patch("products.search.rebuild_search_index") as rebuild:
+            self.tay_ga.save()
+            self.tay_ga.ten_loai = "Xe ga cao cấp"
+            self.tay_ga.save(update_fields=["updated_at"])
+            LoaiXe.objects.create(ma_loai="LX03", ten_loai="Xe côn tay")
+        rebuild.assert_not_called()
+        self.assertEqual(self.search("cao cap"), [])
+
+    def test_save_update_fields_reindexes_only_search_fields(self):
+        xe = Xe.objects.get(pk="X001")
+        xe.ten_xe = "Xe dien mini"
+        xe.so_luong = 7
+        with mock.patch("products.search.refresh_search_vector") as refresh:
+            xe.save(update_fields=["so_luong"])
+        refresh.assert_not_called()
+        self.assertEqual(self.search("mini"), [])
+        self.assertEqual(Xe.objects.get(pk="X001").so_luong, 7)
+
+        xe.save(update_fields=["ten_xe"])
+        self.assertEqual(self.search("mini"), ["X001"])
+
+    def test_rebuild_search_index(self):
+        Xe.objects.update(search_document="")
+        self.assertEqual(self.search("grande"), [])
+        self.assertEqual(rebuild_search_index(), 2)
+        self.assertEqual(self.search("grande"), ["X001"])